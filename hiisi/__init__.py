@@ -1,4 +1,33 @@
 # -*- coding: utf-8 -*-
-from .hiisihdf import HiisiHDF
-from .odim import OdimPVOL, OdimCOMP
+"""
+Submodules and their classes are imported only when they are first used,
+so importing hiisi does not load h5py or numpy.
+"""
+import importlib
+
 __version__ = "0.1.0"
+
+_LAZY_ATTRS = {'HiisiHDF':'hiisihdf',
+               'OdimPVOL':'odim',
+               'OdimCOMP':'odim',
+               'OdimVPR':'odim',
+               'OdimRHI':'odim'}
+_SUBMODULES = ('archive', 'cli', 'export', 'geometry', 'hiisihdf', 'mosaic', 'odim', 'parallel', 'peek',
+               'profiling', 'repack', 'rewrite', 'shared', 'stats', 'validate', 'vds', 'volume')
+
+__all__ = sorted(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module('.' + _LAZY_ATTRS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_SUBMODULES))
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Archive module keeps a time index of the odim files of an archive, so the
+files of a radar nearest to a time, or within a time range, are found
+without opening candidate files.
+
+Index has a sorted array of nominal times per source, and queries are
+binary searches of these arrays. Time, source and object of a file are
+parsed from the file name if a pattern is given, otherwise they are read
+from the root what group with hiisi.peek. Index can be stored in a .npz
+file, and when the catalogue is updated only new and modified files are
+read.
+
+Examples
+--------
+>>> catalogue = Catalogue('/arch/2016/08', index_file='arch_201608.npz', workers=8)
+>>> entry = catalogue.nearest('fivan', '2016-08-15T12:02')
+>>> with catalogue.open(entry) as pvol:
+        pvol.select_dataset('A', 'DBZH')
+>>> for entry in catalogue.range('fivan', '2016-08-15T12:00', '2016-08-15T13:00'):
+        print(entry.time, entry.filename)
+"""
+from .hiisihdf import HiisiHDF
+from .odim import OdimCOMP, OdimPVOL, _datetime64, _node
+from .parallel import find_files, map_files
+from .peek import peek
+from collections import namedtuple
+import datetime
+import numpy as np
+import os
+import re
+
+Entry = namedtuple('Entry', ['time', 'source', 'object', 'filename'])
+
+HANDLES = {'PVOL':OdimPVOL, 'SCAN':OdimPVOL, 'COMP':OdimCOMP, 'IMAGE':OdimCOMP}
+
+
+class Catalogue(object):
+    """Time index of the files of an archive.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories of the archive
+
+    Keywords
+    --------
+    index_file : str
+        If given, index is loaded from and stored in this .npz file
+    filename_pattern : str
+        Regular expression with groups named time and source, and
+        optionally object, matched against the file names. Time is
+        YYYYmmddHHMM or YYYYmmddHHMMSS. Files whose names do not match are
+        read with hiisi.peek.
+    workers : int
+        Number of worker processes reading files, by default the number of
+        cpus
+    update : bool
+        Update the index when the catalogue is created
+
+    Attributes
+    ----------
+    errors : list
+        (filename, message) tuples of the files that could not be read.
+        Failed files are not read again until they are modified.
+
+    Examples
+    --------
+    >>> catalogue = Catalogue('/arch', filename_pattern=r'(?P<time>\\d{12})_(?P<source>[a-z]{5})_(?P<object>PVOL)')
+    """
+    def __init__(self, paths, index_file=None, filename_pattern=None, workers=None, update=True):
+        self.paths = paths
+        self.index_file = index_file
+        self.filename_pattern = None if filename_pattern is None else re.compile(filename_pattern)
+        self.workers = workers
+        self.errors = []
+        self._files = {}
+        self._failed = {}
+        self._index = {}
+        if index_file is not None and os.path.isfile(index_file):
+            self.load()
+        if update:
+            self.update()
+
+    def __len__(self):
+        return len(self._files)
+
+    def sources(self):
+        """Returns the sorted list of the sources in the index"""
+        return sorted(self._index)
+
+    def update(self):
+        """Adds new and modified files to the index and removes missing
+        files from it. Index is stored if the catalogue has an index file.
+
+        Returns
+        -------
+        n_read : int
+            Number of files whose time was parsed or read
+        """
+        files = {}
+        failed = {}
+        unknown = []
+        n_read = 0
+        for filename in find_files(self.paths):
+            mtime = os.path.getmtime(filename)
+            known = self._files.get(filename)
+            if known is not None and known[0] == mtime:
+                files[filename] = known
+                continue
+            known = self._failed.get(filename)
+            if known is not None and known[0] == mtime:
+                failed[filename] = known
+                continue
+            entry = self._parse_filename(filename)
+            if entry is None:
+                unknown.append(filename)
+            else:
+                files[filename] = (mtime, entry)
+                n_read += 1
+        for result in map_files(_read_entry, unknown, self.workers, chunksize=64):
+            mtime = os.path.getmtime(result['filename'])
+            if result['error'] is not None:
+                failed[result['filename']] = (mtime, result['error'])
+            else:
+                files[result['filename']] = (mtime, result['entry'])
+                n_read += 1
+        self._files = files
+        self._failed = failed
+        self.errors = [(filename, failed[filename][1]) for filename in sorted(failed)]
+        self._build_index()
+        if self.index_file is not None:
+            self.save()
+        return n_read
+
+    def nearest(self, source, time, tolerance=None):
+        """Returns the file of the source nearest to the given time.
+
+        Parameters
+        ----------
+        source : str
+            NOD of the radar, e.g. 'fivan', or the source string of files
+            without NOD
+        time : datetime, datetime64 or str
+            Time, e.g. '2016-08-15T12:00'
+
+        Keywords
+        --------
+        tolerance : int or timedelta64
+            Maximum difference of the times, in seconds if int
+
+        Returns
+        -------
+        entry : Entry
+            Entry of the nearest file, or None if the source has no files
+            within the tolerance. Of equally near files the earlier is
+            returned.
+        """
+        times, entries = self._index.get(source, (np.array([], dtype='datetime64[s]'), []))
+        if not entries:
+            return None
+        time = _to_datetime64(time)
+        i = int(np.searchsorted(times, time))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(entries)]
+        best = min(candidates, key=lambda j: abs(times[j] - time))
+        if tolerance is not None:
+            if not isinstance(tolerance, np.timedelta64):
+                tolerance = np.timedelta64(int(tolerance), 's')
+            if abs(times[best] - time) > tolerance:
+                return None
+        return entries[best]
+
+    def range(self, source, start, end):
+        """Returns the files of the source whose times are between start
+        and end, both included, in the order of time.
+
+        Parameters
+        ----------
+        source : str
+            NOD of the radar or the source string of files without NOD
+        start, end : datetime, datetime64 or str
+            Limits of the time range
+
+        Returns
+        -------
+        entries : list
+            Entry tuples of the files
+        """
+        times, entries = self._index.get(source, (np.array([], dtype='datetime64[s]'), []))
+        first = int(np.searchsorted(times, _to_datetime64(start), 'left'))
+        last = int(np.searchsorted(times, _to_datetime64(end), 'right'))
+        return entries[first:last]
+
+    def open(self, entry, mode='r', **kwargs):
+        """Opens the file of an entry.
+
+        Polar volumes and scans are opened as OdimPVOL, composites and
+        images as OdimCOMP and other objects as HiisiHDF.
+
+        Parameters
+        ----------
+        entry : Entry
+            Entry returned by nearest or range
+
+        Keywords
+        --------
+        mode : str
+            File mode, other keywords are passed to h5py.File
+
+        Returns
+        -------
+        h5f : OdimPVOL, OdimCOMP or HiisiHDF
+            Open file
+        """
+        odim_object = entry.object or peek(entry.filename, ('what',)).get('what', {}).get('object')
+        return HANDLES.get(odim_object, HiisiHDF)(entry.filename, mode, **kwargs)
+
+    def save(self, index_file=None):
+        """Stores the index in a .npz file, by default in the index file of
+        the catalogue"""
+        index_file = index_file or self.index_file
+        if index_file is None:
+            raise ValueError('Index file is not given')
+        filenames = sorted(self._files)
+        failed = sorted(self._failed)
+        entries = [self._files[filename][1] for filename in filenames]
+        temporary = index_file + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, filename=np.array(filenames, dtype=str),
+                     mtime=np.array([self._files[filename][0] for filename in filenames], dtype=np.float64),
+                     time=np.array([entry.time for entry in entries], dtype='datetime64[s]'),
+                     source=np.array([entry.source for entry in entries], dtype=str),
+                     object=np.array([entry.object for entry in entries], dtype=str),
+                     failed_filename=np.array(failed, dtype=str),
+                     failed_mtime=np.array([self._failed[filename][0] for filename in failed], dtype=np.float64),
+                     failed_error=np.array([self._failed[filename][1] for filename in failed], dtype=str))
+        os.replace(temporary, index_file)
+
+    def load(self, index_file=None):
+        """Loads the index from a .npz file, by default from the index file
+        of the catalogue"""
+        with np.load(index_file or self.index_file) as index:
+            self._files = dict((str(filename), (float(mtime), Entry(time, str(source), str(odim_object),
+                                                                     str(filename))))
+                               for filename, mtime, time, source, odim_object
+                               in zip(index['filename'], index['mtime'], index['time'], index['source'],
+                                      index['object']))
+            self._failed = dict((str(filename), (float(mtime), str(error))) for filename, mtime, error
+                                in zip(index['failed_filename'], index['failed_mtime'], index['failed_error']))
+        self.errors = [(filename, self._failed[filename][1]) for filename in sorted(self._failed)]
+        self._build_index()
+
+    def _build_index(self):
+        """Sorts the entries of each source by time"""
+        sources = {}
+        for filename in sorted(self._files):
+            entry = self._files[filename][1]
+            sources.setdefault(entry.source, []).append(entry)
+        self._index = {}
+        for source, entries in sources.items():
+            times = np.array([entry.time for entry in entries], dtype='datetime64[s]')
+            order = np.argsort(times, kind='stable')
+            self._index[source] = (times[order], [entries[i] for i in order])
+
+    def _parse_filename(self, filename):
+        """Returns the entry parsed from the file name, or None"""
+        if self.filename_pattern is None:
+            return None
+        match = self.filename_pattern.search(os.path.basename(filename))
+        if match is None:
+            return None
+        digits = match.group('time')
+        time = _datetime64(digits[:8], digits[8:].ljust(6, '0'))
+        if np.isnat(time):
+            return None
+        groups = match.groupdict()
+        return Entry(time, groups['source'], groups.get('object') or '', filename)
+
+
+def _read_entry(filename):
+    """Returns the entry of a file read from its root what group"""
+    result = {'filename':filename, 'entry':None, 'error':None}
+    try:
+        what = peek(filename, ('what',)).get('what', {})
+        time = _datetime64(what.get('date'), what.get('time'))
+        if np.isnat(time):
+            raise ValueError('date and time are not found from /what')
+        result['entry'] = Entry(time, _node(what.get('source')), what.get('object', ''), filename)
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def _to_datetime64(time):
+    """Converts a time argument into datetime64 with one second resolution"""
+    if isinstance(time, datetime.datetime) and time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(time, 's')
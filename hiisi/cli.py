@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Cli module contains the hiisi command line tool for inspecting, searching
+and extracting data from many files at once.
+
+Files are given as paths, glob patterns or directories, and they are
+processed in a process pool. Output of each file is printed as soon as the
+file is ready, in the order of the files, as tab separated lines starting
+with the file name, so it can be piped to other tools. Submodules are
+imported only by the subcommands that need them, so light commands such as
+peek start quickly::
+
+    hiisi peek /arch/2016/08/15/
+    hiisi ls /arch/2016/08/15/
+    hiisi search quantity DBZH '/arch/2016/08/15/*.h5'
+    hiisi search elangle 0.5 --tol 0.1 -j 8 /arch/2016/08/15/
+    hiisi extract --elangle A --quantity DBZH --sector 90 180 0 50000 --units m -o out/ pvol.h5
+    hiisi extract --quantity DBZH --format nc --decode comp.h5
+    hiisi stats --quantity DBZH /arch/2016/08/15/
+    hiisi validate --thorough -j 8 /incoming/
+
+Exit status is 1 if any of the files could not be processed, or if validate
+found invalid files.
+"""
+from .parallel import find_files, map_files
+from functools import partial
+import argparse
+import os
+import sys
+
+
+def peek_file(filename):
+    """Returns the lines of the root what, where and how attributes"""
+    from .peek import peek
+    return ['{}\t{}/{}\t{}'.format(filename, group, key, value)
+            for group, attrs in peek(filename).items() for key, value in sorted(attrs.items())]
+
+
+def ls_file(filename, groups=False):
+    """Returns the dataset lines, or the group lines, of one file"""
+    from .hiisihdf import HiisiHDF
+    with HiisiHDF(filename, 'r') as h5f:
+        if groups:
+            return ['{}\t{}'.format(filename, path) for path in h5f.groups()]
+        return ['{}\t{}\t{}\t{}'.format(filename, path, h5f[path].shape, h5f[path].dtype)
+                for path in h5f.datasets()]
+
+
+def search_file(filename, attr, value, tolerance=0):
+    """Returns the lines of the paths where the attribute matches"""
+    from .hiisihdf import HiisiHDF
+    from .peek import _python_value
+    with HiisiHDF(filename, 'r') as h5f:
+        return ['{}\t{}\t{}'.format(filename, path, _python_value(h5f[path].attrs[attr]))
+                for path in h5f.search(attr, value, tolerance)]
+
+
+def extract_file(filename, quantity, elangle=None, sector=None, units='b', decode=False,
+                 file_format='npy', output_dir='.'):
+    """Writes the selected dataset, or a sector of it, into a .npy or a
+    NetCDF file and returns the line describing the written file.
+
+    Polar volume sweeps are selected with elangle, which is an elevation
+    angle letter of OdimPVOL. Without elangle the file is read as a
+    composite.
+    """
+    from .odim import OdimCOMP, OdimPVOL, _decode, _inherited_attrs
+    import numpy as np
+    if elangle is None:
+        h5f = OdimCOMP(filename, 'r')
+    else:
+        h5f = OdimPVOL(filename, 'r')
+    with h5f:
+        if elangle is None:
+            path = h5f.select_dataset(quantity)
+        else:
+            path = h5f.select_dataset(elangle, quantity)
+        if path is None:
+            raise KeyError('Quantity {} is not found from file'.format(quantity))
+        if sector is not None:
+            if elangle is None:
+                raise ValueError('Sector can be extracted only from polar volumes')
+            data = h5f.sector(*sector, units=units)
+        else:
+            data = h5f.dataset
+        if decode:
+            data = data.astype(np.float64)
+            _decode(data, _inherited_attrs(h5f.metadata(), os.path.dirname(path), 'what'))
+
+    name = os.path.splitext(os.path.basename(filename))[0]
+    name = '_'.join([name, quantity] + ([elangle] if elangle is not None else []))
+    output = os.path.join(output_dir, '{}.{}'.format(name, file_format))
+    if file_format == 'npy':
+        np.save(output, data)
+    else:
+        _write_netcdf(output, data, quantity, ('azimuth', 'range') if elangle is not None else ('y', 'x'))
+    return ['{}\t{}\t{}\t{}'.format(filename, path, output, data.shape)]
+
+
+def _write_netcdf(output, data, quantity, dims):
+    """Writes an array into a NetCDF4 file with index dimensions"""
+    import h5py
+    import numpy as np
+    with h5py.File(output, 'w') as h5f:
+        variable = h5f.create_dataset(quantity, data=data, compression='gzip')
+        if data.dtype.kind == 'f':
+            variable.attrs['_FillValue'] = data.dtype.type(np.nan)
+        for axis, dim in enumerate(dims):
+            h5f[dim] = np.arange(data.shape[axis], dtype=np.int32)
+            h5f[dim].make_scale(dim)
+            variable.dims[axis].attach_scale(h5f[dim])
+
+
+def stats_file(filename, quantity=None):
+    """Returns statistics lines of the data groups of one file.
+
+    Columns are path, quantity, shape, and the minimum, maximum and mean of
+    the decoded values followed by the fractions of nodata and undetect.
+    Datasets are read chunk by chunk with hiisi.stats.
+    """
+    from .stats import file_stats
+    lines = []
+    for row in file_stats(filename, None if quantity is None else [quantity]):
+        lines.append('{}\t{}\t{}\t{}\t{:.6g}\t{:.6g}\t{:.6g}\t{:.4f}\t{:.4f}'.format(
+            filename, row['path'] + '/data', row['quantity'], row['shape'],
+            row['min'], row['max'], row['mean'], row['nodata'], row['undetect']))
+    return lines
+
+
+def validate_file(filename, thorough=False):
+    """Returns the problem lines of one file, or no lines if the file is
+    valid. Files are checked with hiisi.validate."""
+    from .validate import validate_file as check
+    result = check(filename, thorough)
+    if result['error'] is not None:
+        return ['{}\tERROR\t{}'.format(filename, result['error'])]
+    return ['{}\tINVALID\t{}\t{}'.format(filename, problem.path, problem.message)
+            for problem in result['problems']]
+
+
+def _parse_value(value):
+    """Interprets a command line value as a number if possible"""
+    for value_type in (int, float):
+        try:
+            return value_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _run(function, filename):
+    """Calls function for one file and returns the output lines and the
+    error message"""
+    try:
+        return function(filename), None
+    except Exception as error:
+        return [], '{}\tERROR\t{}: {}'.format(filename, type(error).__name__, error)
+
+
+def main(argv=None):
+    """Command line entry point hiisi"""
+    parser = argparse.ArgumentParser(prog='hiisi', description='Inspect, search and extract odim files')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    subparsers.add_parser('peek', parents=[common], help='print root metadata')
+
+    ls_parser = subparsers.add_parser('ls', parents=[common], help='list datasets or groups')
+    ls_parser.add_argument('--groups', action='store_true', help='list groups instead of datasets')
+
+    search_parser = subparsers.add_parser('search', parents=[common], help='find attribute values')
+    search_parser.add_argument('attr', help='name of the attribute')
+    search_parser.add_argument('value', help='value of the attribute')
+    search_parser.add_argument('--tol', type=float, default=0, help='tolerance of numerical values')
+
+    extract_parser = subparsers.add_parser('extract', parents=[common], help='write datasets into files')
+    extract_parser.add_argument('--quantity', required=True, help='quantity, e.g. DBZH')
+    extract_parser.add_argument('--elangle', default=None, help='elevation angle letter of polar volumes')
+    extract_parser.add_argument('--sector', type=int, nargs='+', default=None,
+                                metavar='N', help='start_ray end_ray [start_distance end_distance]')
+    extract_parser.add_argument('--units', choices=('b', 'm'), default='b', help='units of the distances')
+    extract_parser.add_argument('--decode', action='store_true', help='convert to physical values')
+    extract_parser.add_argument('--format', choices=('npy', 'nc'), default='npy', help='output format')
+    extract_parser.add_argument('-o', '--output-dir', default='.', help='output directory')
+
+    stats_parser = subparsers.add_parser('stats', parents=[common], help='print dataset statistics')
+    stats_parser.add_argument('--quantity', default=None, help='only the given quantity')
+
+    validate_parser = subparsers.add_parser('validate', parents=[common], help='check file integrity')
+    validate_parser.add_argument('--thorough', action='store_true', help='read every chunk of every dataset')
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('paths', nargs='+', help='files, glob patterns or directories')
+    args = parser.parse_args(argv)
+
+    if args.command == 'peek':
+        function = peek_file
+    elif args.command == 'ls':
+        function = partial(ls_file, groups=args.groups)
+    elif args.command == 'search':
+        function = partial(search_file, attr=args.attr, value=_parse_value(args.value), tolerance=args.tol)
+    elif args.command == 'extract':
+        if args.sector is not None and len(args.sector) not in (2, 4):
+            parser.error('--sector takes two or four values')
+        function = partial(extract_file, quantity=args.quantity, elangle=args.elangle, sector=args.sector,
+                           units=args.units, decode=args.decode, file_format=args.format,
+                           output_dir=args.output_dir)
+    elif args.command == 'stats':
+        function = partial(stats_file, quantity=args.quantity)
+    else:
+        function = partial(validate_file, thorough=args.thorough)
+
+    n_errors = 0
+    for lines, error in map_files(partial(_run, function), find_files(args.paths), args.workers):
+        for line in lines:
+            print(line)
+        if error is not None:
+            n_errors += 1
+            print(error)
+        elif args.command == 'validate' and lines:
+            n_errors += 1
+        sys.stdout.flush()
+    return 1 if n_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
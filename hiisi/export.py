@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Export module extracts the metadata of many odim files into columnar
+tables for analytics.
+
+Table has one row per file, dataset and quantity. Columns file, dataset and
+data contain the file and group paths, and the other columns are named after
+the odim attributes, e.g. 'what/quantity', 'where/elangle' and 'how/NI'.
+Attributes are inherited from the upper levels of the hierarchy as defined
+in the odim scheme, so every row contains all the attributes valid for its
+quantity.
+
+Examples
+--------
+>>> table = metadata_table('/arch/2016/08', workers=8)
+>>> print(table['where/elangle'][table['what/quantity'] == 'DBZH'])
+>>> write_parquet(table, 'metadata_201608.parquet')
+"""
+from .hiisihdf import HiisiHDF
+from .odim import _inherited_attrs, _path_tree, _to_str
+from .parallel import find_files, map_files
+import numpy as np
+
+
+def file_rows(filename):
+    """Returns the metadata rows of one file as a list of dictionaries.
+
+    If the file cannot be read, a single row with the error message in
+    column error is returned.
+    """
+    try:
+        with HiisiHDF(filename, 'r') as h5f:
+            metadata = h5f.metadata()
+            tree = _path_tree(h5f)
+    except (OSError, IOError) as error:
+        return [{'file':filename, 'error':str(error)}]
+    data_groups = [(tree[number]['path'], tree[number]['data'][data_number]['path'])
+                   for number in sorted(tree) for data_number in sorted(tree[number]['data'])]
+    if data_groups == []:
+        data_groups = [(None, None)]
+    rows = []
+    for dataset, data in data_groups:
+        row = {'file':filename, 'dataset':dataset, 'data':data}
+        for group_type in ('what', 'where', 'how'):
+            attrs = _inherited_attrs(metadata, data or '/', group_type)
+            for key, value in attrs.items():
+                row['{}/{}'.format(group_type, key)] = _column_value(value)
+        rows.append(row)
+    return rows
+
+
+def metadata_table(paths, workers=None):
+    """Extracts the metadata of odim files into a table of typed columns.
+
+    Files are read in parallel and only metadata is read from them.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories that are searched recursively
+
+    Keywords
+    --------
+    workers : int
+        Number of worker processes, by default the number of cpus
+
+    Returns
+    -------
+    table : dict
+        Column names and numpy arrays of equal length. Numerical columns
+        are int64 or float64 arrays, missing numbers are nan. String columns
+        are unicode arrays, missing strings are empty. Other values such as
+        arrays are stored in object columns.
+    """
+    rows = []
+    for file_result in map_files(file_rows, find_files(paths), workers, chunksize=16):
+        rows.extend(file_result)
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return dict((column, _typed_column([row.get(column) for row in rows])) for column in columns)
+
+
+def to_structured(table):
+    """Converts a metadata table into a numpy structured array"""
+    columns = sorted(table)
+    dtype = [(column, table[column].dtype) for column in columns]
+    length = len(table[columns[0]]) if columns else 0
+    array = np.empty(length, dtype=dtype)
+    for column in columns:
+        array[column] = table[column]
+    return array
+
+
+def write_parquet(table, filename):
+    """Writes a metadata table into a Parquet file. Requires pyarrow."""
+    import pyarrow
+    import pyarrow.parquet
+    arrow_table = pyarrow.table(dict((column, values.tolist() if values.dtype == object else values)
+                                     for column, values in table.items()))
+    pyarrow.parquet.write_table(arrow_table, filename)
+
+
+def _column_value(value):
+    value = _to_str(value)
+    if isinstance(value, np.generic):
+        value = _to_str(value.item())
+    elif isinstance(value, np.ndarray):
+        value = [_to_str(item) for item in value.tolist()]
+    return value
+
+
+def _typed_column(values):
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        if len(present) == len(values) and all(isinstance(value, int) for value in present):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if present and all(isinstance(value, str) for value in present):
+        return np.array(['' if value is None else value for value in values], dtype=str)
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Geometry module calculates the coordinates of polar volume bins.
+
+Beam heights and ground ranges are calculated using the effective earth
+radius model, by default with the 4/3 earth radius. The effective radius can
+also be derived from the vertical gradient of refractivity. Latitudes and
+longitudes are calculated on a spherical earth.
+
+Calculated coordinates are stored in a cache whose keys describe the scan
+geometry and the radar site, so all the sweeps and files with the same scan
+strategy share one calculation. Cached arrays are read only.
+
+Examples
+--------
+>>> geometry = sweep_geometry(60.27, 24.87, 60.0, 0.5, 360, 500, 500.0)
+>>> print(geometry.height.shape, geometry.lat.shape)
+(500,) (360, 500)
+"""
+from . import profiling
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+EARTH_RADIUS = 6371000.0
+
+SweepGeometry = namedtuple('SweepGeometry', ['azimuth', 'range', 'ground_range', 'height', 'lat', 'lon'])
+
+
+def effective_radius_factor(refractivity_gradient=None):
+    """Returns the effective earth radius factor k.
+
+    Keywords
+    --------
+    refractivity_gradient : float
+        Vertical gradient of refractivity in N units per km. If not given,
+        the standard atmosphere value 4/3 is returned.
+    """
+    if refractivity_gradient is None:
+        return 4.0 / 3.0
+    return 1.0 / (1.0 + EARTH_RADIUS * refractivity_gradient * 1e-9)
+
+
+def beam_height(ranges, elangle, site_height=0.0, k=4.0/3.0):
+    """Returns the height of the beam centre above sea level in meters.
+
+    Parameters
+    ----------
+    ranges : ndarray
+        Distances along the beam in meters
+    elangle : float
+        Elevation angle in degrees
+
+    Keywords
+    --------
+    site_height : float
+        Height of the radar antenna above sea level in meters
+    k : float
+        Effective earth radius factor
+    """
+    radius = k * EARTH_RADIUS
+    sin_elangle = np.sin(np.radians(elangle))
+    return np.sqrt(ranges**2 + radius**2 + 2.0 * ranges * radius * sin_elangle) - radius + site_height
+
+
+def ground_range(ranges, elangle, k=4.0/3.0):
+    """Returns the distance along the earth surface in meters.
+
+    Parameters
+    ----------
+    ranges : ndarray
+        Distances along the beam in meters
+    elangle : float
+        Elevation angle in degrees
+
+    Keywords
+    --------
+    k : float
+        Effective earth radius factor
+    """
+    radius = k * EARTH_RADIUS
+    height = beam_height(ranges, elangle, 0.0, k)
+    return radius * np.arcsin(ranges * np.cos(np.radians(elangle)) / (radius + height))
+
+
+def destination(lat, lon, azimuths, distances):
+    """Returns latitudes and longitudes of points at given azimuths and
+    surface distances from a site. Result arrays are of shape
+    (azimuths, distances).
+    """
+    lat1 = np.radians(lat)
+    azimuth = np.radians(np.asarray(azimuths))[:, np.newaxis]
+    delta = np.asarray(distances)[np.newaxis, :] / EARTH_RADIUS
+    sin_lat2 = np.sin(lat1) * np.cos(delta) + np.cos(lat1) * np.sin(delta) * np.cos(azimuth)
+    lat2 = np.arcsin(sin_lat2)
+    lon2 = np.radians(lon) + np.arctan2(np.sin(azimuth) * np.sin(delta) * np.cos(lat1),
+                                        np.cos(delta) - np.sin(lat1) * sin_lat2)
+    return np.degrees(lat2), (np.degrees(lon2) + 540.0) % 360.0 - 180.0
+
+
+def polar_coordinates(lat, lon, lats, lons):
+    """Returns azimuths in degrees and surface distances in meters of
+    points seen from a site. Inverse of destination.
+
+    Parameters
+    ----------
+    lat, lon : float
+        Position of the site in degrees
+    lats, lons : ndarray
+        Positions of the points in degrees
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlon = np.radians(lons) - np.radians(lon)
+    haversine = np.sin((lat2 - lat1) / 2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0)**2
+    distances = 2.0 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(haversine, 0.0, 1.0)))
+    azimuths = np.arctan2(np.sin(dlon) * np.cos(lat2),
+                          np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon))
+    return np.degrees(azimuths) % 360.0, distances
+
+
+def slant_range(ground_ranges, elangle, k=4.0/3.0):
+    """Returns the distances along the beam in meters of points at given
+    surface distances. Inverse of ground_range. Points that the beam
+    does not reach are nan.
+
+    Parameters
+    ----------
+    ground_ranges : ndarray
+        Distances along the earth surface in meters
+    elangle : float
+        Elevation angle in degrees
+
+    Keywords
+    --------
+    k : float
+        Effective earth radius factor
+    """
+    radius = k * EARTH_RADIUS
+    theta = np.asarray(ground_ranges) / radius
+    cos_angle = np.cos(theta + np.radians(elangle))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(cos_angle > 0, radius * np.sin(theta) / cos_angle, np.nan)
+
+
+class GeometryCache(object):
+    """Least recently used cache of sweep geometries with bounded memory.
+
+    Keywords
+    --------
+    maxbytes : int
+        Maximum total size of the cached arrays
+
+    Attributes
+    ----------
+    hits : int
+        Number of geometries found from the cache
+    misses : int
+        Number of calculated geometries
+    nbytes : int
+        Current size of the cached arrays
+    """
+    def __init__(self, maxbytes=256 * 2**20):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._geometries = OrderedDict()
+
+    def __len__(self):
+        return len(self._geometries)
+
+    def clear(self):
+        """Removes all the geometries from the cache"""
+        self._geometries.clear()
+        self.nbytes = 0
+
+    def sweep_geometry(self, lat, lon, site_height, elangle, nrays, nbins, rscale, rstart=0.0,
+                       k=4.0/3.0, dtype=np.float64):
+        """Returns the coordinates of the bins of a sweep.
+
+        Parameters
+        ----------
+        lat, lon : float
+            Position of the radar in degrees
+        site_height : float
+            Height of the radar antenna above sea level in meters
+        elangle : float
+            Elevation angle in degrees
+        nrays, nbins : int
+            Number of rays and bins of the sweep
+        rscale : float
+            Length of the bins in meters
+
+        Keywords
+        --------
+        rstart : float
+            Distance of the start of the first bin from the radar in km
+        k : float
+            Effective earth radius factor
+        dtype : numpy.dtype
+            Type of the coordinate arrays, e.g. float32 to halve the memory
+
+        Returns
+        -------
+        geometry : SweepGeometry
+            Named tuple of azimuths (nrays,), ranges, ground ranges and
+            heights (nbins,), and latitudes and longitudes (nrays, nbins).
+        """
+        dtype = np.dtype(dtype)
+        key = (float(lat), float(lon), float(site_height), float(elangle), int(nrays), int(nbins),
+               float(rscale), float(rstart), float(k), dtype.str)
+        profiler = profiling.ACTIVE
+        if key in self._geometries:
+            self._geometries.move_to_end(key)
+            self.hits += 1
+            if profiler is not None:
+                profiler.count('geometry_cache_hits')
+            return self._geometries[key]
+        self.misses += 1
+        if profiler is not None:
+            profiler.count('geometry_cache_misses')
+
+        azimuths = (np.arange(nrays) + 0.5) * 360.0 / nrays
+        ranges = rstart * 1000.0 + (np.arange(nbins) + 0.5) * rscale
+        surface = ground_range(ranges, elangle, k)
+        heights = beam_height(ranges, elangle, site_height, k)
+        lats, lons = destination(lat, lon, azimuths, surface)
+        arrays = []
+        for array in (azimuths, ranges, surface, heights, lats, lons):
+            array = array.astype(dtype)
+            array.flags.writeable = False
+            arrays.append(array)
+        geometry = SweepGeometry(*arrays)
+
+        size = sum(array.nbytes for array in arrays)
+        if size <= self.maxbytes:
+            self._geometries[key] = geometry
+            self.nbytes += size
+            while self.nbytes > self.maxbytes:
+                old_key, old_geometry = self._geometries.popitem(last=False)
+                self.nbytes -= sum(array.nbytes for array in old_geometry)
+        return geometry
+
+
+DEFAULT_CACHE = GeometryCache()
+
+
+def sweep_geometry(*args, **kwargs):
+    """Returns the coordinates of the bins of a sweep using the default
+    cache. See GeometryCache.sweep_geometry for the parameters."""
+    return DEFAULT_CACHE.sweep_geometry(*args, **kwargs)
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 import h5py
 import numpy as np
+import hashlib
+import itertools
 import os
+import time
+import zlib
 from collections import namedtuple
+from . import profiling
 PathValue = namedtuple('PathValue', ['path', 'value'])
+Difference = namedtuple('Difference', ['path', 'kind', 'name', 'first', 'second'])
 
 
 class HiisiHDF(h5py.File):
@@ -11,21 +17,129 @@ class HiisiHDF(h5py.File):
 
     Module offers easy to use search, and write methods for handling
     HDF5 files.
+
+    Besides file names and file-like objects accepted by h5py.File, files
+    can be opened from bytes, bytearray or memoryview objects containing a
+    complete HDF5 file, e.g. a payload received over the network. The
+    payload is loaded as a file image of the in-memory core driver, so
+    nothing is written to disk. Mode 'r+' allows modifying the image in
+    memory. Of the other keywords of h5py.File, only the chunk cache
+    keywords rdcc_nbytes, rdcc_nslots and rdcc_w0 are supported. Files
+    can be created in memory using io.BytesIO objects, and the finished
+    file is returned by to_bytes.
+
+    Examples
+    --------
+    >>> with HiisiHDF(payload) as h5f:
+            print(h5f.datasets())
+    >>> with HiisiHDF(io.BytesIO(), 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+            payload = h5f.to_bytes()
     """
+    DIGEST_ATTR = 'hiisi_digest'
+    DATASET_KEYS = ('DATASET', 'FILLVALUE')
     CACHE = {'search_attribute':None,
              'dataset_paths':[],
              'group_paths':[],
-             'attribute_paths':[]}
+             'attribute_paths':[],
+             'attribute_objects':[]}
+
+    _IMAGE_NUMBERS = itertools.count()
 
     def __init__(self, *args, **kwargs):
+        if args and isinstance(args[0], (bytes, bytearray, memoryview)):
+            mode = args[1] if len(args) > 1 else kwargs.pop('mode', 'r')
+            args = (HiisiHDF._open_image(args[0], mode, **kwargs),)
+            kwargs = {}
         super(HiisiHDF, self).__init__(*args, **kwargs)
+        self._metadata = None
+
+    @staticmethod
+    def _open_image(image, mode, rdcc_nbytes=None, rdcc_w0=None, rdcc_nslots=None, **kwargs):
+        """Opens a file image with the core driver and returns the FileID.
+        Chunk cache keywords of h5py.File are applied, other keywords are
+        not supported."""
+        if mode not in ('r', 'r+'):
+            raise ValueError("Files opened from bytes support only modes 'r' and 'r+'")
+        if kwargs:
+            raise TypeError('Keywords not supported for files opened from bytes: {}'.format(
+                ', '.join(sorted(kwargs))))
+        fapl = h5py.h5p.create(h5py.h5p.FILE_ACCESS)
+        fapl.set_fapl_core(backing_store=False)
+        fapl.set_file_image(image)
+        if (rdcc_nbytes, rdcc_w0, rdcc_nslots) != (None, None, None):
+            mdc_nelmts, nslots, nbytes, w0 = fapl.get_cache()
+            fapl.set_cache(mdc_nelmts, nslots if rdcc_nslots is None else rdcc_nslots,
+                           nbytes if rdcc_nbytes is None else rdcc_nbytes, w0 if rdcc_w0 is None else rdcc_w0)
+        # Name of the image must be unique, otherwise HDF5 would consider
+        # images opened at the same time to be the same file
+        name = 'hiisi-image-{}'.format(next(HiisiHDF._IMAGE_NUMBERS)).encode('ascii')
+        flags = h5py.h5f.ACC_RDONLY if mode == 'r' else h5py.h5f.ACC_RDWR
+        return h5py.h5f.open(name, flags, fapl=fapl)
+
+    def to_bytes(self):
+        """Flushes the file and returns its contents as bytes.
+
+        Works for files on disk, files opened from bytes and files created
+        in file-like objects.
+        """
+        self.flush()
+        return self.id.get_file_image()
+
+    def visititems(self, func):
+        profiler = profiling.ACTIVE
+        if profiler is None:
+            return super(HiisiHDF, self).visititems(func)
+        start = time.perf_counter()
+        result = super(HiisiHDF, self).visititems(func)
+        profiler.count('visititems')
+        profiler.timing('visititems', time.perf_counter() - start)
+        return result
+
+    def _visit(self, func, path='/'):
+        """Calls func(name, obj) for the object at path and for every object
+        below it. Traversal stops when func returns a value other than None,
+        and the value is returned."""
+        obj = self[path]
+        result = func(obj.name, obj)
+        if result is not None or not isinstance(obj, h5py.Group):
+            return result
+        if obj.name == '/':
+            return self.visititems(func)
+        profiler = profiling.ACTIVE
+        if profiler is None:
+            return obj.visititems(func)
+        start = time.perf_counter()
+        result = obj.visititems(func)
+        profiler.count('visititems')
+        profiler.timing('visititems', time.perf_counter() - start)
+        return result
+
+    def _read_dataset(self, name, out=None, source_sel=None, dest_sel=None):
+        """Reads the dataset or the source_sel part of it. If out array is
+        given, values are read directly into it, or into its dest_sel part.
+        """
+        dataset = self[name]
+        profiler = profiling.ACTIVE
+        if profiler is not None:
+            start = time.perf_counter()
+        if out is None:
+            out = dataset[:] if source_sel is None else dataset[source_sel]
+            nbytes = out.nbytes
+        else:
+            dataset.read_direct(out, source_sel, dest_sel)
+            nbytes = out.nbytes if dest_sel is None else out[dest_sel].nbytes
+        if profiler is not None:
+            profiler.read(self.filename, dataset.name, nbytes, time.perf_counter() - start)
+        return out
 
     @staticmethod
     def _clear_cache():
         HiisiHDF.CACHE = {'search_attribute':None,
                           'dataset_paths':[],
                           'group_paths':[],
-                          'attribute_paths':[]}
+                          'attribute_paths':[],
+                          'attribute_objects':[]}
 
     @staticmethod
     def _is_dataset(name, obj):
@@ -41,6 +155,7 @@ class HiisiHDF(h5py.File):
     def _find_attr_paths(name, obj):
         if HiisiHDF.CACHE['search_attribute'] in obj.attrs:
             HiisiHDF.CACHE['attribute_paths'].append(obj.name)
+            HiisiHDF.CACHE['attribute_objects'].append(obj)
 
     @staticmethod
     def _is_attr_path(name, obj):
@@ -50,22 +165,45 @@ class HiisiHDF(h5py.File):
     def attr_exists(self, attr):
         """Returns True if at least on instance of the attribute is found
         """
-        gen = self.attr_gen(attr)
-        n_instances = len(list(gen))
-        if n_instances > 0:
-            return True
-        else:
-            return False
+        return self.attr_count(attr, limit=1) > 0
 
     def is_unique_attr(self, attr):
         """Returns true if only single instance of the attribute is found
         """
-        gen = self.attr_gen(attr)
-        n_instances = len(list(gen))
-        if n_instances == 1:
-            return True
-        else:
-            return False
+        return self.attr_count(attr, limit=2) == 1
+
+    def attr_count(self, attr, limit=None, path='/'):
+        """Returns the number of groups and datasets that have the attribute.
+
+        Only the existence of the attribute is checked, values are not read.
+
+        Parameters
+        ----------
+        attr : str
+            Name of the attribute
+
+        Keywords
+        --------
+        limit : int
+            Stop the search after limit instances have been found
+        path : str
+            Search only the group at path and the objects below it
+
+        Examples
+        --------
+        >>> h5f.attr_count('elangle')
+        5
+        >>> h5f.attr_count('elangle', limit=2)
+        2
+        """
+        count = [0]
+        def _count(name, obj):
+            if attr in obj.attrs:
+                count[0] += 1
+                if limit is not None and count[0] >= limit:
+                    return True
+        self._visit(_count, path)
+        return count[0]
 
     def datasets(self):
         """Method returns a list of dataset paths.
@@ -100,15 +238,64 @@ class HiisiHDF(h5py.File):
         self.visititems(HiisiHDF._is_group)
         return HiisiHDF.CACHE['group_paths']
 
-    def attr_gen(self, attr):
+    def metadata(self, refresh=False):
+        """Returns a dictionary containing the attributes of every group and
+        dataset in the file.
+
+        The metadata index is built with a single walk through the file and
+        it is kept in memory, so repeated queries do not touch the file again.
+        Index is cleared by create_from_filedict. If the file is modified
+        by other means, use refresh keyword to rebuild the index.
+
+        Keywords
+        --------
+        refresh : bool
+            Rebuild the index even if it already exists.
+
+        Returns
+        -------
+        metadata : dict
+            Dictionary whose keys are group and dataset paths and whose
+            values are dictionaries of the attributes of the path.
+
+        Examples
+        --------
+        >>> metadata = h5f.metadata()
+        >>> print(metadata['/dataset1/where']['elangle'])
+        0.5
+        """
+        profiler = profiling.ACTIVE
+        if refresh or self._metadata is None:
+            index = {'/': dict(self['/'].attrs)}
+            def _index_attrs(name, obj):
+                index[obj.name] = dict(obj.attrs)
+            self.visititems(_index_attrs)
+            self._metadata = index
+            if profiler is not None:
+                profiler.count('cache_misses')
+                profiler.count('attributes_read', sum(len(attrs) for attrs in index.values()))
+        elif profiler is not None:
+            profiler.count('cache_hits')
+        return self._metadata
+
+    def attr_gen(self, attr, path='/'):
         """Returns attribute generator that yields namedtuples containing
         path value pairs
+
+        Paths are collected with one walk through the file. Values are read
+        from the objects found during the walk only when the generator is
+        advanced, so the objects are not reopened by path.
         
         Parameters
         ----------
         attr : str
             Name of the search attribute
 
+        Keywords
+        --------
+        path : str
+            Search only the group at path and the objects below it
+
         Returns
         -------
         attr_generator : generator
@@ -127,24 +314,54 @@ class HiisiHDF(h5py.File):
         """
         HiisiHDF._clear_cache()
         HiisiHDF.CACHE['search_attribute'] = attr
-        HiisiHDF._find_attr_paths('/', self['/']) # Check root attributes
-        self.visititems(HiisiHDF._find_attr_paths)
-        path_attr_gen = (PathValue(attr_path, self[attr_path].attrs.get(attr)) for attr_path in HiisiHDF.CACHE['attribute_paths'])
+        self._visit(HiisiHDF._find_attr_paths, path) # Root attributes are checked first
+        # Values are read from the handles opened during the search
+        path_attr_gen = (PathValue(obj.name, obj.attrs.get(attr)) for obj in HiisiHDF.CACHE['attribute_objects'])
+        if profiling.ACTIVE is not None:
+            path_attr_gen = HiisiHDF._counted(path_attr_gen, profiling.ACTIVE)
         return path_attr_gen
 
+    @staticmethod
+    def _counted(path_attr_gen, profiler):
+        for path_attr_pair in path_attr_gen:
+            profiler.count('attributes_read')
+            yield path_attr_pair
+
 
-    def create_from_filedict(self, filedict):
+    def create_from_filedict(self, filedict, incremental=False):
         """
         Creates h5 file from dictionary containing the file structure.
         
         Filedict is a regular dictinary whose keys are hdf5 paths and whose
         values are dictinaries containing the metadata and datasets. Metadata
         is given as normal key-value -pairs and dataset arrays are given using
-        'DATASET' key. Datasets must be numpy arrays.
+        'DATASET' key. Datasets must be numpy arrays or h5py.VirtualLayouts.
+        Virtual datasets are created from VirtualLayouts, and the value of
+        unmapped elements can be given using 'FILLVALUE' key.
                 
         Method can also be used to append existing hdf5 file. If the file is
         opened in read only mode, method does nothing.
 
+        Keywords
+        --------
+        incremental : bool
+            If True, only the datasets and attributes that differ from the
+            stored ones are written. Values of existing datasets are also
+            updated. A digest of each dataset is stored in attribute
+            DIGEST_ATTR and compared to the digest of the new array, so
+            unchanged datasets are not read or written. Datasets without
+            a stored digest are compared to the new array once. Stored
+            digests are trusted, so a dataset modified by other writers
+            without updating DIGEST_ATTR is not rewritten if the new array
+            matches the digest. Byte string attributes are compared to str
+            values as decoded strings, and changed values keep the stored
+            fixed length string type.
+
+        Returns
+        -------
+        written : list
+            Paths whose data or attributes were written
+
         Examples
         --------
         Create newfile.h5 and fill it with data and metadata
@@ -154,14 +371,27 @@ class HiisiHDF(h5py.File):
                         '/dataset1/data1/data':{'DATASET':np.zeros(100), 'quantity':'emptyarray'}, 'B':'b'}
         >>> h5f.create_from_filedict(filedict)
 
+        Regenerate the file writing only the changed content
+
+        >>> h5f = HiisiHDF('newfile.h5', 'a')
+        >>> filedict['/dataset1/data1/data']['DATASET'] = np.ones(100)
+        >>> h5f.create_from_filedict(filedict, incremental=True)
+        ['/dataset1/data1/data']
         """
+        written = []
         if self.mode in ['r+','w', 'w-', 'x', 'a']:
+            self._metadata = None
             for h5path, path_content in filedict.items():
+                if incremental:
+                    if self._write_incremental(h5path, path_content):
+                        written.append(h5path)
+                    continue
+                written.append(h5path)
                 if 'DATASET' in path_content.keys():
                     # If path exist, write only metadata
                     if h5path in self:
                         for key, value in path_content.items():
-                            if key != 'DATASET':
+                            if key not in HiisiHDF.DATASET_KEYS:
                                 self[h5path].attrs[key] = value
                     else:
                         try:
@@ -169,9 +399,9 @@ class HiisiHDF(h5py.File):
                         except ValueError:
                             group = self[os.path.dirname(h5path)]
                             pass # This pass has no effect?
-                        new_dataset = group.create_dataset(os.path.basename(h5path), data=path_content['DATASET'])
+                        new_dataset = HiisiHDF._create_dataset(group, os.path.basename(h5path), path_content)
                         for key, value in path_content.items():
-                            if key != 'DATASET':
+                            if key not in HiisiHDF.DATASET_KEYS:
                                 new_dataset.attrs[key] = value
                 else:
                     try:  
@@ -180,8 +410,192 @@ class HiisiHDF(h5py.File):
                         group = self[h5path]
                     for key, value in path_content.items():
                         group.attrs[key] = value
+        return written
+
+    def _write_incremental(self, h5path, path_content):
+        """Writes the changed content of one filedict path. Returns True if
+        anything was written."""
+        changed = False
+        if isinstance(path_content.get('DATASET'), h5py.VirtualLayout):
+            # Virtual datasets contain no data, they are always recreated
+            if h5path in self:
+                del self[h5path]
+            group = self.require_group(os.path.dirname(h5path))
+            dataset = HiisiHDF._create_dataset(group, os.path.basename(h5path), path_content)
+            changed = True
+        elif 'DATASET' in path_content:
+            data = np.asarray(path_content['DATASET'])
+            digest = HiisiHDF._digest(data)
+            dataset = self.get(h5path)
+            if dataset is None:
+                dataset = self.require_group(os.path.dirname(h5path)).create_dataset(os.path.basename(h5path), data=data)
+                changed = True
+            elif dataset.attrs.get(HiisiHDF.DIGEST_ATTR) == digest:
+                pass
+            elif dataset.shape == data.shape and dataset.dtype == data.dtype:
+                # Datasets without a stored digest are compared once
+                if HiisiHDF.DIGEST_ATTR in dataset.attrs or not np.array_equal(dataset[()], data):
+                    dataset[()] = data
+                    changed = True
+            else:
+                del self[h5path]
+                dataset = self.require_group(os.path.dirname(h5path)).create_dataset(os.path.basename(h5path), data=data)
+                changed = True
+            if dataset.attrs.get(HiisiHDF.DIGEST_ATTR) != digest:
+                dataset.attrs[HiisiHDF.DIGEST_ATTR] = digest
+        else:
+            dataset = self.require_group(h5path)
+        for key, value in path_content.items():
+            if key in HiisiHDF.DATASET_KEYS:
+                continue
+            stored = dataset.attrs.get(key)
+            if not HiisiHDF._same_attr(stored, value):
+                if isinstance(value, str) and stored is not None and np.asarray(stored).dtype.kind == 'S':
+                    value = np.bytes_(value)
+                dataset.attrs[key] = value
+                changed = True
+        return changed
+
+    @staticmethod
+    def _create_dataset(group, name, path_content):
+        data = path_content['DATASET']
+        if isinstance(data, h5py.VirtualLayout):
+            return group.create_virtual_dataset(name, data, fillvalue=path_content.get('FILLVALUE'))
+        return group.create_dataset(name, data=data)
+
+    @staticmethod
+    def _digest(data):
+        digest = hashlib.sha1('{}{}'.format(data.dtype.str, data.shape).encode('ascii'))
+        digest.update(np.ascontiguousarray(data))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _same_attr(stored, value):
+        """Compares a stored attribute to a new value. Byte strings and str
+        are compared as decoded strings."""
+        if stored is None:
+            return False
+        stored = np.asarray(stored)
+        value = np.asarray(value)
+        if stored.dtype.kind in 'SU' and value.dtype.kind in 'SU':
+            stored, value = [np.char.decode(array, 'utf-8') if array.dtype.kind == 'S' else array
+                             for array in (stored, value)]
+        return stored.dtype.kind == value.dtype.kind and stored.shape == value.shape and np.array_equal(stored, value)
+
+    def diff(self, other, checksums=True):
+        """Compares the structure, metadata and datasets of two files.
+
+        Structure and attributes are compared using the metadata indexes of
+        the files. Datasets with the same chunking and compression are
+        compared using checksums of the stored chunks, so the chunks are
+        not decompressed. Other datasets are compared chunk by chunk.
+
+        Parameters
+        ----------
+        other : str or HiisiHDF
+            The file compared to this file
+
+        Keywords
+        --------
+        checksums : bool
+            If False, only structure and metadata are compared.
+
+        Returns
+        -------
+        differences : list
+            A list of named tuples with fields path, kind, name, first and
+            second. Kind is 'object' if the path exists only in one file
+            or has a different type, 'attribute' if an attribute differs,
+            'shape' or 'dtype' if the datasets have different shape or type,
+            and 'data' if dataset values differ. Name is the attribute name
+            or the offset of a differing chunk. First and second are the
+            values in this and the other file.
+
+        Examples
+        --------
+        >>> for difference in h5f.diff('old_version.h5'):
+                print(difference)
+        Difference(path='/dataset1/what', kind='attribute', name='enddate', first=b'20150719', second=b'20150720')
+        Difference(path='/dataset1/data1/data', kind='data', name=(0, 40), first=3164501, second=1077266803)
+        """
+        if not isinstance(other, HiisiHDF):
+            with HiisiHDF(other, 'r') as other_h5f:
+                return self.diff(other_h5f, checksums)
+        differences = []
+        first_metadata = self.metadata()
+        second_metadata = other.metadata()
+        for path in sorted(set(first_metadata) | set(second_metadata)):
+            first_type = HiisiHDF._object_type(self, path)
+            second_type = HiisiHDF._object_type(other, path)
+            if first_type != second_type:
+                differences.append(Difference(path, 'object', None, first_type, second_type))
+                continue
+            first_attrs = first_metadata[path]
+            second_attrs = second_metadata[path]
+            for name in sorted(set(first_attrs) | set(second_attrs)):
+                first_value = first_attrs.get(name)
+                second_value = second_attrs.get(name)
+                if not HiisiHDF._equal_values(first_value, second_value):
+                    differences.append(Difference(path, 'attribute', name, first_value, second_value))
+            if first_type == 'dataset':
+                first_dataset = self[path]
+                second_dataset = other[path]
+                if first_dataset.shape != second_dataset.shape:
+                    differences.append(Difference(path, 'shape', None, first_dataset.shape, second_dataset.shape))
+                elif first_dataset.dtype != second_dataset.dtype:
+                    differences.append(Difference(path, 'dtype', None, first_dataset.dtype, second_dataset.dtype))
+                elif checksums:
+                    differences.extend(HiisiHDF._data_differences(first_dataset, second_dataset))
+        return differences
+
+    @staticmethod
+    def _object_type(h5f, path):
+        object_class = h5f.get(path, getclass=True)
+        if object_class is None:
+            return None
+        return 'dataset' if issubclass(object_class, h5py.Dataset) else 'group'
+
+    @staticmethod
+    def _equal_values(first, second):
+        if type(first) != type(second):
+            return False
+        if isinstance(first, np.ndarray):
+            return first.shape == second.shape and np.array_equal(first, second, equal_nan=first.dtype.kind in 'fc')
+        return bool(first == second) or (first != first and second != second)
+
+    @staticmethod
+    def _chunk_checksums(dataset):
+        checksums = {}
+        for i in range(dataset.id.get_num_chunks()):
+            offset = dataset.id.get_chunk_info(i).chunk_offset
+            filter_mask, chunk = dataset.id.read_direct_chunk(offset)
+            checksums[offset] = (filter_mask, zlib.crc32(chunk))
+        return checksums
+
+    @staticmethod
+    def _data_differences(first, second):
+        storage = ['chunks', 'compression', 'compression_opts', 'shuffle', 'fletcher32', 'scaleoffset']
+        same_storage = all(getattr(first, key) == getattr(second, key) for key in storage)
+        if first.chunks is not None and same_storage:
+            first_checksums = HiisiHDF._chunk_checksums(first)
+            second_checksums = HiisiHDF._chunk_checksums(second)
+            return [Difference(first.name, 'data', offset, first_checksums.get(offset), second_checksums.get(offset))
+                    for offset in sorted(set(first_checksums) | set(second_checksums))
+                    if first_checksums.get(offset) != second_checksums.get(offset)]
+        # Storage differs, compare decoded values one chunk or row block at a time
+        if first.shape == ():
+            selections = [()]
+        elif first.chunks is not None:
+            selections = first.iter_chunks()
+        else:
+            rows = max(1, 2**20 // max(1, first.dtype.itemsize * int(np.prod(first.shape[1:]))))
+            selections = (np.s_[i:i + rows] for i in range(0, first.shape[0], rows))
+        for selection in selections:
+            if not np.array_equal(first[selection], second[selection], equal_nan=first.dtype.kind in 'fc'):
+                return [Difference(first.name, 'data', None, None, None)]
+        return []
 
-    def search(self, attr, value, tolerance=0):
+    def search(self, attr, value, tolerance=0, path='/', limit=None):
         """Find paths with a key value match
 
         Parameters
@@ -198,6 +612,10 @@ class HiisiHDF(h5py.File):
             attributes. If the value of the attribute found from the file
             differs from the searched value less than the tolerance, attributes
             are considered to be the same.
+        path : str
+            search only the group at path and the objects below it
+        limit : int
+            stop the search after limit matches have been found
 
         Returns
         -------
@@ -218,26 +636,61 @@ class HiisiHDF(h5py.File):
         '/dataset3/data2/what'
         '/dataset4/data2/what'
         '/dataset5/data2/what'
-        
+
+        >>> h5f.search('quantity', 'DBZH', path='/dataset3', limit=1)
+        ['/dataset3/data2/what']
         """
         found_paths = []
-        gen = self.attr_gen(attr)
-        for path_attr_pair in gen:
-            # if attribute is numerical use numerical_value_tolerance in
-            # value comparison. If attribute is string require exact match
-            if isinstance(path_attr_pair.value, str):
-                type_name = 'str'
-            else:
-                type_name = path_attr_pair.value.dtype.name
-            if 'int' in type_name or 'float' in type_name:
-                if abs(path_attr_pair.value - value) <= tolerance:
-                    found_paths.append(path_attr_pair.path)
-            elif 'bytes' in type_name:
-                if np.bytes_(value) == path_attr_pair.value:
-                    found_paths.append(path_attr_pair.path)
-            else:
-                if path_attr_pair.value == value:
-                    found_paths.append(path_attr_pair.path)
-
+        profiler = profiling.ACTIVE
+        def _match(name, obj):
+            if attr in obj.attrs:
+                if profiler is not None:
+                    profiler.count('attributes_read')
+                if HiisiHDF._matches(obj.attrs[attr], value, tolerance):
+                    found_paths.append(obj.name)
+                    if limit is not None and len(found_paths) >= limit:
+                        return True
+        self._visit(_match, path)
         return found_paths
 
+    def first(self, attr, path='/'):
+        """Returns the first instance of the attribute as a namedtuple with
+        field names path and value, or None if the attribute is not found.
+
+        Search stops at the first match.
+
+        Keywords
+        --------
+        path : str
+            search only the group at path and the objects below it
+
+        Examples
+        --------
+        >>> print(h5f.first('rscale', '/dataset3'))
+        PathValue(path='/dataset3/where', value=500.0)
+        """
+        found = []
+        def _first(name, obj):
+            if attr in obj.attrs:
+                found.append(PathValue(obj.name, obj.attrs[attr]))
+                return True
+        self._visit(_first, path)
+        if profiling.ACTIVE is not None and found:
+            profiling.ACTIVE.count('attributes_read')
+        return found[0] if found else None
+
+    @staticmethod
+    def _matches(found_value, value, tolerance):
+        # if attribute is numerical use numerical_value_tolerance in
+        # value comparison. If attribute is string require exact match
+        if isinstance(found_value, str):
+            type_name = 'str'
+        else:
+            type_name = found_value.dtype.name
+        if 'int' in type_name or 'float' in type_name:
+            return abs(found_value - value) <= tolerance
+        elif 'bytes' in type_name:
+            return np.bytes_(value) == found_value
+        else:
+            return found_value == value
+
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+Mosaic module builds composites of many polar volumes on a common grid.
+
+Compositing has three stages:
+
+1. Each radar is projected onto the grid in a process pool. For every grid
+   pixel within the reach of the radar, an index map tells which bin of the
+   sweep covers it and the ground distance and beam height of the bin.
+   Index maps depend only on the radar site, the scan geometry and the grid,
+   so they are cached and calculated once per scan strategy. The cache can
+   also be stored in a directory to be shared by processes and runs.
+2. Projected values are merged with a vectorized per-pixel rule: 'max'
+   takes the maximum value, 'nearest' the value of the nearest radar,
+   'lowest' the value of the lowest beam and 'weighted' the inverse
+   distance squared weighted mean. Undetect is kept if no radar measured a
+   value at the pixel.
+3. Composite is written in the odim COMP layout with create_from_filedict.
+
+Grid is a regular longitude-latitude grid whose first row is the northmost.
+
+Examples
+--------
+>>> grid = Grid(west=18.0, south=58.0, east=32.0, north=70.0, xsize=1400, ysize=1200)
+>>> result = composite(sorted(glob('pvol/*.h5')), grid, 'DBZH', rule='lowest', workers=8,
+                       cache_dir='/var/cache/hiisi')
+>>> write_composite('comp.h5', result, grid, 'DBZH', 'lowest',
+                    encoding={'dtype':'uint8', 'gain':0.5, 'offset':-32.0, 'nodata':255, 'undetect':0})
+"""
+from . import profiling
+from .geometry import beam_height, polar_coordinates, slant_range
+from .hiisihdf import HiisiHDF
+from .odim import MissingMetadataError, OdimPVOL, _datetime64, _decode, _inherited_attrs, _node
+from .parallel import map_files
+from collections import OrderedDict, namedtuple
+from functools import partial
+import hashlib
+import numpy as np
+import os
+import tempfile
+import zipfile
+
+Grid = namedtuple('Grid', ['west', 'south', 'east', 'north', 'xsize', 'ysize'])
+
+IndexMap = namedtuple('IndexMap', ['pixels', 'bins', 'distance', 'height'])
+
+RULES = ('max', 'nearest', 'lowest', 'weighted')
+
+CAMETHODS = {'max':'MAXIMUM', 'nearest':'NEAREST', 'lowest':'HEIGHT', 'weighted':'DOMAIN'}
+
+DEFAULT_ENCODING = {'dtype':'float32', 'gain':1.0, 'offset':0.0, 'nodata':-9999.0, 'undetect':-8888.0}
+
+
+class IndexMapCache(object):
+    """Least recently used cache of index maps with bounded memory.
+
+    Keywords
+    --------
+    maxbytes : int
+        Maximum total size of the cached arrays
+    directory : str
+        If given, index maps are also stored in and loaded from .npz files
+        of the directory
+
+    Attributes
+    ----------
+    hits : int
+        Number of index maps found from the memory or the directory
+    misses : int
+        Number of calculated index maps
+    """
+    def __init__(self, maxbytes=512 * 2**20, directory=None):
+        self.maxbytes = maxbytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._maps = OrderedDict()
+
+    def __len__(self):
+        return len(self._maps)
+
+    def clear(self):
+        """Removes all the index maps from the memory"""
+        self._maps.clear()
+        self.nbytes = 0
+
+    def index_map(self, grid, lat, lon, site_height, elangle, nrays, nbins, rscale, rstart=0.0, k=4.0/3.0):
+        """Returns the index map of a sweep.
+
+        Parameters
+        ----------
+        grid : Grid
+            Composite grid
+        lat, lon : float
+            Position of the radar in degrees
+        site_height : float
+            Height of the radar antenna above sea level in meters
+        elangle : float
+            Elevation angle in degrees
+        nrays, nbins : int
+            Number of rays and bins of the sweep
+        rscale : float
+            Length of the bins in meters
+
+        Keywords
+        --------
+        rstart : float
+            Distance of the start of the first bin from the radar in km
+        k : float
+            Effective earth radius factor
+
+        Returns
+        -------
+        index_map : IndexMap
+            Named tuple of flat grid pixel indexes, flat sweep bin indexes,
+            and ground distances and beam heights of the bins in meters.
+        """
+        key = (tuple(float(value) for value in grid), float(lat), float(lon), float(site_height),
+               float(elangle), int(nrays), int(nbins), float(rscale), float(rstart), float(k))
+        profiler = profiling.ACTIVE
+        index_map = self._maps.get(key)
+        if index_map is not None:
+            self._maps.move_to_end(key)
+        elif self.directory is not None:
+            index_map = self._load(key)
+        if index_map is not None:
+            self.hits += 1
+            if profiler is not None:
+                profiler.count('index_map_cache_hits')
+            self._store(key, index_map)
+            return index_map
+        self.misses += 1
+        if profiler is not None:
+            profiler.count('index_map_cache_misses')
+        index_map = _index_map(*key[1:], grid=Grid(*grid))
+        for array in index_map:
+            array.flags.writeable = False
+        self._store(key, index_map)
+        if self.directory is not None:
+            self._save(key, index_map)
+        return index_map
+
+    def _store(self, key, index_map):
+        if key in self._maps:
+            return
+        size = sum(array.nbytes for array in index_map)
+        if size <= self.maxbytes:
+            self._maps[key] = index_map
+            self.nbytes += size
+            while self.nbytes > self.maxbytes:
+                old_key, old_map = self._maps.popitem(last=False)
+                self.nbytes -= sum(array.nbytes for array in old_map)
+
+    def _filename(self, key):
+        return os.path.join(self.directory, 'index_map_{}.npz'.format(hashlib.sha1(repr(key).encode('ascii')).hexdigest()))
+
+    def _save(self, key, index_map):
+        # Written into a temporary file that replaces the cache file
+        # atomically, so other processes never read a partial file
+        handle, tmp_filename = tempfile.mkstemp(dir=self.directory, prefix='.index_map_', suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.savez(f, **index_map._asdict())
+            os.replace(tmp_filename, self._filename(key))
+        except Exception:
+            os.remove(tmp_filename)
+            raise
+
+    def _load(self, key):
+        # Missing and unreadable cache files are misses
+        try:
+            with np.load(self._filename(key)) as arrays:
+                index_map = IndexMap(*[arrays[field] for field in IndexMap._fields])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+        for array in index_map:
+            array.flags.writeable = False
+        return index_map
+
+
+DEFAULT_CACHE = IndexMapCache()
+
+_DIRECTORY_CACHES = {}
+
+
+def _index_map(lat, lon, site_height, elangle, nrays, nbins, rscale, rstart, k, grid):
+    """Calculates the index map of a sweep, see IndexMapCache.index_map"""
+    dx = (grid.east - grid.west) / grid.xsize
+    dy = (grid.north - grid.south) / grid.ysize
+    # Only the pixels within the bounding box of the maximum range are
+    # transformed
+    max_range = rstart * 1000.0 + nbins * rscale
+    lat_extent = np.degrees(max_range / 6371000.0)
+    lon_extent = lat_extent / max(np.cos(np.radians(min(abs(lat) + lat_extent, 89.0))), 1e-3)
+    rows = np.arange(max(int((grid.north - lat - lat_extent) / dy), 0),
+                     min(int(np.ceil((grid.north - lat + lat_extent) / dy)), grid.ysize))
+    cols = np.arange(max(int((lon - lon_extent - grid.west) / dx), 0),
+                     min(int(np.ceil((lon + lon_extent - grid.west) / dx)), grid.xsize))
+    lats = (grid.north - (rows + 0.5) * dy)[:, np.newaxis]
+    lons = (grid.west + (cols + 0.5) * dx)[np.newaxis, :]
+    azimuths, distances = polar_coordinates(lat, lon, lats, lons)
+    ranges = slant_range(distances, elangle, k)
+    with np.errstate(invalid='ignore'):
+        bins = np.floor((ranges - rstart * 1000.0) / rscale)
+        inside = (bins >= 0) & (bins < nbins)
+    rays = np.floor(azimuths * nrays / 360.0).astype(np.int64) % nrays
+    pixels = (rows[:, np.newaxis] * grid.xsize + cols[np.newaxis, :])[inside]
+    polar = rays[inside] * nbins + bins[inside].astype(np.int64)
+    return IndexMap(pixels.astype(np.int64), polar.astype(np.int64), distances[inside].astype(np.float32),
+                    beam_height(ranges[inside], elangle, site_height, k).astype(np.float32))
+
+
+def _index_cache(directory):
+    if directory is None:
+        return DEFAULT_CACHE
+    if directory not in _DIRECTORY_CACHES:
+        _DIRECTORY_CACHES[directory] = IndexMapCache(directory=directory)
+    return _DIRECTORY_CACHES[directory]
+
+
+def project_file(filename, grid, quantity, elangle='A', k=4.0/3.0, cache_dir=None):
+    """Projects one sweep of a polar volume onto the grid.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the polar volume
+    grid : Grid
+        Composite grid
+    quantity : str
+        Name of the quantity
+
+    Keywords
+    --------
+    elangle : str
+        Elevation angle letter of OdimPVOL
+    k : float
+        Effective earth radius factor
+    cache_dir : str
+        Directory of the stored index maps
+
+    Returns
+    -------
+    projection : dict
+        Keys filename, node, time, pixels, values, undetect, distance,
+        height and error. Values are decoded, nodata and undetect are nan
+        and undetect is a boolean array. If the file cannot be projected,
+        error contains the message and the arrays are None.
+    """
+    projection = {'filename':filename, 'node':None, 'time':np.datetime64('NaT'), 'pixels':None,
+                  'values':None, 'undetect':None, 'distance':None, 'height':None, 'error':None}
+    try:
+        with OdimPVOL(filename, 'r') as pvol:
+            path = pvol.catalogue.get(elangle, {}).get(quantity)
+            if path is None:
+                raise KeyError('Quantity {} is not found at elevation angle {}'.format(quantity, elangle))
+            metadata = pvol.metadata()
+            sweep = pvol.sweeps[pvol.sweeps['letter'] == elangle][0]
+            site = _inherited_attrs(metadata, '/', 'where')
+            root_what = metadata.get('/what', {})
+            if np.isnan(sweep['rscale']):
+                raise MissingMetadataError('Attribute rscale is not found from file', ['rscale'])
+            nrays, nbins = pvol[path].shape
+            index_map = _index_cache(cache_dir).index_map(
+                grid, site['lat'], site['lon'], site.get('height', 0.0), sweep['elangle'], nrays, nbins,
+                sweep['rscale'], 0.0 if np.isnan(sweep['rstart']) else sweep['rstart'], k)
+            raw = pvol._read_dataset(path).ravel()[index_map.bins]
+            what = _inherited_attrs(metadata, os.path.dirname(path), 'what')
+            values = raw.astype(np.float64)
+            _decode(values, what)
+            projection.update(node=_node(root_what.get('source')),
+                              time=_datetime64(root_what.get('date'), root_what.get('time')),
+                              pixels=index_map.pixels, values=values,
+                              undetect=raw == what['undetect'] if 'undetect' in what else np.zeros(raw.shape, bool),
+                              distance=index_map.distance, height=index_map.height)
+    except Exception as error:
+        projection['error'] = '{}: {}'.format(type(error).__name__, error)
+    return projection
+
+
+def merge(projections, grid, rule='max'):
+    """Merges projected radars into composite arrays.
+
+    Parameters
+    ----------
+    projections : list
+        Results of project_file, failed projections are skipped
+    grid : Grid
+        Composite grid
+
+    Keywords
+    --------
+    rule : str
+        'max', 'nearest', 'lowest' or 'weighted'
+
+    Returns
+    -------
+    data, undetect : ndarray
+        Composite values of shape (ysize, xsize), nan where no radar
+        measured a value, and the mask of undetect pixels
+    """
+    if rule not in RULES:
+        raise ValueError('Unknown rule {}, rule must be one of {}'.format(rule, RULES))
+    size = grid.xsize * grid.ysize
+    data = np.full(size, np.nan)
+    undetect = np.zeros(size, dtype=bool)
+    if rule in ('nearest', 'lowest'):
+        best = np.full(size, np.inf)
+    elif rule == 'weighted':
+        weights = np.zeros(size)
+    # Pixels of one radar are unique, so each radar is merged with
+    # vectorized fancy indexing
+    for projection in projections:
+        if projection['error'] is not None:
+            continue
+        pixels, values, radar_undetect = projection['pixels'], projection['values'], projection['undetect']
+        valid = ~np.isnan(values)
+        if rule == 'max':
+            data[pixels] = np.fmax(data[pixels], values)
+            undetect[pixels[radar_undetect]] = True
+        elif rule in ('nearest', 'lowest'):
+            key = projection['distance'] if rule == 'nearest' else projection['height']
+            better = (valid | radar_undetect) & (key < best[pixels])
+            selected = pixels[better]
+            best[selected] = key[better]
+            data[selected] = values[better]
+            undetect[selected] = radar_undetect[better]
+        else:
+            selected = pixels[valid]
+            weight = 1.0 / np.maximum(projection['distance'][valid], 1000.0)**2
+            data[selected] = np.where(weights[selected] > 0, data[selected], 0.0) + weight * values[valid]
+            weights[selected] += weight
+            undetect[pixels[radar_undetect]] = True
+    if rule == 'weighted':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data /= weights
+    undetect &= np.isnan(data)
+    return data.reshape((grid.ysize, grid.xsize)), undetect.reshape((grid.ysize, grid.xsize))
+
+
+def composite(filenames, grid, quantity, elangle='A', rule='max', workers=None, k=4.0/3.0, cache_dir=None):
+    """Builds a composite of polar volumes.
+
+    Radars are projected in a process pool and merged in the calling
+    process.
+
+    Parameters
+    ----------
+    filenames : list
+        Paths of the polar volumes
+    grid : Grid
+        Composite grid
+    quantity : str
+        Name of the quantity
+
+    Keywords
+    --------
+    elangle : str
+        Elevation angle letter of the composited sweep
+    rule : str
+        'max', 'nearest', 'lowest' or 'weighted'
+    workers : int
+        Number of worker processes, by default the number of cpus
+    k : float
+        Effective earth radius factor
+    cache_dir : str
+        Directory where index maps are stored and shared by the workers
+
+    Returns
+    -------
+    result : dict
+        Keys data and undetect of merge, nodes, start and end times of the
+        merged radars, and errors, a list of (filename, error) pairs of
+        the files that could not be projected.
+    """
+    if rule not in RULES:
+        raise ValueError('Unknown rule {}, rule must be one of {}'.format(rule, RULES))
+    projections = list(map_files(partial(project_file, grid=grid, quantity=quantity, elangle=elangle,
+                                         k=k, cache_dir=cache_dir), list(filenames), workers))
+    data, undetect = merge(projections, grid, rule)
+    merged = [projection for projection in projections if projection['error'] is None]
+    times = np.array([projection['time'] for projection in merged], dtype='datetime64[s]')
+    times = times[~np.isnat(times)]
+    return {'data':data, 'undetect':undetect, 'nodes':[projection['node'] for projection in merged],
+            'start':times.min() if times.size else np.datetime64('NaT'),
+            'end':times.max() if times.size else np.datetime64('NaT'),
+            'errors':[(projection['filename'], projection['error']) for projection in projections
+                      if projection['error'] is not None]}
+
+
+def write_composite(output, result, grid, quantity, rule, encoding=None, source=''):
+    """Writes a composite into a file in the odim COMP layout.
+
+    Parameters
+    ----------
+    output : str or file-like
+        Path of the file, or e.g. io.BytesIO
+    result : dict
+        Result of composite
+    grid : Grid
+        Composite grid
+    quantity : str
+        Name of the quantity
+    rule : str
+        Rule used in merging
+
+    Keywords
+    --------
+    encoding : dict
+        Keys dtype, gain, offset, nodata and undetect of the stored data.
+        By default float32 physical values are stored.
+    source : str
+        Value of the /what source attribute
+    """
+    encoding = dict(DEFAULT_ENCODING, **(encoding or {}))
+    dtype = np.dtype(encoding['dtype'])
+    data = (result['data'] - encoding['offset']) / encoding['gain']
+    if dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        data = np.clip(np.round(data), info.min, info.max)
+    stored = np.where(np.isnan(result['data']), encoding['nodata'], data)
+    stored[result['undetect']] = encoding['undetect']
+    start, end = result['start'], result['end']
+    dx = (grid.east - grid.west) / grid.xsize
+    dy = (grid.north - grid.south) / grid.ysize
+    filedict = {'/what':{'object':np.bytes_('COMP'), 'version':np.bytes_('H5rad 2.2'),
+                         'date':np.bytes_(_date(end)), 'time':np.bytes_(_time(end)),
+                         'source':np.bytes_(source)},
+                '/where':{'projdef':np.bytes_('+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs'),
+                          'xsize':np.int64(grid.xsize), 'ysize':np.int64(grid.ysize),
+                          'xscale':float(dx), 'yscale':float(dy),
+                          'LL_lon':float(grid.west), 'LL_lat':float(grid.south),
+                          'UL_lon':float(grid.west), 'UL_lat':float(grid.north),
+                          'UR_lon':float(grid.east), 'UR_lat':float(grid.north),
+                          'LR_lon':float(grid.east), 'LR_lat':float(grid.south)},
+                '/how':{'camethod':np.bytes_(CAMETHODS[rule]),
+                        'nodes':np.bytes_(','.join("'{}'".format(node) for node in result['nodes']))},
+                '/dataset1/what':{'product':np.bytes_('COMP'),
+                                  'startdate':np.bytes_(_date(start)), 'starttime':np.bytes_(_time(start)),
+                                  'enddate':np.bytes_(_date(end)), 'endtime':np.bytes_(_time(end))},
+                '/dataset1/data1/what':{'quantity':np.bytes_(quantity), 'gain':float(encoding['gain']),
+                                        'offset':float(encoding['offset']),
+                                        'nodata':float(encoding['nodata']),
+                                        'undetect':float(encoding['undetect'])},
+                '/dataset1/data1/data':{'DATASET':stored.astype(dtype), 'CLASS':np.bytes_('IMAGE'),
+                                        'IMAGE_VERSION':np.bytes_('1.2')}}
+    with HiisiHDF(output, 'w') as h5f:
+        h5f.create_from_filedict(filedict)
+
+
+def _date(time):
+    return '' if np.isnat(time) else str(time).replace('-', '')[:8]
+
+
+def _time(time):
+    return '' if np.isnat(time) else str(time)[11:19].replace(':', '')
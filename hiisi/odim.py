@@ -8,9 +8,16 @@ http://www.eumetnet.eu/sites/default/files/OPERA2014_O4_ODIM_H5-v2.2.pdf
 from .hiisihdf import HiisiHDF
 import h5py
 import numpy as np
-import re
 import os
+import queue
 import string
+import threading
+
+SWEEP_DTYPE = np.dtype([('letter', 'U1'), ('path', 'U32'), ('elangle', np.float64),
+                        ('nrays', np.int64), ('nbins', np.int64), ('rscale', np.float64),
+                        ('rstart', np.float64), ('a1gate', np.int64),
+                        ('start', 'datetime64[s]'), ('end', 'datetime64[s]')])
+
 
 class MissingMetadataError(Exception):
     def __init__(self, message, errors):
@@ -22,7 +29,69 @@ class MissingMetadataError(Exception):
         self.errors = errors
 
 
-class OdimPVOL(HiisiHDF):
+class _QualityFields(object):
+    """Quality field methods of OdimPVOL and OdimCOMP"""
+    def quality_fields(self):
+        """Returns the quality fields of the selected dataset.
+
+        Quality groups of the data group and of its dataset group are
+        identified by their how/task attribute, or by what/quantity or the
+        group name if the task is missing. Data group quality fields
+        override the dataset group fields of the same task.
+
+        Returns
+        -------
+        fields : dict
+            Tasks and paths of the quality datasets
+
+        Examples
+        --------
+        >>> pvol.select_dataset('A', 'DBZH')
+        >>> print(pvol.quality_fields())
+        {'fi.fmi.ropo.detector.classification': '/dataset1/data2/quality1/data'}
+        """
+        if self._dataset is None:
+            raise ValueError('Dataset is not selected')
+        return _quality_fields(self, os.path.dirname(self[self._dataset].name))
+
+    def masked(self, thresholds, selection=None, decode=True):
+        """Reads the selected dataset and masks it with its quality fields.
+
+        The data and the quality fields of the thresholds are read for the
+        same selection, and values whose quality is below the threshold,
+        or whose quality is nodata, are masked in one vectorized pass.
+
+        Parameters
+        ----------
+        thresholds : dict
+            Tasks of the quality fields and the minimum accepted values of
+            the decoded quality
+
+        Keywords
+        --------
+        selection : tuple
+            Part of the dataset read, e.g. np.s_[0:90, 100:200], by
+            default the whole dataset
+        decode : bool
+            If True, data is converted to physical values, and nodata,
+            undetect and masked values are nan.
+
+        Returns
+        -------
+        data, mask : ndarray
+            Data of the selection and the mask of the rejected values
+
+        Examples
+        --------
+        >>> pvol.select_dataset('A', 'DBZH')
+        >>> data, mask = pvol.masked({'fi.fmi.ropo.detector.classification':0.5}, np.s_[0:90])
+        """
+        if self._dataset is None:
+            raise ValueError('Dataset is not selected')
+        return _read_masked(self, os.path.dirname(self[self._dataset].name), thresholds, selection, decode)
+
+
+class OdimPVOL(_QualityFields, HiisiHDF):
     """
     Container for odim polar volumes.
     
@@ -33,12 +102,14 @@ class OdimPVOL(HiisiHDF):
         #    raise Warning('The type of hdf5 file is not PVOL')
         self.elangles = {}
         self.quantities = []
+        self.catalogue = {}
+        self.sweeps = np.empty(0, dtype=SWEEP_DTYPE)
         self.dataset = None
         self._set_elangles()
 
     @property
-    def dataset(self):        
-        return self[self._dataset][:]
+    def dataset(self):
+        return self._read_dataset(self._dataset)
 
     @dataset.setter
     def dataset(self, value):
@@ -48,7 +119,8 @@ class OdimPVOL(HiisiHDF):
         """Sets the values of instance variable elangles.
         
         Method creates a dictionary containing the elangles of the pvol file.
-        Elangles are ordered in acending order using uppercase letters as keys
+        Elangles are ordered in acending order using uppercase letters as keys.
+        Letters are shared with catalogue and sweeps.
         
         Examples
         --------
@@ -56,14 +128,286 @@ class OdimPVOL(HiisiHDF):
         >>> print(pvol.elangles)
         {'A': 0.5, 'C': 1.5, 'B': 0.69999999999999996, 'E': 5.0, 'D': 3.0}
         """
-        elang_list = list(self.attr_gen('elangle'))
-        try:
-            elevation_angles = sorted(list(zip(*elang_list))[1])
-            n_elangles = len(elevation_angles)
-            self.elangles = dict(list(zip(list(string.ascii_uppercase[:n_elangles]), elevation_angles)))
-        except IndexError:
-            self.elangles = {}
+        sweeps = _sweep_index(self)
+        self.elangles = dict(zip(string.ascii_uppercase, [sweep['where']['elangle'] for sweep in sweeps]))
+        self._set_quantities()
+
+    def _set_quantities(self):
+        """Sets the values of instance variables quantities, catalogue
+        and sweeps.
+
+        Catalogue is a dictionary that tells which quantities are measured
+        at each elevation angle. It uses the same uppercase letter keys as
+        elangles and its values are dictionaries of quantity names and
+        dataset paths. Quantities is a sorted list of all the quantities of
+        the volume.
+
+        Sweeps is a structured array with one row per sweep in the order
+        of the elevation angle letters and with fields of SWEEP_DTYPE.
+        Start and end times are combined from the date and time attributes.
+        Missing integers are -1, missing floats nan and missing times NaT.
+
+        Examples
+        --------
+        >>> pvol = OdimPVOL('pvol.h5')
+        >>> print(pvol.catalogue['A'])
+        {'TH': '/dataset1/data1/data', 'DBZH': '/dataset1/data2/data'}
+        >>> print(pvol.quantities)
+        ['DBZH', 'TH']
+        >>> low = pvol.sweeps[(pvol.sweeps['elangle'] < 2) & (pvol.sweeps['rscale'] == 500)]
+        >>> print(low['letter'], low['nbins'])
+        ['A' 'B' 'C'] [500 500 500]
+        >>> print(pvol.sweeps[np.argsort(pvol.sweeps['start'])]['path'])
+        ['/dataset1' '/dataset2' '/dataset3' '/dataset4' '/dataset5']
+        """
+        self.catalogue = {}
+        quantities = set()
+        metadata = self.metadata()
+        rows = []
+        for letter, sweep in zip(string.ascii_uppercase, _sweep_index(self)):
+            self.catalogue[letter] = sweep['datasets']
+            quantities.update(sweep['datasets'])
+            rows.append(_sweep_row(letter, sweep, _inherited_attrs(metadata, sweep['path'], 'what')))
+        self.quantities = sorted(quantities)
+        self.sweeps = np.array(rows, dtype=SWEEP_DTYPE)
+
+    def view(self, decode=True):
+        """Returns a lazy labelled view of the whole volume.
+
+        Quantities of the view are indexed with dimensions sweep, azimuth
+        and range. Values are read from the file only when the view is
+        sliced, and only the chunks touched by the slice are read.
+        The file must be open while the view is used.
+
+        Keywords
+        --------
+        decode : bool
+            If True, raw values are converted to physical values.
+
+        Returns
+        -------
+        view : hiisi.volume.VolumeView
+
+        Examples
+        --------
+        >>> pvol = OdimPVOL('pvol.h5')
+        >>> view = pvol.view()
+        >>> print(view['DBZH'].shape)
+        (5, 360, 500)
+        >>> lowest_rays = view['DBZH'][0, 10:20]
+        >>> subvolume = view.sel('DBZH', elangle=(0, 2), azimuth=(350, 10), distance=(0, 50000))
+        """
+        from .volume import VolumeView
+        return VolumeView(self, _sweep_index(self), decode)
         
+    def geometry(self, elangle, refractivity_gradient=None, dtype=np.float64, cache=None):
+        """Returns the coordinates of the bins of a sweep.
+
+        Coordinates are calculated with vectorized numpy expressions and
+        stored in a geometry cache, so sweeps with the same scan geometry
+        and radar site are calculated only once.
+
+        Parameters
+        ----------
+        elangle : str
+            Upper case ascii letter defining the elevation angle
+
+        Keywords
+        --------
+        refractivity_gradient : float
+            Vertical gradient of refractivity in N units per km used for
+            the effective earth radius, by default the 4/3 earth radius
+            is used.
+        dtype : numpy.dtype
+            Type of the coordinate arrays, e.g. float32
+        cache : hiisi.geometry.GeometryCache
+            Cache used for the coordinates, by default the module cache
+            hiisi.geometry.DEFAULT_CACHE
+
+        Returns
+        -------
+        geometry : hiisi.geometry.SweepGeometry
+            Read only azimuth, range, ground_range, height, lat and lon
+            arrays. Azimuths and distances are given at the centres of the
+            rays and bins.
+
+        Examples
+        --------
+        >>> pvol = OdimPVOL('pvol.h5')
+        >>> geometry = pvol.geometry('A')
+        >>> high_bins = geometry.height > 2000.0
+        """
+        from . import geometry
+        if elangle not in self.elangles:
+            raise KeyError('Elevation angle {} is not found from file'.format(elangle))
+        sweep = _sweep_index(self)[string.ascii_uppercase.index(elangle)]
+        where = sweep['where']
+        try:
+            nrays, nbins = [int(where[key]) for key in ('nrays', 'nbins')]
+        except KeyError:
+            if sweep['datasets'] == {}:
+                raise MissingMetadataError('Sweep size cannot be determined', ['nrays', 'nbins'])
+            nrays, nbins = self[sorted(sweep['datasets'].values())[0]].shape
+        try:
+            position = [float(where[key]) for key in ('lat', 'lon', 'height')]
+            rscale = float(where['rscale'])
+        except KeyError:
+            raise MissingMetadataError('Sweep geometry is not found from file', ['lat', 'lon', 'height', 'rscale'])
+        if cache is None:
+            cache = geometry.DEFAULT_CACHE
+        return cache.sweep_geometry(position[0], position[1], position[2], float(where['elangle']),
+                                    nrays, nbins, rscale, float(where.get('rstart', 0.0)),
+                                    geometry.effective_radius_factor(refractivity_gradient), dtype)
+
+    def velocity(self, elangles=None, quantity=None, unfold=False):
+        """Reads decoded doppler velocities and the nyquist velocities of the
+        sweeps.
+
+        Velocities of all the selected sweeps are read into one volume array
+        of shape (sweeps, rays, bins). Nyquist velocities are taken from the
+        NI attributes of how groups, or calculated from wavelength and
+        highprf if NI is missing. Sweeps whose nyquist velocity is unknown
+        are not unfolded.
+
+        Keywords
+        --------
+        elangles : str or list
+            Elevation angle letter or list of letters. By default all the
+            sweeps containing the velocity quantity are selected.
+        quantity : str
+            Name of the velocity quantity. By default the first of VRADH,
+            VRAD and VRADV found from the file is used.
+        unfold : bool
+            If True, velocities are unfolded with unfold_velocity.
+
+        Returns
+        -------
+        velocity : ndarray
+            Velocities in m/s, of shape (rays, bins) if a single elevation
+            angle letter is given and (sweeps, rays, bins) otherwise.
+        nyquist : ndarray or float
+            Nyquist velocities of the sweeps in m/s, nan if unknown.
+
+        Examples
+        --------
+        >>> pvol = OdimPVOL('pvol.h5')
+        >>> velocity, nyquist = pvol.velocity(['A', 'B'], unfold=True)
+        >>> print(velocity.shape, nyquist)
+        (2, 360, 500) [ 8.  8.]
+        """
+        sweeps = _sweep_index(self)
+        if quantity is None:
+            for candidate in ('VRADH', 'VRAD', 'VRADV'):
+                if any(candidate in sweep['datasets'] for sweep in sweeps):
+                    quantity = candidate
+                    break
+            else:
+                raise KeyError('Velocity quantity is not found from file')
+        single = isinstance(elangles, str)
+        if elangles is None:
+            letters = [string.ascii_uppercase[i] for i, sweep in enumerate(sweeps)
+                       if quantity in sweep['datasets']]
+        else:
+            letters = [elangles] if single else list(elangles)
+        for letter in letters:
+            if letter not in self.elangles:
+                raise KeyError('Elevation angle {} is not found from file'.format(letter))
+        indexes = [string.ascii_uppercase.index(letter) for letter in letters]
+
+        metadata = self.metadata()
+        nyquist = np.full(len(indexes), np.nan)
+        for i, index in enumerate(indexes):
+            how = _inherited_attrs(metadata, sweeps[index]['path'], 'how')
+            if 'NI' in how:
+                nyquist[i] = float(how['NI'])
+            elif 'wavelength' in how and 'highprf' in how:
+                nyquist[i] = float(how['wavelength']) * 0.01 * float(how['highprf']) / 4.0
+        velocity = self.view()[quantity][indexes]
+        if unfold:
+            unfold_velocity(velocity, nyquist, out=velocity)
+        if single:
+            return velocity[0], nyquist[0]
+        return velocity, nyquist
+
+    def merge(self, source, tolerance=0.001):
+        """Copies the sweeps and quantities that are missing from this volume
+        from another polar volume.
+
+        Sweeps are matched using elevation angles. Quantities missing from a
+        matching sweep are appended as new data groups, and sweeps that do
+        not match are appended as new dataset groups. Groups are copied
+        with HDF5 object copy, so compressed chunks are copied as such
+        without decoding and recompressing them.
+
+        Parameters
+        ----------
+        source : str or OdimPVOL
+            Polar volume from which the data is copied
+
+        Keywords
+        --------
+        tolerance : float
+            Maximum difference of matching elevation angles
+
+        Returns
+        -------
+        copied : list
+            List of (source path, destination path) pairs of copied groups
+
+        Examples
+        --------
+        Add quantities of a separate doppler volume to a reflectivity volume
+
+        >>> with OdimPVOL('pvol.h5', 'a') as pvol:
+                pvol.merge('pvol_doppler.h5')
+        [('/dataset1/data1', '/dataset1/data5'), ('/dataset2/data1', '/dataset2/data5')]
+        """
+        if self.mode == 'r':
+            raise ValueError('File is opened in read only mode')
+        if not isinstance(source, HiisiHDF):
+            with OdimPVOL(source, 'r') as source_pvol:
+                return self.merge(source_pvol, tolerance)
+
+        copied = []
+        sweeps = _sweep_index(self)
+        matched = []
+        tree = _path_tree(self)
+        next_dataset = 1 + max(list(tree) or [0])
+        for source_sweep in _sweep_index(source):
+            elangle = float(source_sweep['where']['elangle'])
+            sweep = None
+            for candidate in sweeps:
+                if candidate['path'] not in matched and abs(float(candidate['where']['elangle']) - elangle) <= tolerance:
+                    sweep = candidate
+                    matched.append(candidate['path'])
+                    break
+            if sweep is None:
+                destination = '/dataset{}'.format(next_dataset)
+                next_dataset += 1
+                self.copy(source[source_sweep['path']], destination)
+                copied.append((source_sweep['path'], destination))
+                continue
+            next_data = 1 + max(list(tree[_group_number(sweep['path'][1:], 'dataset')]['data']) or [0])
+            for quantity, dataset_path in sorted(source_sweep['datasets'].items(), key=lambda item: item[1]):
+                if quantity in sweep['datasets']:
+                    continue
+                source_group = os.path.dirname(dataset_path)
+                destination = '{}/data{}'.format(sweep['path'], next_data)
+                next_data += 1
+                self.copy(source[source_group], destination)
+                # Data attributes inherited from the upper levels of the source
+                # file are written to the copied group
+                what = self.require_group(destination + '/what')
+                source_what = _inherited_attrs(source.metadata(), source_group, 'what')
+                for key in ('quantity', 'gain', 'offset', 'nodata', 'undetect'):
+                    if key in source_what and key not in what.attrs:
+                        what.attrs[key] = source_what[key]
+                copied.append((source_group, destination))
+
+        self._metadata = None
+        self._set_elangles()
+        return copied
+
     def select_dataset(self, elangle, quantity):
         """
         Selects the matching dataset and returns its path.
@@ -90,34 +434,10 @@ class OdimPVOL(HiisiHDF):
         '/dataset1/data1/data'
 
         """
-        elangle_path = None
-        try:
-            search_results = self.search('elangle', self.elangles[elangle])
-        except KeyError:
-            return None
-
-        if search_results == []:
-            print('Elevation angle {} is not found from file'.format(elangle))
-            print('File contains elevation angles:{}'.format(self.elangles))
-        else:
-            elangle_path = search_results[0]
-                    
-        if elangle_path is not None:
-            dataset_root = re.search( '^/dataset[0-9]+/', elangle_path).group(0) 
-            quantity_path = None
-            search_results = self.search('quantity', quantity)
-
-            for path in search_results:
-                if dataset_root in path:
-                    quantity_path = path
-                    break
-                    
-            if quantity_path is not None:
-                dataset_path = re.search('^/dataset[0-9]+/data[0-9]/', quantity_path).group(0)            
-                dataset_path = os.path.join(dataset_path, 'data')
-                if isinstance(self[dataset_path], h5py.Dataset):
-                    self.dataset = self[dataset_path].ref
-                    return dataset_path
+        dataset_path = self.catalogue.get(elangle, {}).get(quantity)
+        if dataset_path is not None and isinstance(self[dataset_path], h5py.Dataset):
+            self.dataset = self[dataset_path].ref
+            return dataset_path
 
     def sector(self, start_ray, end_ray, start_distance=None, end_distance=None, units='b'):
         """Slices a sector from the selected dataset.
@@ -167,47 +487,145 @@ class OdimPVOL(HiisiHDF):
         >>> pvol.select_dataset('A', 'DBZH')
         >>> sector = pvol.sector(100, 200, 5000, 10000)                
         """
-        if self.dataset is None:
+        if self._dataset is None:
             raise ValueError('Dataset is not selected')
 
-        # Validate parameter values        
-        ray_max, distance_max = self.dataset.shape
+        # Validate parameter values
+        dataset = self[self._dataset]
+        ray_max, distance_max = dataset.shape
         if start_ray > ray_max:
             raise ValueError('Value of start_ray is bigger than the number of rays')
         if start_ray < 0:
             raise ValueError('start_ray must be non negative')
-            
-
-            
-        if start_distance is None:
-            start_distance_index = 0
-        else:
-            if units == 'b':
-                start_distance_index = start_distance
-            elif units == 'm': 
-                try:
-                    rscale = next(self.attr_gen('rscale')).value
-                except:
-                    raise MissingMetadataError            
-                start_distance_index = int(start_distance / rscale)
-        if end_distance is None:
-            end_distance_index = self.dataset.shape[1]
-        else:
-            if units == 'b':
-                end_distance_index = end_distance           
-            elif units == 'm':             
-                end_distance_index = int(end_distance / rscale) 
 
+        bins = self._distance_slice(start_distance, end_distance, units, distance_max)
         if end_ray is None:
-            sector = self.dataset[start_ray, start_distance_index:end_distance_index]
+            sector = self._read_dataset(dataset.name, source_sel=np.s_[start_ray, bins])
         else:
             if start_ray <= end_ray:
-                sector = self.dataset[start_ray:end_ray+1, start_distance_index:end_distance_index]
+                sector = self._read_dataset(dataset.name, source_sel=np.s_[start_ray:end_ray+1, bins])
             else:
-                sector1 = self.dataset[start_ray:, start_distance_index:end_distance_index]
-                sector2 = self.dataset[:end_ray+1, start_distance_index:end_distance_index]
+                sector1 = self._read_dataset(dataset.name, source_sel=np.s_[start_ray:, bins])
+                sector2 = self._read_dataset(dataset.name, source_sel=np.s_[:end_ray+1, bins])
                 sector = np.concatenate((sector1, sector2), axis=0)
         return sector
+
+    def _distance_slice(self, start_distance, end_distance, units, nbins):
+        """Returns the bin slice of the distances given in units of sector"""
+        rscale = None
+        if units == 'm' and (start_distance is not None or end_distance is not None):
+            # rscale of the selected dataset, or of the whole file
+            dataset_root = _dataset_root(self[self._dataset].name)
+            if dataset_root is not None:
+                rscale = self.first('rscale', dataset_root)
+            if rscale is None:
+                rscale = self.first('rscale')
+            if rscale is None:
+                raise MissingMetadataError('Attribute rscale is not found from file', ['rscale'])
+            rscale = rscale.value
+
+        if start_distance is None:
+            start_distance_index = 0
+        elif units == 'm':
+            start_distance_index = int(start_distance / rscale)
+        else:
+            start_distance_index = start_distance
+        if end_distance is None:
+            end_distance_index = nbins
+        elif units == 'm':
+            end_distance_index = int(end_distance / rscale)
+        else:
+            end_distance_index = end_distance
+        return slice(start_distance_index, end_distance_index)
+
+    def iter_sectors(self, width, step=None, start_distance=None, end_distance=None, units='b', prefetch=2):
+        """Iterates over the selected dataset in sectors of width rays.
+
+        Rays are read in blocks of step rays by a background thread, which
+        reads and decompresses the upcoming blocks while the caller
+        processes the current sector. Every ray is read only once. Reads
+        are fastest when step is a multiple of the number of rays in a
+        chunk. The HDF5 chunk cache can be tuned when the file is opened,
+        e.g. OdimPVOL('pvol.h5', 'r', rdcc_nbytes=64*2**20, rdcc_nslots=10007).
+
+        Parameters
+        ----------
+        width : int
+            Number of rays in a sector
+
+        Keywords
+        --------
+        step : int
+            Number of rays between the start rays of the sectors, by
+            default width
+        start_distance, end_distance, units
+            Distance range as in sector
+        prefetch : int
+            Number of blocks read ahead
+
+        Yields
+        ------
+        start_ray, sector : int, ndarray
+            Start ray and the values of the sector, which are equal to
+            sector(start_ray, start_ray + width - 1, ...) with the rays
+            continuing over the 359-0 border.
+
+        Examples
+        --------
+        >>> pvol = OdimPVOL('pvol.h5', 'r', rdcc_nbytes=64*2**20)
+        >>> pvol.select_dataset('A', 'DBZH')
+        >>> for start_ray, sector in pvol.iter_sectors(10, 5):
+                process(sector)
+        """
+        if self._dataset is None:
+            raise ValueError('Dataset is not selected')
+        dataset = self[self._dataset]
+        nrays, nbins = dataset.shape
+        step = width if step is None else step
+        if not 0 < width <= nrays or step <= 0:
+            raise ValueError('width must be between 1 and the number of rays and step must be positive')
+        bins = self._distance_slice(start_distance, end_distance, units, nbins)
+        block_queue = queue.Queue(maxsize=max(prefetch, 1))
+        stop = threading.Event()
+
+        def _read_blocks():
+            try:
+                for start in range(0, nrays, step):
+                    if stop.is_set():
+                        return
+                    block = self._read_dataset(dataset.name, source_sel=np.s_[start:start+step, bins])
+                    block_queue.put((start, block))
+            except Exception as error:
+                block_queue.put((None, error))
+
+        reader = threading.Thread(target=_read_blocks, daemon=True)
+        reader.start()
+        blocks = []
+        loaded = 0
+        try:
+            for start_ray in range(0, nrays, step):
+                end_ray = start_ray + width
+                while loaded < min(end_ray, nrays):
+                    block_start, block = block_queue.get()
+                    if block_start is None:
+                        raise block
+                    blocks.append((block_start, block))
+                    loaded = block_start + block.shape[0]
+                sector = _ray_range(blocks, start_ray, min(end_ray, nrays))
+                if end_ray > nrays:
+                    sector = np.concatenate((sector, _ray_range(blocks, 0, end_ray - nrays)), axis=0)
+                # Blocks are kept if the following sectors or the wrapped
+                # sectors at the end still need them
+                blocks = [(block_start, block) for block_start, block in blocks
+                          if block_start + block.shape[0] > start_ray + step or block_start < width]
+                yield start_ray, sector
+        finally:
+            stop.set()
+            while reader.is_alive():
+                try:
+                    block_queue.get(timeout=0.01)
+                except queue.Empty:
+                    pass
         
     '''    
     def volume_slice(self, quantity, start_ray, end_ray, start_distance=None, end_distance=None, elangles=[]):
@@ -280,7 +698,7 @@ class OdimPVOL(HiisiHDF):
         return sub_volume
     '''
 
-class OdimCOMP(HiisiHDF):
+class OdimCOMP(_QualityFields, HiisiHDF):
     """
     Container class for odim composite files
     """
@@ -291,8 +709,8 @@ class OdimCOMP(HiisiHDF):
         self._dataset = None
         
     @property
-    def dataset(self):        
-        return self[self._dataset][:]
+    def dataset(self):
+        return self._read_dataset(self._dataset)
 
     @dataset.setter
     def dataset(self, value):
@@ -303,7 +721,8 @@ class OdimCOMP(HiisiHDF):
         Selects the matching dataset and returns its path.
         
         After the dataset has been selected, its values can be accessed trough
-        dataset member variable.
+        dataset member variable. If the quantity is not found, None is
+        returned and no dataset is selected.
         
         Parameters
         ----------
@@ -328,66 +747,593 @@ class OdimCOMP(HiisiHDF):
         [255 255 255 ..., 255 255 255]]
         """
         
-        # Files with a following dataset structure.
-        # Location of 'quantity' attribute: /dataset1/data1/what
-        # Dataset path structure: /dataset1/data1/data
-        search_results = self.search('quantity', quantity)
-        try:
-            quantity_path = search_results[0]
-        except IndexError:
-            print('Attribute quantity=\'{}\' was not found from file'.format(quantity))
-            return None
-        full_dataset_path = quantity_path.replace('/what', '/data')
+        # Quantity is inherited, so both the files where the 'quantity'
+        # attribute is in /dataset1/data1/what and the files where it is in
+        # /dataset1/what are handled with the same lookup
+        dataset_path = _select_quantity(self, quantity)
+        if dataset_path is None:
+            self.dataset = None
+        return dataset_path
+
 
-        try:
-            if isinstance(self[full_dataset_path], h5py.Dataset):
-                self.dataset = self[full_dataset_path].ref
-                return full_dataset_path
-            else:
-                self.dataset = None
-                return None
-        except KeyError:
-            # Files with following dataset structure
-            # Location of 'quantity' attribute: /dataset1/what
-            # Dataset path structure: /dataset1/data1/data 
-            dataset_root_path = re.search( '^/dataset[0-9]+/', quantity_path).group(0)
-            dataset_paths = self.datasets()
-            for ds_path in dataset_paths:
-                try:
-                    full_dataset_path = re.search( '^{}data[0-9]+/data'.format(dataset_root_path), ds_path).group(0)
-                    break
-                except:
-                    pass
-            if isinstance(self[full_dataset_path], h5py.Dataset):
-                self.dataset = self[full_dataset_path].ref
-                return full_dataset_path        
-            else:
-                self.dataset = None
-                return None
-                     
-'''                     
 class OdimVPR(HiisiHDF):
     """
-    Container class for odim vpr files
+    Container class for odim vertical profile files
     """
-    #TODO: implementation
     def __init__(self, *args, **kwargs):
-        super(OdimVPR, self).__init__(*args, **kwargs)            
-        if self.get_attr('object') != 'VPR':
-            raise ValueError('Given data file is not VPR composite')
+        super(OdimVPR, self).__init__(*args, **kwargs)
         self._dataset = None
 
+    @property
+    def dataset(self):
+        return self._read_dataset(self._dataset)
+
+    @dataset.setter
+    def dataset(self, value):
+        self._dataset = value
+
+    @property
+    def quantities(self):
+        """List of the quantities of the profile in file order"""
+        return [quantity for path, quantity in _data_groups(self)]
+
+    @property
+    def heights(self):
+        """Heights of the profile levels in meters.
+
+        If the file contains HGHT quantity its values are used, decoded
+        with gain and offset and nodata and undetect set to nan. Otherwise
+        the heights of the level centres are calculated from minheight and
+        interval attributes.
+        """
+        for path, quantity in _data_groups(self):
+            if quantity == 'HGHT':
+                shape = self[path + '/data'].shape
+                return _read_groups(self, [(path, quantity)], shape, True).ravel()
+        where = _inherited_attrs(self.metadata(), '/dataset1', 'where')
+        try:
+            levels = int(where['levels'])
+            interval = float(where['interval'])
+            minheight = float(where.get('minheight', 0.0))
+        except KeyError:
+            raise MissingMetadataError('Profile heights cannot be determined', ['levels', 'interval'])
+        return minheight + interval * (np.arange(levels) + 0.5)
+
+    def select_dataset(self, quantity):
+        """
+        Selects the dataset of a quantity and returns its path.
+
+        Parameters
+        ----------
+        quantity : str
+            Name of the quantity e.g. HGHT, UWND, VWND, DBZH...
+
+        Returns
+        -------
+        dataset : str
+            Path of the matching dataset or None if no dataset is found.
+
+        Examples
+        --------
+        >>> vpr = OdimVPR('vpr.h5')
+        >>> print(vpr.select_dataset('DBZH'))
+        '/dataset1/data3/data'
+        """
+        return _select_quantity(self, quantity)
+
+    def profile(self, quantities=None, decode=True):
+        """Reads the whole profile into a single array.
+
+        All the quantities are read directly into one preallocated array,
+        so the file is not walked again for each quantity.
+
+        Keywords
+        --------
+        quantities : list
+            Quantities to read, by default all the quantities of the file
+            in the order of quantities attribute.
+        decode : bool
+            If True, raw values are converted to physical values using gain
+            and offset, and nodata and undetect values are set to nan.
+
+        Returns
+        -------
+        profile : ndarray
+            Array of shape (number of quantities, levels)
+
+        Examples
+        --------
+        >>> vpr = OdimVPR('vpr.h5')
+        >>> profile = vpr.profile(['UWND', 'VWND'])
+        >>> print(profile.shape)
+        (2, 60)
+        """
+        groups = _quantity_groups(self, quantities)
+        shape = _common_shape(self, groups)
+        profiles = _read_groups(self, groups, shape, decode)
+        return profiles.reshape((len(groups), -1))
+
 
 class OdimRHI(HiisiHDF):
     """
     Container class for odim rhi files
     """
-    #TODO: implementation
     def __init__(self, *args, **kwargs):
-        super(OdimRHI, self).__init__(*args, **kwargs)            
-        if self.get_attr('object') != 'RHI':
-            raise ValueError('Given data file is not RHI composite')
+        super(OdimRHI, self).__init__(*args, **kwargs)
         self._dataset = None
-'''
 
-            
+    @property
+    def dataset(self):
+        return self._read_dataset(self._dataset)
+
+    @dataset.setter
+    def dataset(self, value):
+        self._dataset = value
+
+    @property
+    def quantities(self):
+        """List of the quantities of the rhi in file order"""
+        return [quantity for path, quantity in _data_groups(self)]
+
+    @property
+    def angles(self):
+        """Elevation angles of the rhi rays in degrees"""
+        where = _inherited_attrs(self.metadata(), '/dataset1', 'where')
+        try:
+            return np.asarray(where['angles'], dtype=np.float64).ravel()
+        except KeyError:
+            raise MissingMetadataError('Elevation angles are not found from file', ['angles'])
+
+    @property
+    def ranges(self):
+        """Distances of the bin centres from the radar in meters"""
+        groups = _data_groups(self)
+        if groups == []:
+            return np.array([])
+        nbins = self[groups[0][0] + '/data'].shape[-1]
+        where = _inherited_attrs(self.metadata(), '/dataset1', 'where')
+        if 'rscale' in where:
+            rscale = float(where['rscale'])
+            rstart = float(where.get('rstart', 0.0)) * 1000.0
+        elif 'range' in where:
+            rscale = float(where['range']) * 1000.0 / nbins
+            rstart = 0.0
+        else:
+            raise MissingMetadataError('Bin distances cannot be determined', ['rscale', 'range'])
+        return rstart + rscale * (np.arange(nbins) + 0.5)
+
+    def select_dataset(self, quantity):
+        """
+        Selects the dataset of a quantity and returns its path.
+
+        Parameters
+        ----------
+        quantity : str
+            Name of the quantity e.g. DBZH, VRAD, RHOHV...
+
+        Returns
+        -------
+        dataset : str
+            Path of the matching dataset or None if no dataset is found.
+        """
+        return _select_quantity(self, quantity)
+
+    def rhi(self, quantities=None, decode=True):
+        """Reads the whole rhi into a single array.
+
+        Keywords
+        --------
+        quantities : list
+            Quantities to read, by default all the quantities of the file
+            in the order of quantities attribute.
+        decode : bool
+            If True, raw values are converted to physical values using gain
+            and offset, and nodata and undetect values are set to nan.
+
+        Returns
+        -------
+        rhi : ndarray
+            Array of shape (number of quantities, angles, bins)
+
+        Examples
+        --------
+        >>> rhi = OdimRHI('rhi.h5')
+        >>> data = rhi.rhi(['DBZH', 'ZDR'])
+        >>> print(data.shape)
+        (2, 90, 500)
+        """
+        groups = _quantity_groups(self, quantities)
+        shape = _common_shape(self, groups)
+        return _read_groups(self, groups, shape, decode)
+
+
+def read_profiles(filenames, quantity, decode=True):
+    """Reads the same quantity from many vertical profile files.
+
+    Profiles are read directly into a preallocated (time, height) array.
+    All the profiles must have the same number of levels.
+
+    Parameters
+    ----------
+    filenames : list
+        Paths of the vpr files
+    quantity : str
+        Name of the quantity
+
+    Keywords
+    --------
+    decode : bool
+        If True, raw values are converted to physical values.
+
+    Returns
+    -------
+    times : ndarray
+        Nominal times of the profiles as datetime64 values
+    heights : ndarray
+        Heights of the profile levels in meters
+    profiles : ndarray
+        Array of shape (number of files, levels)
+
+    Examples
+    --------
+    >>> times, heights, ff = read_profiles(sorted(glob('vpr/*.h5')), 'ff')
+    >>> print(ff.shape)
+    (288, 60)
+    """
+    times = np.empty(len(filenames), dtype='datetime64[s]')
+    heights = None
+    profiles = None
+    for i, filename in enumerate(filenames):
+        with OdimVPR(filename, 'r') as vpr:
+            groups = _quantity_groups(vpr, [quantity])
+            shape = _common_shape(vpr, groups)
+            if profiles is None:
+                heights = vpr.heights
+                dtype = np.float64 if decode else vpr[groups[0][0] + '/data'].dtype
+                profiles = np.empty((len(filenames), int(np.prod(shape))), dtype=dtype)
+            elif int(np.prod(shape)) != profiles.shape[1]:
+                raise ValueError('Number of levels in {} differs from the previous files'.format(filename))
+            _read_groups(vpr, groups, shape, decode, out=profiles[i:i+1])
+            what = vpr.metadata().get('/what', {})
+            times[i] = _datetime64(what.get('date'), what.get('time'))
+    return times, heights, profiles
+
+
+def unfold_velocity(velocity, nyquist, reference=None, out=None):
+    """Unfolds aliased doppler velocities.
+
+    If a reference velocity field is given, each velocity is shifted by the
+    multiple of two nyquist velocities that brings it closest to the
+    reference. Otherwise velocities are unfolded along each ray using the
+    previous valid unfolded velocity of the ray as the reference. The
+    calculation is vectorized over all the rays and sweeps. Velocities
+    whose nyquist velocity or reference is not finite are left unchanged.
+
+    Parameters
+    ----------
+    velocity : ndarray
+        Velocities of shape (rays, bins) or (sweeps, rays, bins), missing
+        values are nan
+    nyquist : float or ndarray
+        Nyquist velocity, or one nyquist velocity per sweep
+
+    Keywords
+    --------
+    reference : ndarray
+        Reference velocities broadcastable to the shape of velocity,
+        for example from a wind profile or a model
+    out : ndarray
+        Array where the result is written. Can be the velocity array
+        itself to unfold the values in place.
+
+    Returns
+    -------
+    unfolded : ndarray
+        Unfolded velocities
+
+    Examples
+    --------
+    >>> velocity, nyquist = pvol.velocity()
+    >>> unfold_velocity(velocity, nyquist, out=velocity)
+    """
+    velocity = np.asarray(velocity, dtype=np.float64)
+    if out is None:
+        out = velocity.copy()
+    elif out is not velocity:
+        out[...] = velocity
+    interval = 2.0 * np.asarray(nyquist, dtype=np.float64)
+    if velocity.ndim == 3:
+        interval = interval.reshape((-1, 1, 1))
+    if reference is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = interval * np.round((reference - out) / interval)
+        out += np.where(np.isfinite(shift), shift, 0.0)
+        return out
+    # Unfold bin by bin, vectorized over the rays of all sweeps
+    rays = out.reshape((-1, out.shape[-1]))
+    ray_interval = np.broadcast_to(interval, out.shape).reshape(rays.shape)
+    known = np.isfinite(ray_interval[:, 0]) & (ray_interval[:, 0] > 0)
+    previous = np.full(rays.shape[0], np.nan)
+    for i in range(rays.shape[1]):
+        column = rays[:, i]
+        has_reference = known & ~np.isnan(previous) & ~np.isnan(column)
+        column[has_reference] += ray_interval[has_reference, i] * np.round(
+            (previous[has_reference] - column[has_reference]) / ray_interval[has_reference, i])
+        valid = ~np.isnan(column)
+        previous[valid] = column[valid]
+    if not np.shares_memory(rays, out):
+        out[...] = rays.reshape(out.shape)
+    return out
+
+
+def _to_str(value):
+    """Converts byte string attribute values to str"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def _node(source):
+    """Returns the NOD identifier of an odim source string, or the whole
+    string if it has no NOD"""
+    source = _to_str(source) or ''
+    for part in source.split(','):
+        if part.startswith('NOD:'):
+            return part[4:]
+    return source
+
+
+def _datetime64(date, time):
+    """Converts odim date and time attributes into datetime64"""
+    try:
+        date = _to_str(date)
+        time = _to_str(time)
+        return np.datetime64('{}-{}-{}T{}:{}:{}'.format(date[:4], date[4:6], date[6:8],
+                                                         time[:2], time[2:4], time[4:6]))
+    except (TypeError, ValueError):
+        return np.datetime64('NaT')
+
+
+def _inherited_attrs(metadata, path, group_type):
+    """Collects what, where or how attributes valid at the given path.
+
+    Odim attributes are inherited from the upper levels of the hierarchy,
+    attributes of the lower levels override the upper ones.
+    """
+    attrs = {}
+    parts = [p for p in path.split('/') if p]
+    for i in range(len(parts) + 1):
+        group = '/' + '/'.join(parts[:i] + [group_type])
+        attrs.update(metadata.get(group, {}))
+    return attrs
+
+
+def _group_number(name, prefix):
+    """Returns N of a group name prefixN, or None if the name is not of
+    that form"""
+    if name.startswith(prefix) and name[len(prefix):].isdigit():
+        return int(name[len(prefix):])
+    return None
+
+
+def _dataset_root(path):
+    """Returns the /datasetN part of a path, or None"""
+    parts = path.split('/')
+    if len(parts) > 1 and _group_number(parts[1], 'dataset') is not None:
+        return '/' + parts[1]
+    return None
+
+
+def _path_tree(h5f):
+    """Returns the odim group hierarchy of the file keyed by group numbers.
+
+    Paths are parsed once per metadata index. Tree is a dictionary of
+    dataset numbers and dataset nodes. Dataset node has keys path, data and
+    quality, where data is a dictionary of data numbers and data nodes and
+    quality a dictionary of quality numbers and paths. Data node has keys
+    path, quantity, dataset and quality. Quantity is inherited from the
+    upper levels, so it is found also when it is stored in /datasetN/what.
+    Dataset tells whether the group contains a data array.
+
+    Examples
+    --------
+    >>> tree = _path_tree(h5f)
+    >>> print(tree[1]['data'][2]['path'], tree[1]['data'][2]['quantity'])
+    /dataset1/data2 DBZH
+    >>> print(tree[1]['data'][2]['quality'][1])
+    /dataset1/data2/quality1
+    """
+    metadata = h5f.metadata()
+    cached = getattr(h5f, '_path_tree_cache', None)
+    if cached is not None and cached[0] is metadata:
+        return cached[1]
+    tree = {}
+    for path in metadata:
+        parts = path.split('/')[1:]
+        number = _group_number(parts[0], 'dataset')
+        if number is None:
+            continue
+        dataset = tree.setdefault(number, {'path':'/' + parts[0], 'data':{}, 'quality':{}})
+        if len(parts) < 2:
+            continue
+        quality_number = _group_number(parts[1], 'quality')
+        if quality_number is not None and len(parts) == 2:
+            dataset['quality'][quality_number] = path
+            continue
+        data_number = _group_number(parts[1], 'data')
+        if data_number is None:
+            continue
+        data_path = '/'.join(['', parts[0], parts[1]])
+        data = dataset['data'].setdefault(data_number, {'path':data_path, 'quality':{}})
+        if len(parts) == 3:
+            quality_number = _group_number(parts[2], 'quality')
+            if quality_number is not None:
+                data['quality'][quality_number] = path
+    for dataset in tree.values():
+        for data in dataset['data'].values():
+            data['quantity'] = _to_str(_inherited_attrs(metadata, data['path'], 'what').get('quantity'))
+            data['dataset'] = data['path'] + '/data' in metadata
+    h5f._path_tree_cache = (metadata, tree)
+    return tree
+
+
+def _quality_fields(h5f, data_path):
+    """Returns the tasks and dataset paths of the quality fields of a data
+    group, see _QualityFields.quality_fields"""
+    metadata = h5f.metadata()
+    parts = data_path.split('/')
+    dataset = _path_tree(h5f).get(_group_number(parts[1], 'dataset'), {'data':{}, 'quality':{}})
+    data = dataset['data'].get(_group_number(parts[-1], 'data'), {'quality':{}})
+    fields = {}
+    for qualities in (dataset['quality'], data['quality']):
+        for number in sorted(qualities):
+            path = qualities[number]
+            if path + '/data' not in metadata:
+                continue
+            task = metadata.get(path + '/how', {}).get('task', metadata.get(path + '/what', {}).get('quantity'))
+            fields[_to_str(task) if task is not None else path.split('/')[-1]] = path + '/data'
+    return fields
+
+
+def _read_masked(h5f, data_path, thresholds, selection, decode):
+    """Reads a data group and masks it with its quality fields, see
+    _QualityFields.masked"""
+    fields = _quality_fields(h5f, data_path)
+    metadata = h5f.metadata()
+    shape = h5f[data_path + '/data'].shape
+    for task in thresholds:
+        if task not in fields:
+            raise KeyError('Quality field {} is not found from {}'.format(task, data_path))
+        if h5f[fields[task]].shape != shape:
+            raise ValueError('Shape {} of quality field {} ({}) does not match the shape {} of {}/data'.format(
+                h5f[fields[task]].shape, task, fields[task], shape, data_path))
+    data = h5f._read_dataset(data_path + '/data', source_sel=selection)
+    mask = np.zeros(data.shape, dtype=bool)
+    for task, threshold in thresholds.items():
+        quality = h5f._read_dataset(fields[task], source_sel=selection).astype(np.float64)
+        # Quality groups are decoded with their own what attributes only,
+        # attributes of the data group do not apply to them
+        _decode(quality, metadata.get(os.path.dirname(fields[task]) + '/what', {}))
+        mask |= ~(quality >= threshold)
+    if decode:
+        data = data.astype(np.float64)
+        _decode(data, _inherited_attrs(metadata, data_path, 'what'))
+        data[mask] = np.nan
+    return data, mask
+
+
+def _sweep_index(h5f):
+    """Returns a list of sweep dictionaries sorted by elevation angle.
+
+    Each dictionary contains the path and the where attributes of the
+    sweep and a dictionary of its quantities and dataset paths.
+    """
+    metadata = h5f.metadata()
+    sweeps = []
+    for number, dataset in _path_tree(h5f).items():
+        where = _inherited_attrs(metadata, dataset['path'], 'where')
+        if 'elangle' not in where:
+            continue
+        sweep = {'path':dataset['path'], 'where':where, 'datasets':{}}
+        for data_number in sorted(dataset['data']):
+            data = dataset['data'][data_number]
+            if data['dataset'] and data['quantity'] not in sweep['datasets']:
+                sweep['datasets'][data['quantity']] = data['path'] + '/data'
+        sweeps.append((float(where['elangle']), number, sweep))
+    return [sweep for elangle, number, sweep in sorted(sweeps, key=lambda item: item[:2])]
+
+
+def _sweep_row(letter, sweep, what):
+    """Returns the SWEEP_DTYPE row of one sweep of _sweep_index"""
+    where = sweep['where']
+    row = [letter, sweep['path']]
+    for name in ('elangle', 'nrays', 'nbins', 'rscale', 'rstart', 'a1gate'):
+        row.append(where.get(name, -1 if SWEEP_DTYPE[name].kind == 'i' else np.nan))
+    row.append(_datetime64(what.get('startdate'), what.get('starttime')))
+    row.append(_datetime64(what.get('enddate'), what.get('endtime')))
+    return tuple(row)
+
+
+def _ray_range(blocks, first, last):
+    """Returns rays first...last-1 from (start ray, array) blocks"""
+    parts = [block[max(first - start, 0):last - start] for start, block in blocks
+             if start < last and start + block.shape[0] > first]
+    return np.concatenate(parts, axis=0)
+
+
+def _data_groups(h5f):
+    """Returns (group path, quantity) pairs of all the data groups sorted
+    by dataset and data numbers"""
+    groups = []
+    tree = _path_tree(h5f)
+    for number in sorted(tree):
+        data_groups = tree[number]['data']
+        for data_number in sorted(data_groups):
+            if data_groups[data_number]['dataset']:
+                groups.append((data_groups[data_number]['path'], data_groups[data_number]['quantity']))
+    return groups
+
+
+def _quantity_groups(h5f, quantities):
+    """Returns (group path, quantity) pairs of the given quantities"""
+    groups = _data_groups(h5f)
+    if quantities is None:
+        return groups
+    selected = []
+    for quantity in quantities:
+        matches = [group for group in groups if group[1] == quantity]
+        if matches == []:
+            raise KeyError('Quantity {} is not found from file'.format(quantity))
+        selected.append(matches[0])
+    return selected
+
+
+def _select_quantity(h5f, quantity):
+    """Sets the dataset reference of the first data group of the quantity"""
+    for path, group_quantity in _data_groups(h5f):
+        if group_quantity == quantity:
+            dataset_path = path + '/data'
+            h5f.dataset = h5f[dataset_path].ref
+            return dataset_path
+    return None
+
+
+def _common_shape(h5f, groups):
+    """Returns the shape shared by the datasets of the groups"""
+    shapes = set(h5f[path + '/data'].shape for path, quantity in groups)
+    if len(shapes) > 1:
+        raise ValueError('Datasets of the selected quantities have different shapes')
+    if len(shapes) == 0:
+        return (0,)
+    return shapes.pop()
+
+
+def _read_groups(h5f, groups, shape, decode, out=None):
+    """Reads the datasets of the groups into one array of shape
+    (number of groups,) + shape"""
+    if out is None:
+        if decode:
+            dtype = np.float64
+        else:
+            dtype = np.result_type(*[h5f[path + '/data'].dtype for path, quantity in groups] or [np.float64])
+        out = np.empty((len(groups),) + tuple(shape), dtype=dtype)
+    metadata = h5f.metadata()
+    for i, (path, quantity) in enumerate(groups):
+        layer = h5f._read_dataset(path + '/data', out[i].reshape(shape))
+        if decode:
+            _decode(layer, _inherited_attrs(metadata, path, 'what'))
+    return out
+
+
+def _decode(array, what):
+    """Converts raw values of a float array in place to physical values.
+
+    nodata and undetect values are replaced with nan.
+    """
+    mask = np.zeros(array.shape, dtype=bool)
+    for key in ('nodata', 'undetect'):
+        if key in what:
+            mask |= array == what[key]
+    array *= what.get('gain', 1.0)
+    array += what.get('offset', 0.0)
+    array[mask] = np.nan
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel module contains helpers for running a function over many files
+in a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import fnmatch
+import glob
+import os
+
+ODIM_PATTERNS = ('*.h5', '*.hdf', '*.hdf5')
+
+
+def find_files(paths, patterns=ODIM_PATTERNS):
+    """Expands file paths, glob patterns and directories into a sorted list
+    of files.
+
+    Directories are searched recursively for files matching the patterns.
+
+    Parameters
+    ----------
+    paths : str or list
+        File paths, glob patterns or directories
+
+    Keywords
+    --------
+    patterns : tuple
+        File name patterns used when searching directories
+
+    Examples
+    --------
+    >>> find_files(['/arch/2016/08', 'extra/*.h5'])
+    ['/arch/2016/08/15/pvol_201608151200.h5', 'extra/comp.h5']
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    filenames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for name in files:
+                    if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                        filenames.add(os.path.join(root, name))
+        elif glob.has_magic(path):
+            filenames.update(name for name in glob.glob(path) if os.path.isfile(name))
+        else:
+            filenames.add(path)
+    return sorted(filenames)
+
+
+def map_files(function, filenames, workers=None, chunksize=1):
+    """Applies function to each file in a process pool.
+
+    Results are yielded in the order of filenames as soon as they are ready,
+    so they can be streamed to the output. Function must be picklable,
+    i.e. defined at module level.
+
+    Parameters
+    ----------
+    function : callable
+        Function taking a filename as the only argument
+    filenames : list
+        Paths of the files
+
+    Keywords
+    --------
+    workers : int
+        Number of worker processes, by default the number of cpus.
+        If workers is 1, files are processed in the calling process.
+    chunksize : int
+        Number of files sent to a worker at a time
+    """
+    if workers == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield function(filename)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(function, filenames, chunksize=chunksize):
+            yield result
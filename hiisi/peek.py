@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Peek module reads the root metadata of odim files with as little work as
+possible. Only h5py is imported and only the root what, where and how
+groups are opened, so it suits short-lived jobs that need e.g. the object
+type, source or nominal time of a file.
+
+Examples
+--------
+>>> print(peek('pvol.h5')['what'])
+{'date': '20160815', 'object': 'PVOL', 'source': 'NOD:fivan', 'time': '120000', ...}
+"""
+import h5py
+
+
+def peek(filename, groups=('what', 'where', 'how')):
+    """Returns the attributes of the root groups of a file.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+
+    Keywords
+    --------
+    groups : tuple
+        Names of the root groups to read
+
+    Returns
+    -------
+    metadata : dict
+        Group names and dictionaries of their attributes. Byte strings are
+        converted to str and numpy scalars to python numbers. Missing
+        groups are left out.
+    """
+    metadata = {}
+    with h5py.File(filename, 'r') as h5f:
+        for group in groups:
+            if group in h5f:
+                metadata[group] = dict((key, _python_value(value)) for key, value in h5f[group].attrs.items())
+    return metadata
+
+
+def _python_value(value):
+    if hasattr(value, 'item') and getattr(value, 'shape', None) == ():
+        value = value.item()
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
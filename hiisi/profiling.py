@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling module collects counters and timings of the HDF5 operations made
+by hiisi file handles.
+
+Profiling is disabled by default. When no profiler is active the
+instrumented methods only check that the module variable ACTIVE is None,
+so the cost of the instrumentation is negligible.
+
+Examples
+--------
+Count the file walks and bytes read while selecting a dataset
+
+>>> from hiisi import profiling
+>>> with profiling.profile() as prof:
+        pvol = OdimPVOL('pvol.h5', 'r')
+        pvol.select_dataset('A', 'DBZH')
+        data = pvol.dataset
+>>> print(prof.counters['visititems'])
+4
+>>> print(prof.report())
+
+Send the measurements to statsd
+
+>>> import statsd
+>>> with profiling.profile(profiling.StatsdHook(statsd.StatsClient())):
+        pvol = OdimPVOL('pvol.h5', 'r')
+"""
+from collections import defaultdict
+
+# Currently active profiler, None when profiling is disabled
+ACTIVE = None
+
+
+class Profiler(object):
+    """Collects counters and timings of hiisi file operations.
+
+    Profiler is activated by using it as a context manager. Profilers can
+    be nested, in which case only the innermost profiler is recording.
+
+    Keywords
+    --------
+    callback : callable
+        Function called for every measurement with arguments name, value
+        and metric type. Metric type is 'c' for counters and 'ms' for
+        timings, which are given in milliseconds.
+
+    Attributes
+    ----------
+    counters : dict
+        Operation counts e.g. visititems, attributes_read, dataset_reads,
+        bytes_read, cache_hits and cache_misses.
+    timings : dict
+        Total time spent in each type of operation in seconds.
+    dataset_bytes : dict
+        Bytes read from each dataset keyed by (filename, dataset path).
+    """
+    def __init__(self, callback=None):
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+        self.dataset_bytes = defaultdict(int)
+        self.callback = callback
+        self._previous = None
+
+    def __enter__(self):
+        global ACTIVE
+        self._previous = ACTIVE
+        ACTIVE = self
+        return self
+
+    def __exit__(self, *args):
+        global ACTIVE
+        ACTIVE = self._previous
+        self._previous = None
+
+    def count(self, name, value=1):
+        """Increments counter name by value"""
+        self.counters[name] += value
+        if self.callback is not None:
+            self.callback(name, value, 'c')
+
+    def timing(self, name, seconds):
+        """Adds the duration of an operation to the timings"""
+        self.timings[name] += seconds
+        if self.callback is not None:
+            self.callback(name, seconds * 1000.0, 'ms')
+
+    def read(self, filename, path, nbytes, seconds):
+        """Records a dataset read"""
+        self.dataset_bytes[(filename, path)] += nbytes
+        self.count('dataset_reads')
+        self.count('bytes_read', nbytes)
+        self.timing('read', seconds)
+
+    def report(self):
+        """Returns the collected measurements as a printable table"""
+        lines = ['{:<40}{:>16}'.format('counter', 'value')]
+        for name in sorted(self.counters):
+            lines.append('{:<40}{:>16}'.format(name, self.counters[name]))
+        lines.append('{:<40}{:>16}'.format('timing', 'seconds'))
+        for name in sorted(self.timings):
+            lines.append('{:<40}{:>16.6f}'.format(name, self.timings[name]))
+        lines.append('{:<40}{:>16}'.format('dataset', 'bytes'))
+        by_size = sorted(self.dataset_bytes.items(), key=lambda item: item[1], reverse=True)
+        for (filename, path), nbytes in by_size:
+            lines.append('{:<40}{:>16}'.format('{}:{}'.format(filename, path), nbytes))
+        return '\n'.join(lines)
+
+
+class StatsdHook(object):
+    """Profiler callback that forwards the measurements to a statsd client.
+
+    Parameters
+    ----------
+    client : object
+        Statsd client with incr(name, value) and timing(name, ms) methods
+
+    Keywords
+    --------
+    prefix : str
+        Prefix of the metric names
+    """
+    def __init__(self, client, prefix='hiisi'):
+        self.client = client
+        self.prefix = prefix
+
+    def __call__(self, name, value, metric_type):
+        name = '{}.{}'.format(self.prefix, name)
+        if metric_type == 'ms':
+            self.client.timing(name, value)
+        else:
+            self.client.incr(name, value)
+
+
+def profile(callback=None):
+    """Returns a new profiler to be used as a context manager.
+
+    Keywords
+    --------
+    callback : callable
+        Function called for every measurement, see Profiler.
+    """
+    return Profiler(callback)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Repack module rewrites existing HDF5 files with new chunking and compression.
+
+Each file is written into a temporary file next to the original, with all
+the groups and attributes copied with their original types. Soft and
+external links are copied as links, and objects with several hard links
+are copied once and linked to all their paths. Temporary file
+is compared to the original with HiisiHDF.diff and it replaces the original
+atomically only if the data and metadata are identical.
+
+Repacking is available from the command line::
+
+    hiisi-repack -j 8 --level 6 /arch/2016/
+"""
+from .hiisihdf import HiisiHDF
+from .parallel import find_files, map_files
+from functools import partial
+import argparse
+import h5py
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def repack_file(filename, compression='gzip', compression_opts=6, shuffle=True, chunks=None,
+                verify=True, force=False):
+    """Rewrites a file with a new chunking and compression policy.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+
+    Keywords
+    --------
+    compression : str
+        Compression filter, e.g. 'gzip' or 'lzf', or None
+    compression_opts : int
+        Compression level
+    shuffle : bool
+        Use the shuffle filter
+    chunks : tuple
+        Chunk shape of two dimensional datasets. By default the existing
+        chunk shape is kept, and contiguous datasets are chunked
+        automatically.
+    verify : bool
+        Compare the repacked file to the original before replacing it
+    force : bool
+        Replace the original even if the repacked file is not smaller
+
+    Returns
+    -------
+    result : dict
+        Keys filename, size_before, size_after, seconds, replaced and error
+    """
+    start = time.time()
+    result = {'filename':filename, 'size_before':None, 'size_after':None,
+              'seconds':None, 'replaced':False, 'error':None}
+    tmp_filename = None
+    try:
+        result['size_before'] = os.path.getsize(filename)
+        directory = os.path.dirname(os.path.abspath(filename))
+        handle, tmp_filename = tempfile.mkstemp(dir=directory, prefix='.hiisi-repack-', suffix='.h5')
+        os.close(handle)
+        with h5py.File(filename, 'r') as source, h5py.File(tmp_filename, 'w') as target:
+            _copy_attrs(source, target)
+            _copy_group(source, target, {source.id:'/'},
+                        dict(chunks=chunks, compression=compression, compression_opts=compression_opts,
+                             shuffle=shuffle))
+        if verify:
+            with HiisiHDF(tmp_filename, 'r') as repacked:
+                differences = repacked.diff(filename)
+            if differences:
+                raise ValueError('Repacked file differs from the original: {}'.format(differences[0]))
+        result['size_after'] = os.path.getsize(tmp_filename)
+        if force or result['size_after'] < result['size_before']:
+            shutil.copymode(filename, tmp_filename)
+            os.replace(tmp_filename, filename)
+            result['replaced'] = True
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    finally:
+        if tmp_filename is not None and os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+    result['seconds'] = time.time() - start
+    return result
+
+
+def _copy_group(source, target, copied, policy):
+    """Copies the members of a group recursively.
+
+    Soft and external links are copied as links. Objects reachable through
+    several hard links are copied once and linked to the other paths, so
+    copied maps the ids of the copied source objects to their target paths.
+    """
+    for name in source:
+        link = source.get(name, getlink=True)
+        if isinstance(link, h5py.SoftLink):
+            target[name] = h5py.SoftLink(link.path)
+            continue
+        if isinstance(link, h5py.ExternalLink):
+            target[name] = h5py.ExternalLink(link.filename, link.path)
+            continue
+        obj = source[name]
+        if obj.id in copied:
+            target[name] = target[copied[obj.id]]
+            continue
+        if isinstance(obj, h5py.Group):
+            group = target.create_group(name)
+            copied[obj.id] = group.name
+            _copy_attrs(obj, group)
+            _copy_group(obj, group, copied, policy)
+        elif isinstance(obj, h5py.Dataset):
+            dataset = _copy_dataset(obj, target, name, **policy)
+            copied[obj.id] = dataset.name
+            _copy_attrs(obj, dataset)
+        else:
+            # Committed datatypes
+            target[name] = obj
+            copied[obj.id] = target[name].name
+
+
+def _copy_dataset(obj, target, name, chunks, compression, compression_opts, shuffle):
+    """Creates a copy of a dataset with the given chunking and compression"""
+    if obj.shape == () or obj.size == 0:
+        return target.create_dataset(name, data=obj[()], dtype=obj.dtype)
+    dataset_chunks = True
+    if chunks is not None and len(chunks) == len(obj.shape):
+        dataset_chunks = tuple(min(size, chunk) for size, chunk in zip(obj.shape, chunks))
+    elif obj.chunks is not None:
+        dataset_chunks = obj.chunks
+    return target.create_dataset(name, data=obj[()], dtype=obj.dtype,
+                                 chunks=dataset_chunks, compression=compression,
+                                 compression_opts=compression_opts if compression == 'gzip' else None,
+                                 shuffle=shuffle)
+
+
+def _copy_attrs(source, target):
+    """Copies attributes with their stored HDF5 types and dataspaces.
+
+    Values are read and written with the stored type as the memory type, so
+    e.g. the padding of fixed length strings is not converted.
+    """
+    for name in source.attrs:
+        attr_id = source.attrs.get_id(name)
+        attr_type = attr_id.get_type()
+        copy_id = h5py.h5a.create(target.id, attr_id.name, attr_type, attr_id.get_space())
+        if attr_id.shape is None:
+            # Empty dataspace has no value
+            continue
+        value = np.empty(attr_id.shape, dtype=attr_id.dtype)
+        # Variable length values are converted through h5py object types
+        mtype = None if value.dtype.hasobject else attr_type
+        attr_id.read(value, mtype=mtype)
+        copy_id.write(value, mtype=mtype)
+
+
+def repack(paths, workers=None, **kwargs):
+    """Repacks files in a process pool and yields the results of
+    repack_file as they are ready.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories
+
+    Keywords
+    --------
+    workers : int
+        Number of worker processes, by default the number of cpus
+
+    Other keywords are passed to repack_file.
+    """
+    for result in map_files(partial(repack_file, **kwargs), find_files(paths), workers):
+        yield result
+
+
+def main(argv=None):
+    """Command line entry point hiisi-repack"""
+    parser = argparse.ArgumentParser(prog='hiisi-repack',
+                                     description='Rewrite HDF5 files with new chunking and compression')
+    parser.add_argument('paths', nargs='+', help='files, glob patterns or directories')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--compression', default='gzip', help="compression filter, 'none' to disable")
+    parser.add_argument('--level', type=int, default=6, help='gzip compression level')
+    parser.add_argument('--no-shuffle', action='store_true', help='disable the shuffle filter')
+    parser.add_argument('--chunks', default=None, help='chunk shape, e.g. 64,64')
+    parser.add_argument('--no-verify', action='store_true', help='do not verify the repacked files')
+    parser.add_argument('--force', action='store_true', help='replace files even if they grow')
+    args = parser.parse_args(argv)
+
+    compression = None if args.compression.lower() == 'none' else args.compression
+    chunks = tuple(int(size) for size in args.chunks.split(',')) if args.chunks else None
+    start = time.time()
+    n_files = n_errors = bytes_before = bytes_after = 0
+    for result in repack(args.paths, args.workers, compression=compression, compression_opts=args.level,
+                         shuffle=not args.no_shuffle, chunks=chunks, verify=not args.no_verify,
+                         force=args.force):
+        n_files += 1
+        if result['error'] is not None:
+            n_errors += 1
+            print('{}\tERROR\t{}'.format(result['filename'], result['error']))
+            continue
+        bytes_before += result['size_before']
+        bytes_after += result['size_after'] if result['replaced'] else result['size_before']
+        print('{}\t{}\t{}\t{}'.format(result['filename'], result['size_before'], result['size_after'],
+                                      'replaced' if result['replaced'] else 'kept'))
+        sys.stdout.flush()
+    seconds = max(time.time() - start, 1e-9)
+    print('{} files, {} errors, {} bytes saved ({:.1f} %), {:.1f} MB/s'.format(
+        n_files, n_errors, bytes_before - bytes_after,
+        100.0 * (bytes_before - bytes_after) / max(bytes_before, 1), bytes_before / seconds / 2**20))
+    return 1 if n_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Rewrite module applies declarative attribute edits to many files in place.
+
+An edit is a (path pattern, attribute, value) tuple. Path patterns are
+shell style patterns matched against the group and dataset paths of the
+file one path component at a time, e.g. '/what' or '/dataset*/how', so
+'*' does not match '/' and '/dataset*/how' does not match
+'/dataset1/data1/how'. Value None removes the attribute.
+Only metadata is read and written. Files are first read in read only mode
+and only files whose attributes differ from the edits are reopened for
+writing, so conforming files are left untouched.
+
+Changes are reported as hiisi.hiisihdf.Difference tuples whose first value
+is the stored value and second value is the new value, which also makes a
+dry run a diff of the pending changes.
+
+Examples
+--------
+>>> edits = [('/what', 'source', 'WMO:02975,RAD:FI42,PLC:Vantaa,NOD:fivan'),
+             ('/dataset*/how', 'radconstH', 64.2)]
+>>> for result in rewrite('/arch/2016/08/15/', edits, dry_run=True):
+        for change in result['changes']:
+            print(result['filename'], change.path, change.name, change.first, change.second)
+"""
+from .hiisihdf import Difference, HiisiHDF
+from .parallel import find_files, map_files
+from collections import namedtuple
+from functools import partial
+import fnmatch
+import numpy as np
+
+Edit = namedtuple('Edit', ['pattern', 'attr', 'value'])
+
+
+def rewrite_file(filename, edits, dry_run=False):
+    """Applies attribute edits to one file.
+
+    Existing attributes keep their stored types, e.g. a new str value of a
+    fixed length string attribute is stored as a fixed length string and a
+    new number of a float32 attribute as float32. New str attributes are
+    stored as fixed length strings as in odim files.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+    edits : list
+        (path pattern, attribute, value) tuples applied in the given order
+
+    Keywords
+    --------
+    dry_run : bool
+        Only report the changes
+
+    Returns
+    -------
+    result : dict
+        Keys filename, changes, written and error
+    """
+    result = {'filename':filename, 'changes':[], 'written':False, 'error':None}
+    try:
+        with HiisiHDF(filename, 'r') as h5f:
+            metadata = h5f.metadata()
+        new_values = {}
+        for edit in [Edit(*edit) for edit in edits]:
+            for path in [path for path in metadata if _match(path, edit.pattern)]:
+                stored = metadata[path].get(edit.attr)
+                new_values[(path, edit.attr)] = None if edit.value is None else _stored_value(stored, edit.value)
+        for path, attr in sorted(new_values):
+            stored = metadata[path].get(attr)
+            value = new_values[(path, attr)]
+            if (stored is None and value is None) or HiisiHDF._same_attr(stored, value):
+                continue
+            result['changes'].append(Difference(path, 'attribute', attr, stored, value))
+        if result['changes'] and not dry_run:
+            with HiisiHDF(filename, 'r+') as h5f:
+                for change in result['changes']:
+                    if change.second is None:
+                        del h5f[change.path].attrs[change.name]
+                    else:
+                        h5f[change.path].attrs[change.name] = change.second
+            result['written'] = True
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def _match(path, pattern):
+    """Matches a path to a pattern component by component"""
+    parts = path.split('/')
+    pattern_parts = pattern.split('/')
+    return len(parts) == len(pattern_parts) and all(
+        fnmatch.fnmatchcase(part, pattern_part) for part, pattern_part in zip(parts, pattern_parts))
+
+
+def _stored_value(stored, value):
+    """Converts a new attribute value to the type of the stored value"""
+    if stored is not None:
+        stored = np.asarray(stored)
+        if stored.dtype.kind == 'S' and isinstance(value, str):
+            return np.bytes_(value)
+        if stored.shape == () and (stored.dtype.kind == 'f' and isinstance(value, (int, float, np.number)) or
+                                   stored.dtype.kind in 'iu' and isinstance(value, (int, np.integer))):
+            return stored.dtype.type(value)
+        return value
+    if isinstance(value, str):
+        return np.bytes_(value)
+    return value
+
+
+def rewrite(paths, edits, dry_run=False, workers=None):
+    """Applies attribute edits to many files in a process pool and yields
+    the results of rewrite_file as they are ready.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories
+    edits : list
+        (path pattern, attribute, value) tuples
+
+    Keywords
+    --------
+    dry_run : bool
+        Only report the changes
+    workers : int
+        Number of worker processes, by default the number of cpus
+    """
+    for result in map_files(partial(rewrite_file, edits=list(edits), dry_run=dry_run),
+                            find_files(paths), workers, chunksize=16):
+        yield result
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Shared module publishes odim composites in shared memory, so that many
+processes on the same host can read the same composite without each of them
+reading and decoding their own copy.
+
+Publisher stores each composite in a new shared memory block, called a
+generation, and then updates the generation number in a small control
+block. Readers attach to the newest generation by name. A generation is
+removed when the second next generation is published, so readers that are
+attached to an old generation can keep using it until they refresh.
+
+Examples
+--------
+Publisher process
+
+>>> publisher = CompositePublisher('latest_comp')
+>>> publisher.publish('comp_201507191300.h5')
+1
+
+Worker processes
+
+>>> with SharedComposite('latest_comp') as comp:
+        comp.select_dataset('DBZH')
+        dbzh = comp.dataset
+"""
+from .odim import OdimCOMP, _data_groups, _decode, _inherited_attrs
+from multiprocessing import shared_memory
+import json
+import numpy as np
+import time
+
+_ALIGNMENT = 64
+
+
+class CompositePublisher(object):
+    """Publishes composites in shared memory.
+
+    Parameters
+    ----------
+    name : str
+        Name of the publication. Readers attach using the same name.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.generation = 0
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=8)
+        np.ndarray((1,), dtype=np.int64, buffer=self._control.buf)[0] = 0
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def publish(self, filename, quantities=None, decode=True):
+        """Loads a composite into shared memory and makes it the newest
+        generation.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the odim composite file
+
+        Keywords
+        --------
+        quantities : list
+            Quantities to publish, by default all the quantities of the file
+        decode : bool
+            If True, physical values are published with nodata and undetect
+            values replaced with nan. Otherwise raw values are published.
+
+        Returns
+        -------
+        generation : int
+            Generation number of the published composite
+        """
+        with OdimCOMP(filename, 'r') as comp:
+            metadata = comp.metadata()
+            groups = [(path, quantity) for path, quantity in _data_groups(comp)
+                      if quantities is None or quantity in quantities]
+            layout = {}
+            offset = 0
+            for path, quantity in groups:
+                if quantity in layout:
+                    continue
+                dataset = comp[path + '/data']
+                dtype = np.dtype(np.float64) if decode else dataset.dtype
+                layout[quantity] = {'path':path + '/data', 'offset':offset,
+                                    'shape':list(dataset.shape), 'dtype':dtype.str}
+                offset += _aligned(dtype.itemsize * int(np.prod(dataset.shape)))
+            header = json.dumps({'filename':filename, 'decode':decode, 'datasets':layout,
+                                 'metadata':_jsonable(metadata)}).encode('utf-8')
+            data_start = _aligned(8 + len(header))
+
+            generation = self.generation + 1
+            block = shared_memory.SharedMemory(name='{}_{}'.format(self.name, generation),
+                                               create=True, size=data_start + max(offset, 1))
+            try:
+                np.ndarray((1,), dtype=np.int64, buffer=block.buf)[0] = len(header)
+                block.buf[8:8 + len(header)] = header
+                for quantity, item in layout.items():
+                    array = np.ndarray(item['shape'], dtype=item['dtype'], buffer=block.buf,
+                                       offset=data_start + item['offset'])
+                    comp._read_dataset(item['path'], out=array)
+                    if decode:
+                        _decode(array, _inherited_attrs(metadata, item['path'].rsplit('/', 1)[0], 'what'))
+                    del array
+            except Exception:
+                block.close()
+                block.unlink()
+                raise
+
+        # Swap generations, previous generation is kept for attaching readers
+        np.ndarray((1,), dtype=np.int64, buffer=self._control.buf)[0] = generation
+        self.generation = generation
+        self._blocks.append(block)
+        while len(self._blocks) > 2:
+            old_block = self._blocks.pop(0)
+            old_block.close()
+            old_block.unlink()
+        return generation
+
+    def close(self):
+        """Removes all the published generations and the control block"""
+        for block in self._blocks + [self._control]:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+class SharedComposite(object):
+    """Reader of a composite published by CompositePublisher.
+
+    Reader offers the dataset selection API of OdimCOMP. Datasets are
+    read only numpy arrays backed by the shared memory, so no data is
+    copied.
+
+    Parameters
+    ----------
+    name : str
+        Name of the publication
+
+    Attributes
+    ----------
+    generation : int
+        Generation number of the attached composite
+    filename : str
+        Path of the published file
+    quantities : list
+        Published quantities
+    """
+    def __init__(self, name):
+        self.name = name
+        self.generation = 0
+        self.filename = None
+        self._block = None
+        self._arrays = {}
+        self._layout = {}
+        self._metadata = {}
+        self._dataset = None
+        self._control = _attach(name)
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def dataset(self):
+        return self._arrays[self._dataset]
+
+    @property
+    def quantities(self):
+        return sorted(self._layout)
+
+    def metadata(self):
+        """Returns the metadata index of the published file"""
+        return self._metadata
+
+    def select_dataset(self, quantity):
+        """Selects the dataset of a quantity and returns its path in the
+        published file, or None if the quantity was not published.
+        """
+        if quantity not in self._layout:
+            return None
+        self._dataset = quantity
+        return self._layout[quantity]['path']
+
+    def refresh(self, timeout=1.0):
+        """Attaches to the newest generation if a new composite has been
+        published. Returns True if the generation changed.
+
+        Keywords
+        --------
+        timeout : float
+            Seconds to wait for the block of the newest generation, e.g.
+            while it is replaced by a newer one. FileNotFoundError is
+            raised if the block is not found in time, which happens if the
+            publisher stopped between updating the generation number and
+            creating the block.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            generation = int(np.ndarray((1,), dtype=np.int64, buffer=self._control.buf)[0])
+            if generation == self.generation:
+                return False
+            try:
+                block = _attach('{}_{}'.format(self.name, generation))
+            except FileNotFoundError:
+                # Generation was replaced while attaching
+                if time.monotonic() > deadline:
+                    raise FileNotFoundError('Generation {} of {} is not found from shared memory'.format(
+                        generation, self.name))
+                time.sleep(0.001)
+                continue
+            break
+        header_length = int(np.ndarray((1,), dtype=np.int64, buffer=block.buf)[0])
+        header = json.loads(bytes(block.buf[8:8 + header_length]).decode('utf-8'))
+        data_start = _aligned(8 + header_length)
+        arrays = {}
+        for quantity, item in header['datasets'].items():
+            array = np.ndarray(item['shape'], dtype=item['dtype'], buffer=block.buf,
+                               offset=data_start + item['offset'])
+            array.flags.writeable = False
+            arrays[quantity] = array
+        self._release()
+        self._block = block
+        self._arrays = arrays
+        self._layout = header['datasets']
+        self._metadata = header['metadata']
+        self.filename = header['filename']
+        self.generation = generation
+        if self._dataset not in arrays:
+            self._dataset = None
+        return True
+
+    def _release(self):
+        self._arrays = {}
+        if self._block is not None:
+            try:
+                self._block.close()
+            except BufferError:
+                # Arrays given to the caller are still alive, memory is
+                # released when they are garbage collected
+                pass
+            self._block = None
+
+    def close(self):
+        """Detaches from the shared memory. Arrays returned by the reader
+        must not be used after closing."""
+        self._release()
+        self._control.close()
+
+
+def _attach(name):
+    """Attaches to an existing shared memory block without registering it
+    to the resource tracker, which would remove the block when the reader
+    process exits."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _aligned(size):
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _jsonable(value):
+    """Converts metadata values into json serializable values"""
+    if isinstance(value, dict):
+        return dict((key, _jsonable(item)) for key, item in value.items())
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, np.ndarray):
+        return [_jsonable(item) for item in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        return _jsonable(value.item())
+    return value
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Stats module calculates statistics of odim datasets with bounded memory.
+
+Datasets are read chunk by chunk, or in blocks of rows if they are not
+chunked. Each block is decoded to physical values, and the counts, moments
+and histograms of the blocks are combined, so only one block of a dataset
+is in memory at a time. Statistics of all the quantities of a file are
+calculated with one pass through its datasets, and files can be processed
+in a process pool.
+
+Examples
+--------
+>>> for row in file_stats('pvol.h5', bins=np.arange(-32, 96, 4)):
+        print(row['path'], row['quantity'], row['min'], row['max'], row['mean'], row['nodata'])
+>>> for rows in stats('/arch/2016/08/15/', quantities=['DBZH'], workers=8):
+        ...
+"""
+from .hiisihdf import HiisiHDF
+from .odim import _data_groups, _decode, _inherited_attrs
+from .parallel import find_files, map_files
+from functools import partial
+import numpy as np
+
+
+def dataset_stats(h5f, path, bins=None, block_bytes=2**20):
+    """Returns the statistics of one dataset.
+
+    Parameters
+    ----------
+    h5f : HiisiHDF
+        Open file
+    path : str
+        Path of a data group, e.g. '/dataset1/data1'
+
+    Keywords
+    --------
+    bins : array_like
+        Edges of the histogram bins in physical units. If not given,
+        histogram is not calculated.
+    block_bytes : int
+        Size of the blocks read from datasets that are not chunked
+
+    Returns
+    -------
+    stats : dict
+        Keys path, shape, size, count, nodata, undetect, min, max, mean, std,
+        histogram and bin_edges. Count is the number of valid values and
+        nodata and undetect are fractions of all values. Moments of a
+        dataset without valid values are nan.
+    """
+    what = _inherited_attrs(h5f.metadata(), path, 'what')
+    dataset = h5f[path + '/data']
+    count = 0
+    mean = m2 = 0.0
+    minimum, maximum = np.inf, -np.inf
+    flagged = {'nodata':0, 'undetect':0}
+    histogram = None if bins is None else np.zeros(len(bins) - 1, dtype=np.int64)
+    for selection in _blocks(dataset, block_bytes):
+        raw = h5f._read_dataset(dataset.name, source_sel=selection)
+        for key in flagged:
+            if key in what:
+                flagged[key] += np.count_nonzero(raw == what[key])
+        values = raw.astype(np.float64)
+        _decode(values, what)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            continue
+        # Combine the moments of the block with the previous blocks
+        block_mean = values.mean()
+        block_m2 = np.sum((values - block_mean)**2)
+        total = count + values.size
+        delta = block_mean - mean
+        mean += delta * values.size / total
+        m2 += block_m2 + delta**2 * count * values.size / total
+        count = total
+        minimum = min(minimum, values.min())
+        maximum = max(maximum, values.max())
+        if histogram is not None:
+            histogram += np.histogram(values, bins)[0]
+    size = max(dataset.size, 1)
+    if count == 0:
+        minimum = maximum = mean = std = np.nan
+    else:
+        std = np.sqrt(m2 / count)
+    return {'path':path, 'shape':dataset.shape, 'size':dataset.size, 'count':count,
+            'nodata':flagged['nodata'] / size, 'undetect':flagged['undetect'] / size,
+            'min':minimum, 'max':maximum, 'mean':mean, 'std':std,
+            'histogram':histogram, 'bin_edges':None if bins is None else np.asarray(bins)}
+
+
+def _blocks(dataset, block_bytes):
+    """Yields selections covering the dataset, one chunk or one block of
+    rows at a time"""
+    if dataset.size == 0:
+        return
+    if dataset.chunks is not None:
+        for selection in dataset.iter_chunks():
+            yield selection
+    else:
+        row_bytes = max(dataset.nbytes // dataset.shape[0], 1)
+        rows = max(block_bytes // row_bytes, 1)
+        for start in range(0, dataset.shape[0], rows):
+            yield np.s_[start:start + rows]
+
+
+def file_stats(filename, quantities=None, bins=None):
+    """Returns the statistics of the data groups of one file.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+
+    Keywords
+    --------
+    quantities : list
+        Quantities included, by default all
+    bins : array_like
+        Edges of the histogram bins in physical units
+
+    Returns
+    -------
+    rows : list
+        Dictionaries of dataset_stats with additional keys file, quantity
+        and elangle. Elangle is nan if the data group has no elevation
+        angle.
+    """
+    rows = []
+    with HiisiHDF(filename, 'r') as h5f:
+        metadata = h5f.metadata()
+        for path, quantity in _data_groups(h5f):
+            if quantities is not None and quantity not in quantities:
+                continue
+            row = dataset_stats(h5f, path, bins)
+            row['file'] = filename
+            row['quantity'] = quantity
+            row['elangle'] = float(_inherited_attrs(metadata, path, 'where').get('elangle', np.nan))
+            rows.append(row)
+    return rows
+
+
+def stats(paths, quantities=None, bins=None, workers=None):
+    """Calculates statistics of many files in a process pool and yields the
+    results of file_stats as they are ready.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories
+
+    Keywords
+    --------
+    quantities : list
+        Quantities included, by default all
+    bins : array_like
+        Edges of the histogram bins in physical units
+    workers : int
+        Number of worker processes, by default the number of cpus
+    """
+    for rows in map_files(partial(file_stats, quantities=quantities, bins=bins), find_files(paths), workers):
+        yield rows
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Validate module checks the integrity of many odim files, so that corrupt or
+truncated files can be rejected before they are processed.
+
+Metadata checks compare the structure of the file against the odim scheme:
+the required what and where attributes of the root, dataset and data groups,
+and the shapes of the data arrays against nrays and nbins of polar data,
+xsize and ysize of images and cross sections, or levels of vertical
+profiles. Metadata checks only read the attributes. The thorough mode also
+reads every chunk, or block of rows, of every dataset, so truncated
+datasets and fletcher32 checksum errors are found too.
+
+Examples
+--------
+>>> for result in validate('/arch/2016/08/15/', thorough=True, workers=8):
+        if not result['valid']:
+            print(result['filename'], result['error'], result['problems'])
+"""
+from .hiisihdf import HiisiHDF
+from .odim import _inherited_attrs, _path_tree, _to_str
+from .parallel import find_files, map_files
+from .stats import _blocks
+from collections import namedtuple
+from functools import partial
+
+Problem = namedtuple('Problem', ['path', 'message'])
+
+OBJECTS = ('PVOL', 'CVOL', 'SCAN', 'RAY', 'AZIM', 'ELEV', 'IMAGE', 'COMP', 'XSEC', 'VP', 'PIC')
+"""Object types of odim files"""
+
+REQUIRED = {'root':('object', 'version', 'date', 'time', 'source'),
+            'dataset':('product', 'startdate', 'starttime', 'enddate', 'endtime'),
+            'data':('quantity', 'gain', 'offset', 'nodata', 'undetect')}
+"""Required what attributes of the root, dataset and data groups of every
+object"""
+
+SCHEMES = {'PVOL':{'root':('lon', 'lat', 'height'),
+                   'dataset':('elangle', 'nbins', 'rstart', 'rscale', 'nrays', 'a1gate')},
+           'SCAN':{'root':('lon', 'lat', 'height'),
+                   'dataset':('elangle', 'nbins', 'rstart', 'rscale', 'nrays', 'a1gate')},
+           'COMP':{'root':('projdef', 'xsize', 'ysize', 'xscale', 'yscale',
+                           'LL_lon', 'LL_lat', 'UL_lon', 'UL_lat', 'UR_lon', 'UR_lat', 'LR_lon', 'LR_lat'),
+                   'dataset':()},
+           'IMAGE':{'root':('projdef', 'xsize', 'ysize', 'xscale', 'yscale',
+                            'LL_lon', 'LL_lat', 'UL_lon', 'UL_lat', 'UR_lon', 'UR_lat', 'LR_lon', 'LR_lat'),
+                    'dataset':()},
+           'XSEC':{'root':('xsize', 'ysize', 'xscale', 'yscale', 'minheight', 'maxheight'),
+                   'dataset':()},
+           'VP':{'root':('lon', 'lat', 'height', 'levels', 'interval', 'minheight', 'maxheight'),
+                 'dataset':()}}
+"""Required where attributes of the objects. They are inherited, so both
+the root and the dataset where attributes are checked for every dataset
+and may be given in either group. Objects without a scheme are checked
+only for the what attributes."""
+
+SHAPE_ATTRS = {'PVOL':('nrays', 'nbins'), 'SCAN':('nrays', 'nbins'),
+               'COMP':('ysize', 'xsize'), 'IMAGE':('ysize', 'xsize'),
+               'XSEC':('ysize', 'xsize'), 'VP':('levels',)}
+"""Attributes giving the leading dimensions of the data arrays. Further
+dimensions must have length one, e.g. profiles have one column."""
+
+
+def validate_file(filename, thorough=False):
+    """Checks one file.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file
+
+    Keywords
+    --------
+    thorough : bool
+        Read every chunk of every dataset in addition to the metadata checks
+
+    Returns
+    -------
+    result : dict
+        Keys filename, valid, problems and error. Problems is a list of
+        Problem(path, message) tuples of the structural problems. Error is
+        the message of an exception raised while opening or reading the
+        file, e.g. because the file is truncated or a checksum does not
+        match.
+    """
+    result = {'filename':filename, 'valid':False, 'problems':[], 'error':None}
+    try:
+        with HiisiHDF(filename, 'r') as h5f:
+            result['problems'] = check_structure(h5f)
+            if thorough:
+                for path in h5f.datasets():
+                    for selection in _blocks(h5f[path], 2**20):
+                        h5f._read_dataset(path, source_sel=selection)
+        result['valid'] = not result['problems']
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def check_structure(h5f):
+    """Returns the problems of the structure of an open file.
+
+    Parameters
+    ----------
+    h5f : HiisiHDF
+        Open file
+
+    Returns
+    -------
+    problems : list
+        Problem(path, message) tuples
+    """
+    metadata = h5f.metadata()
+    problems = []
+    root_what = metadata.get('/what', {})
+    problems += _missing(metadata, '/', {'what':REQUIRED['root']})
+    odim_object = _to_str(root_what.get('object'))
+    scheme = SCHEMES.get(odim_object)
+    if odim_object is not None and odim_object not in OBJECTS:
+        problems.append(Problem('/what', 'unknown object {}'.format(odim_object)))
+    tree = _path_tree(h5f)
+    if not tree:
+        problems.append(Problem('/', 'no dataset groups'))
+    for number in sorted(tree):
+        dataset = tree[number]
+        problems += _missing(metadata, dataset['path'], {'what':REQUIRED['dataset']})
+        if scheme is not None:
+            problems += _missing(metadata, dataset['path'], {'where':scheme['root'] + scheme['dataset']})
+        if not dataset['data']:
+            problems.append(Problem(dataset['path'], 'no data groups'))
+        for data_number in sorted(dataset['data']):
+            data = dataset['data'][data_number]
+            problems += _missing(metadata, data['path'], {'what':REQUIRED['data']})
+            if not data['dataset']:
+                problems.append(Problem(data['path'], 'no data array'))
+                continue
+            if odim_object in SHAPE_ATTRS:
+                where = _inherited_attrs(metadata, data['path'], 'where')
+                attrs = SHAPE_ATTRS[odim_object]
+                if all(attr in where for attr in attrs):
+                    expected = tuple(int(where[attr]) for attr in attrs)
+                    shape = h5f[data['path'] + '/data'].shape
+                    if shape[:len(attrs)] != expected or any(size != 1 for size in shape[len(attrs):]):
+                        problems.append(Problem(data['path'] + '/data', 'shape {} does not match {} {}'.format(
+                            shape, ' and '.join(attrs), expected)))
+    return problems
+
+
+def _missing(metadata, path, required):
+    """Returns the problems of the required attributes that are not found
+    from the group or inherited from the upper levels"""
+    problems = []
+    for group, attrs in required.items():
+        found = _inherited_attrs(metadata, path, group)
+        group_path = path.rstrip('/') + '/' + group
+        for attr in attrs:
+            if attr not in found:
+                problems.append(Problem(group_path, 'missing attribute {}'.format(attr)))
+    return problems
+
+
+def validate(paths, thorough=False, workers=None):
+    """Checks many files in a process pool and yields the results of
+    validate_file as they are ready.
+
+    Parameters
+    ----------
+    paths : str or list
+        Files, glob patterns or directories
+
+    Keywords
+    --------
+    thorough : bool
+        Read every chunk of every dataset
+    workers : int
+        Number of worker processes, by default the number of cpus
+    """
+    chunksize = 1 if thorough else 16
+    for result in map_files(partial(validate_file, thorough=thorough), find_files(paths), workers, chunksize):
+        yield result
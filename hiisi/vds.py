@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Vds module combines the datasets of many odim files into one HDF5 virtual
+dataset, so that a time series can be sliced with a single read without
+copying any data.
+
+Polar volumes are mapped into a (time, sweep, ray, bin) dataset where the
+sweeps of each file are ordered by elevation angle. Composites and other
+files without sweeps are mapped into a (time, y, x) dataset. Virtual dataset
+contains raw values. Gain and offset of each mapped dataset are stored next
+to it, together with times, elevation angles and the source file names.
+
+Output file structure::
+
+    /what      quantity, nodata, undetect
+    /data      virtual dataset
+    /time      nominal times of the files, seconds since 1970-01-01
+    /gain      gain of each mapped dataset
+    /offset    offset of each mapped dataset
+    /elangle   elevation angles of the sweeps (polar volumes only)
+    /sources   source file names
+
+Examples
+--------
+>>> build_vds(sorted(glob('pvol/*.h5')), 'pvol_vds.h5', 'DBZH')
+>>> with HiisiHDF('pvol_vds.h5', 'r') as h5f:
+        lowest_rays = h5f['/data'][:, 0, 100:110, :]
+"""
+from .hiisihdf import HiisiHDF
+from .odim import _data_groups, _datetime64, _inherited_attrs, _sweep_index
+import h5py
+import numpy as np
+import os
+
+
+def build_vds(filenames, output, quantity, absolute_paths=True):
+    """Creates a virtual dataset file from many odim files.
+
+    Files must contain the same product type. Layout of the first file
+    decides whether a volume or a composite layout is used. Sweeps or
+    images smaller than the largest one are padded with the nodata value of
+    the first file, as are missing sweeps.
+
+    Parameters
+    ----------
+    filenames : list
+        Paths of the odim files in time order
+    output : str
+        Path of the virtual dataset file
+    quantity : str
+        Name of the mapped quantity
+
+    Keywords
+    --------
+    absolute_paths : bool
+        If True, source files are referred with absolute paths. Otherwise
+        the paths are stored as given, which allows moving the files
+        together when the paths are relative to the output file.
+
+    Returns
+    -------
+    shape : tuple
+        Shape of the virtual dataset
+    """
+    sources = []
+    for filename in filenames:
+        with HiisiHDF(filename, 'r') as h5f:
+            sources.append(_file_sources(h5f, quantity))
+    is_volume = any(source['volume'] for source in sources)
+    datasets = [dataset for source in sources for dataset in source['datasets'] if dataset is not None]
+    if datasets == []:
+        raise KeyError('Quantity {} is not found from the files'.format(quantity))
+    first_what = datasets[0]['what']
+    dtype = datasets[0]['dtype']
+    image_shape = tuple(np.max([dataset['shape'] for dataset in datasets], axis=0))
+    n_layers = max(len(source['datasets']) for source in sources)
+    if is_volume:
+        shape = (len(filenames), n_layers) + image_shape
+    else:
+        shape = (len(filenames),) + image_shape
+
+    layout = h5py.VirtualLayout(shape=shape, dtype=dtype)
+    gain = np.full((len(filenames), n_layers), np.nan)
+    offset = np.full((len(filenames), n_layers), np.nan)
+    elangle = np.full((len(filenames), n_layers), np.nan)
+    for i, (filename, source) in enumerate(zip(filenames, sources)):
+        source_name = os.path.abspath(filename) if absolute_paths else filename
+        for j, dataset in enumerate(source['datasets']):
+            if dataset is None:
+                continue
+            rows, columns = dataset['shape']
+            virtual_source = h5py.VirtualSource(source_name, dataset['path'], shape=dataset['shape'])
+            if is_volume:
+                layout[i, j, :rows, :columns] = virtual_source
+            else:
+                layout[i, :rows, :columns] = virtual_source
+            gain[i, j] = dataset['what'].get('gain', 1.0)
+            offset[i, j] = dataset['what'].get('offset', 0.0)
+            elangle[i, j] = dataset['elangle']
+
+    what = {'quantity':quantity, 'object':'VDS'}
+    for key in ('nodata', 'undetect'):
+        if key in first_what:
+            what[key] = first_what[key]
+    times = np.array([source['time'] for source in sources], dtype='datetime64[s]').astype(np.int64)
+    filedict = {'/what':what,
+                '/data':{'DATASET':layout, 'FILLVALUE':first_what.get('nodata', 0)},
+                '/time':{'DATASET':times, 'units':'seconds since 1970-01-01'},
+                '/gain':{'DATASET':gain if is_volume else gain[:, 0]},
+                '/offset':{'DATASET':offset if is_volume else offset[:, 0]},
+                '/sources':{'DATASET':np.array([os.path.abspath(name) if absolute_paths else name
+                                                for name in filenames], dtype=h5py.string_dtype())}}
+    if is_volume:
+        filedict['/elangle'] = {'DATASET':elangle}
+    with HiisiHDF(output, 'w') as h5f:
+        h5f.create_from_filedict(filedict)
+    return shape
+
+
+def _file_sources(h5f, quantity):
+    """Returns the time and the datasets of the quantity of one file"""
+    metadata = h5f.metadata()
+    root_what = metadata.get('/what', {})
+    sweeps = _sweep_index(h5f)
+    if sweeps:
+        paths = [(sweep['datasets'].get(quantity), float(sweep['where']['elangle'])) for sweep in sweeps]
+    else:
+        paths = [(path + '/data', np.nan) for path, group_quantity in _data_groups(h5f)
+                 if group_quantity == quantity][:1]
+    datasets = []
+    for path, elangle in paths:
+        if path is None:
+            datasets.append(None)
+            continue
+        dataset = h5f[path]
+        datasets.append({'path':path, 'shape':dataset.shape, 'dtype':dataset.dtype, 'elangle':elangle,
+                         'what':_inherited_attrs(metadata, os.path.dirname(path), 'what')})
+    return {'volume':bool(sweeps), 'datasets':datasets,
+            'time':_datetime64(root_what.get('date'), root_what.get('time'))}
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Volume module contains a lazy labelled view of odim polar volumes.
+
+The view has dimensions sweep, azimuth and range. Sweeps are ordered by
+elevation angle. If the sweeps have different number of rays or bins,
+the shorter sweeps are padded with nan, or with zeros for raw values.
+"""
+from .odim import _decode, _inherited_attrs
+import numpy as np
+
+
+class VolumeView(object):
+    """Lazy labelled view of a polar volume.
+
+    View is created with OdimPVOL.view method.
+
+    Attributes
+    ----------
+    dims : tuple
+        Names of the dimensions ('sweep', 'azimuth', 'range')
+    shape : tuple
+        Size of the dimensions
+    coords : dict
+        Coordinate arrays. 'elangle' has dimension sweep, 'azimuth' has
+        dimension azimuth and 'range' has dimensions sweep and range.
+        Azimuths are ray centres in degrees and ranges bin centres in meters.
+    variables : dict
+        Quantity names and their LazyVariables
+    """
+    def __init__(self, h5f, sweeps, decode=True):
+        self.dims = ('sweep', 'azimuth', 'range')
+        self._sweeps = sweeps
+        quantities = set()
+        nrays = [0]
+        nbins = [0]
+        for sweep in sweeps:
+            quantities.update(sweep['datasets'])
+            for path in sweep['datasets'].values():
+                ray_count, bin_count = h5f[path].shape
+                nrays.append(ray_count)
+                nbins.append(bin_count)
+        self.shape = (len(sweeps), max(nrays), max(nbins))
+
+        ranges = np.full((len(sweeps), self.shape[2]), np.nan)
+        for i, sweep in enumerate(sweeps):
+            where = sweep['where']
+            if 'rscale' in where:
+                rstart = float(where.get('rstart', 0.0)) * 1000.0
+                ranges[i] = rstart + float(where['rscale']) * (np.arange(self.shape[2]) + 0.5)
+        self.coords = {'elangle':np.array([float(sweep['where']['elangle']) for sweep in sweeps]),
+                       'azimuth':(np.arange(self.shape[1]) + 0.5) * 360.0 / max(self.shape[1], 1),
+                       'range':ranges}
+        self.variables = dict((quantity, LazyVariable(h5f, sweeps, quantity, self.shape, decode))
+                              for quantity in sorted(quantities))
+
+    def __getitem__(self, quantity):
+        return self.variables[quantity]
+
+    def __contains__(self, quantity):
+        return quantity in self.variables
+
+    def sel(self, quantity, elangle=None, azimuth=None, distance=None):
+        """Selects values using coordinate values instead of indexes.
+
+        Parameters
+        ----------
+        quantity : str
+            Name of the quantity
+
+        Keywords
+        --------
+        elangle : float or tuple
+            Elevation angle of the nearest sweep or (min, max) tuple of
+            elevation angles. By default all the sweeps are selected.
+        azimuth : tuple
+            (start, end) azimuths in degrees. If start is greater than end
+            the selection continues over the 360-0 border.
+        distance : tuple
+            (start, end) distances from the radar in meters. Selected
+            sweeps must have the same bin geometry.
+
+        Returns
+        -------
+        values : ndarray
+            Array of shape (sweeps, rays, bins)
+
+        Examples
+        --------
+        >>> view = pvol.view()
+        >>> values = view.sel('DBZH', elangle=0.5, azimuth=(350, 10))
+        """
+        variable = self.variables[quantity]
+        elangles = self.coords['elangle']
+        if elangle is None:
+            sweep_index = np.arange(len(elangles))
+        elif isinstance(elangle, tuple):
+            sweep_index = np.nonzero((elangles >= elangle[0]) & (elangles <= elangle[1]))[0]
+        else:
+            sweep_index = np.array([np.argmin(np.abs(elangles - elangle))])
+
+        bin_slice = slice(None)
+        if distance is not None:
+            ranges = self.coords['range'][sweep_index]
+            if len(ranges) > 0 and not np.all(ranges == ranges[0]):
+                raise ValueError('Selected sweeps have different bin geometry')
+            if len(ranges) > 0:
+                inside = np.nonzero((ranges[0] >= distance[0]) & (ranges[0] <= distance[1]))[0]
+                bin_slice = slice(inside[0], inside[-1] + 1) if len(inside) > 0 else slice(0, 0)
+
+        if azimuth is None:
+            return variable[sweep_index, :, bin_slice]
+        azimuths = self.coords['azimuth']
+        start = int(np.searchsorted(azimuths, azimuth[0] % 360.0))
+        end = int(np.searchsorted(azimuths, azimuth[1] % 360.0, side='right'))
+        if azimuth[0] % 360.0 <= azimuth[1] % 360.0:
+            return variable[sweep_index, start:end, bin_slice]
+        return np.concatenate((variable[sweep_index, start:, bin_slice],
+                               variable[sweep_index, :end, bin_slice]), axis=1)
+
+
+class LazyVariable(object):
+    """Quantity of a polar volume that is read only when sliced.
+
+    Supports basic numpy indexing with integers and slices. Sweep dimension
+    can also be indexed with a list of integers.
+
+    Attributes
+    ----------
+    name : str
+        Name of the quantity
+    shape : tuple
+        Shape of the variable (sweeps, rays, bins)
+    dtype : numpy.dtype
+        Type of the values returned by slicing
+    """
+    def __init__(self, h5f, sweeps, name, shape, decode=True):
+        self.name = name
+        self.shape = shape
+        self.ndim = 3
+        self._h5f = h5f
+        self._decode = decode
+        self._paths = [sweep['datasets'].get(name) for sweep in sweeps]
+        self._what = [_inherited_attrs(h5f.metadata(), path, 'what') if path is not None else {}
+                      for path in self._paths]
+        if decode:
+            self.dtype = np.dtype(np.float64)
+        else:
+            self.dtype = np.result_type(*[h5f[path].dtype for path in self._paths if path is not None])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3:
+            raise IndexError('Too many indices for variable')
+        key = key + (slice(None),) * (3 - len(key))
+
+        squeeze = []
+        sweep_key = key[0]
+        if isinstance(sweep_key, (int, np.integer)):
+            squeeze.append(0)
+        sweep_index = np.atleast_1d(np.arange(self.shape[0])[sweep_key])
+        ray_range = self._index_range(key[1], 1, squeeze)
+        bin_range = self._index_range(key[2], 2, squeeze)
+
+        fill = np.nan if self._decode else 0
+        out = np.full((len(sweep_index), len(ray_range), len(bin_range)), fill, dtype=self.dtype)
+        for i, sweep in enumerate(sweep_index):
+            path = self._paths[sweep]
+            if path is None:
+                continue
+            nrays, nbins = self._h5f[path].shape
+            rays = range(ray_range.start, min(ray_range.stop, nrays), ray_range.step)
+            bins = range(bin_range.start, min(bin_range.stop, nbins), bin_range.step)
+            if len(rays) == 0 or len(bins) == 0:
+                continue
+            layer = out[i, :len(rays), :len(bins)]
+            source_sel = np.s_[rays.start:rays.stop:rays.step, bins.start:bins.stop:bins.step]
+            self._h5f._read_dataset(path, out, source_sel, np.s_[i, :len(rays), :len(bins)])
+            if self._decode:
+                _decode(layer, self._what[sweep])
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+    def _index_range(self, key, axis, squeeze):
+        """Converts an integer or a slice into a range of indexes"""
+        size = self.shape[axis]
+        if isinstance(key, (int, np.integer)):
+            index = key + size if key < 0 else key
+            if not 0 <= index < size:
+                raise IndexError('Index {} is out of bounds for axis {}'.format(key, axis))
+            squeeze.append(axis)
+            return range(index, index + 1)
+        if not isinstance(key, slice):
+            raise IndexError('Only integers and slices are supported for axis {}'.format(axis))
+        index_range = range(size)[key]
+        if index_range.step < 0:
+            raise IndexError('Negative steps are not supported')
+        return index_range
+
+    def to_dask(self):
+        """Returns the variable as a dask array whose chunks follow the
+        chunks of the first dataset. Requires dask.
+        """
+        import dask.array as da
+        chunks = (1,) + self.shape[1:]
+        for path in self._paths:
+            if path is not None:
+                chunks = (1,) + (self._h5f[path].chunks or self.shape[1:])
+                break
+        return da.from_array(self, chunks=chunks, name=False, asarray=False)
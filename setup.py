@@ -50,6 +50,12 @@ setup(name='hiisi',
         ],
       keywords='hdf5 hdf hiisi weather radar odim',
       #packages=find_packages(exclude=['docs','tests*']),
-      packages=['hiisi','tests']
+      packages=['hiisi','tests'],
       #install_requires=['h5py'],
+      entry_points={
+        'console_scripts': [
+            'hiisi=hiisi.cli:main',
+            'hiisi-repack=hiisi.repack:main',
+        ],
+      },
     )
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Measures building the index of a catalogue and its nearest and range queries
+with 100k files of one source five minutes apart. Entries are added directly,
+so the files are not written or read.
+
+Run from the tests directory::
+
+    python benchmark_archive.py
+"""
+import env
+from hiisi.archive import Catalogue, Entry
+import numpy as np
+import timeit
+
+N_FILES = 100000
+
+
+def make_catalogue(n_files=N_FILES):
+    """Returns a catalogue without paths holding n_files entries"""
+    catalogue = Catalogue([], update=False)
+    start = np.datetime64('2016-01-01T00:00:00', 's')
+    for i in range(n_files):
+        filename = '/arch/{:06d}_fivan.h5'.format(i)
+        entry = Entry(start + np.timedelta64(300 * i, 's'), 'fivan', 'PVOL', filename)
+        catalogue._files[filename] = (0.0, entry)
+    return catalogue
+
+
+def best_time(function, number):
+    """Returns the smallest time of one call in seconds"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+if __name__ == '__main__':
+    catalogue = make_catalogue()
+    print('{:<30}{:8.1f} ms'.format('build index', best_time(catalogue._build_index, 1) * 1e3))
+    query = lambda: catalogue.nearest('fivan', '2016-06-15T12:02')
+    print('{:<30}{:8.1f} us'.format('nearest', best_time(query, 1000) * 1e6))
+    query = lambda: catalogue.range('fivan', '2016-06-15T12:00', '2016-06-15T13:00')
+    print('{:<30}{:8.1f} us'.format('range, 13 files', best_time(query, 1000) * 1e6))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the import time of hiisi with lazy submodules against importing the
+file classes, which loads h5py, numpy and odim as the package import did
+before the submodules were loaded lazily. Times include the imports of the
+interpreter startup, which are shown separately.
+
+Run from the tests directory::
+
+    python benchmark_import.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+STATEMENTS = [('interpreter startup', 'pass'),
+              ('import hiisi', 'import hiisi'),
+              ('import hiisi + file classes', 'import hiisi; hiisi.HiisiHDF; hiisi.OdimPVOL')]
+
+
+def import_time(statement, repeat=5):
+    """Returns the smallest total import time of a statement in seconds,
+    measured with python -X importtime in fresh interpreters"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=root)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], env=environment,
+                                stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+        # Columns are self and cumulative microseconds, top level imports
+        # are not indented
+        total = sum(int(match.group(1)) for match in
+                    re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \| \S', output, re.MULTILINE))
+        times.append(total / 1e6)
+    return min(times)
+
+
+if __name__ == '__main__':
+    for name, statement in STATEMENTS:
+        print('{:<30}{:8.1f} ms'.format(name, import_time(statement) * 1e3))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the time of compositing synthetic polar volumes with an empty and
+with a filled index map cache, over several numbers of radars and worker
+processes.
+
+Radars with 360x500 sweeps are composited on a 1400x1200 grid. With one
+worker the radars are projected in the calling process, otherwise in a
+process pool. Run from the tests directory::
+
+    python benchmark_mosaic.py
+"""
+import env
+import hiisi
+from hiisi.mosaic import RULES, Grid, composite
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
+
+GRID = Grid(west=18.0, south=58.0, east=32.0, north=70.0, xsize=1400, ysize=1200)
+
+
+def write_radars(directory, n_radars, nrays=360, nbins=500):
+    """Writes synthetic polar volumes on a lattice of sites four columns
+    wide and returns their paths"""
+    rng = np.random.default_rng(0)
+    filenames = []
+    for i in range(n_radars):
+        lat = 59.5 + 1.5 * (i // 4)
+        lon = 20.0 + 3.5 * (i % 4)
+        raw = rng.integers(1, 200, size=(nrays, nbins), dtype=np.uint8)
+        filename = os.path.join(directory, 'radar{}.h5'.format(i))
+        filedict = {'/what':{'object':'PVOL', 'source':'NOD:radar{}'.format(i), 'date':'20160815',
+                             'time':'120000'},
+                    '/where':{'lat':lat, 'lon':lon, 'height':100.0},
+                    '/dataset1/where':{'elangle':0.3 + 0.1 * (i % 3), 'rscale':500.0, 'rstart':0.0},
+                    '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0,
+                                            'nodata':255.0, 'undetect':0.0},
+                    '/dataset1/data1/data':{'DATASET':raw}}
+        with hiisi.HiisiHDF(filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+        filenames.append(filename)
+    return filenames
+
+
+def composite_time(filenames, rule, workers, cache_dir):
+    """Returns the seconds of one composite"""
+    start = time.perf_counter()
+    composite(filenames, GRID, 'DBZH', rule=rule, workers=workers, cache_dir=cache_dir)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    directory = tempfile.mkdtemp()
+    try:
+        print('{:>8}{:>9}{:>12}{:>12}'.format('radars', 'workers', 'empty', 'cached'))
+        for n_radars in (12, 24):
+            radar_dir = os.path.join(directory, str(n_radars))
+            os.mkdir(radar_dir)
+            filenames = write_radars(radar_dir, n_radars)
+            for workers in worker_counts:
+                cache_dir = tempfile.mkdtemp(dir=directory)
+                empty = composite_time(filenames, 'max', workers, cache_dir)
+                cached = composite_time(filenames, 'max', workers, cache_dir)
+                print('{:>8}{:>9}{:>10.2f} s{:>10.2f} s'.format(n_radars, workers, empty, cached))
+        print()
+        print('cached index maps, 24 radars, {} workers'.format(worker_counts[-1]))
+        for rule in RULES:
+            print('{:<30}{:8.2f} s'.format(rule, composite_time(filenames, rule, worker_counts[-1], cache_dir)))
+    finally:
+        shutil.rmtree(directory)
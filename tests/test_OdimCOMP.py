@@ -46,5 +46,31 @@ class Test(unittest.TestCase):
         comp.select_dataset('RATE')
         self.assertIsNone(comp.select_dataset('NONEXISTING'))
 
+    def test_path_tree(self):
+        from hiisi.odim import _path_tree
+        comp = self.getOperaComposite()
+        tree = _path_tree(comp)
+        self.assertEqual(sorted(tree), [1, 2])
+        # Quantity of the OPERA composite is in /datasetN/what
+        self.assertEqual(tree[2]['data'][1]['quantity'], 'QIND')
+        self.assertTrue(tree[2]['data'][1]['dataset'])
+        self.assertIs(_path_tree(comp), tree)
+        filedict = {'/dataset10/data1/what':{'quantity':'DBZH'},
+                    '/dataset10/data1/data':{'DATASET':np.zeros((2, 2))},
+                    '/dataset10/data1/quality2/what':{'task':'fi.fmi.ropo.detector.classification'},
+                    '/dataset10/data1/quality2/data':{'DATASET':np.zeros((2, 2))},
+                    '/dataset10/quality1/data':{'DATASET':np.zeros((2, 2))},
+                    '/dataset10/data11/what':{'quantity':'TH'},
+                    '/dataset9/data1/what':{'quantity':'TH'},
+                    '/dataset9/data1/data':{'DATASET':np.zeros((2, 2))}}
+        with hiisi.OdimCOMP('test_tree.h5', 'w') as comp:
+            comp.create_from_filedict(filedict)
+            tree = _path_tree(comp)
+            self.assertEqual(tree[10]['data'][1]['quality'], {2:'/dataset10/data1/quality2'})
+            self.assertEqual(tree[10]['quality'], {1:'/dataset10/quality1'})
+            self.assertFalse(tree[10]['data'][11]['dataset'])
+            self.assertEqual(comp.select_dataset('TH'), '/dataset9/data1/data')
+        os.remove('test_tree.h5')
+
 if __name__=='__main__':
     unittest.main()
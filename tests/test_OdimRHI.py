@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_rhi.h5'
+        filedict = {'/what':{'object':'XSEC'},
+                    '/dataset1/what':{'product':'RHI'},
+                    '/dataset1/where':{'angles':np.array([0.5, 1.0, 1.5]), 'rscale':500.0, 'rstart':0.0},
+                    '/dataset1/data1/data':{'DATASET':np.arange(3*4).reshape((3, 4))},
+                    '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0},
+                    '/dataset1/data2/data':{'DATASET':np.ones((3, 4))},
+                    '/dataset1/data2/what':{'quantity':'ZDR'}
+                    }
+        with hiisi.OdimRHI(self.filename, 'w') as rhi:
+            rhi.create_from_filedict(filedict)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_coordinates(self):
+        with hiisi.OdimRHI(self.filename, 'r') as rhi:
+            np.testing.assert_array_equal(rhi.angles, [0.5, 1.0, 1.5])
+            np.testing.assert_array_equal(rhi.ranges, [250, 750, 1250, 1750])
+
+    def test_rhi(self):
+        with hiisi.OdimRHI(self.filename, 'r') as rhi:
+            data = rhi.rhi()
+            self.assertEqual(data.shape, (2, 3, 4))
+            np.testing.assert_array_equal(data[0], np.arange(3*4).reshape((3, 4)) * 0.5 - 32.0)
+            np.testing.assert_array_equal(data[1], np.ones((3, 4)))
+
+if __name__=='__main__':
+    unittest.main()
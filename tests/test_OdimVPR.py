@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.odim import read_profiles
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = ['test_vpr1.h5', 'test_vpr2.h5']
+        for i, filename in enumerate(self.filenames):
+            filedict = {'/what':{'object':'VP', 'date':'20160815', 'time':'12{}000'.format(i)},
+                        '/where':{'levels':4, 'interval':200.0, 'minheight':0.0},
+                        '/dataset1/data1/data':{'DATASET':np.arange(4).reshape((4, 1)) + i},
+                        '/dataset1/data1/what':{'quantity':'ff', 'gain':0.5, 'offset':1.0, 'nodata':255.0},
+                        '/dataset1/data2/data':{'DATASET':np.array([[10], [20], [255], [30]])},
+                        '/dataset1/data2/what':{'quantity':'DBZH', 'gain':1.0, 'offset':0.0, 'nodata':255.0}
+                        }
+            with hiisi.OdimVPR(filename, 'w') as vpr:
+                vpr.create_from_filedict(filedict)
+
+    def tearDown(self):
+        for filename in self.filenames:
+            os.remove(filename)
+
+    def test_quantities(self):
+        with hiisi.OdimVPR(self.filenames[0], 'r') as vpr:
+            self.assertEqual(vpr.quantities, ['ff', 'DBZH'])
+
+    def test_heights(self):
+        with hiisi.OdimVPR(self.filenames[0], 'r') as vpr:
+            np.testing.assert_array_equal(vpr.heights, [100, 300, 500, 700])
+
+    def test_heights_quantity(self):
+        with hiisi.OdimVPR(self.filenames[0], 'a') as vpr:
+            vpr.create_from_filedict({'/dataset1/data3/data':{'DATASET':np.array([[1], [3], [255], [7]])},
+                                      '/dataset1/data3/what':{'quantity':'HGHT', 'gain':100.0,
+                                                              'offset':0.0, 'nodata':255.0}})
+        with hiisi.OdimVPR(self.filenames[0], 'r') as vpr:
+            np.testing.assert_array_equal(vpr.heights, [100, 300, np.nan, 700])
+
+    def test_select_dataset(self):
+        with hiisi.OdimVPR(self.filenames[0], 'r') as vpr:
+            self.assertEqual(vpr.select_dataset('DBZH'), '/dataset1/data2/data')
+            self.assertIsNone(vpr.select_dataset('XXXX'))
+
+    def test_profile(self):
+        with hiisi.OdimVPR(self.filenames[0], 'r') as vpr:
+            comparison_array = np.array([[1.0, 1.5, 2.0, 2.5],
+                                         [10, 20, np.nan, 30]])
+            np.testing.assert_array_equal(vpr.profile(), comparison_array)
+            np.testing.assert_array_equal(vpr.profile(['DBZH'], decode=False), [[10, 20, 255, 30]])
+            with self.assertRaises(KeyError):
+                vpr.profile(['XXXX'])
+
+    def test_read_profiles(self):
+        times, heights, profiles = read_profiles(self.filenames, 'ff', decode=False)
+        np.testing.assert_array_equal(times, np.array(['2016-08-15T12:00:00', '2016-08-15T12:10:00'], dtype='datetime64[s]'))
+        np.testing.assert_array_equal(heights, [100, 300, 500, 700])
+        np.testing.assert_array_equal(profiles, [[0, 1, 2, 3], [1, 2, 3, 4]])
+
+if __name__=='__main__':
+    unittest.main()
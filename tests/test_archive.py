@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.archive import Catalogue
+import datetime
+from unittest import mock
+import numpy as np
+import os
+import shutil
+import tempfile
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for source, object_name, times in [('WMO:02975,NOD:fivan', 'PVOL', ['1200', '1205', '1215']),
+                                           ('NOD:fikor', 'PVOL', ['1200']),
+                                           ('ORG:247', 'COMP', ['1210'])]:
+            for time in times:
+                node = source.split(':')[-1]
+                filename = os.path.join(self.directory, '201608151{}_{}_{}.h5'.format(time[1:], node, object_name))
+                with hiisi.HiisiHDF(filename, 'w') as h5f:
+                    h5f.create_from_filedict({'/what':{'object':object_name, 'source':source,
+                                                       'date':'20160815', 'time':time + '00'},
+                                              '/dataset1/where':{'elangle':0.5},
+                                              '/dataset1/data1/what':{'quantity':'DBZH'}})
+                    h5f.create_dataset('/dataset1/data1/data', data=np.zeros((4, 5), dtype=np.uint8))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_queries(self):
+        catalogue = Catalogue(self.directory, workers=1)
+        self.assertEqual(len(catalogue), 5)
+        self.assertEqual(catalogue.sources(), ['ORG:247', 'fikor', 'fivan'])
+        entry = catalogue.nearest('fivan', '2016-08-15T12:09')
+        self.assertEqual(entry.time, np.datetime64('2016-08-15T12:05'))
+        self.assertEqual(catalogue.nearest('fivan', datetime.datetime(2016, 8, 15, 12, 10)).time,
+                         np.datetime64('2016-08-15T12:05'))
+        self.assertEqual(catalogue.nearest('fivan', '2016-08-15T13:00').time, np.datetime64('2016-08-15T12:15'))
+        self.assertIsNone(catalogue.nearest('fivan', '2016-08-15T13:00', tolerance=600))
+        self.assertIsNone(catalogue.nearest('fiuta', '2016-08-15T12:00'))
+        times = [entry.time for entry in catalogue.range('fivan', '2016-08-15T12:05', '2016-08-15T12:15')]
+        self.assertEqual(times, [np.datetime64('2016-08-15T12:05'), np.datetime64('2016-08-15T12:15')])
+        self.assertEqual(catalogue.range('fivan', '2016-08-16', '2016-08-17'), [])
+
+    def test_open(self):
+        catalogue = Catalogue(self.directory, workers=1)
+        with catalogue.open(catalogue.nearest('fivan', '2016-08-15T12:00')) as pvol:
+            self.assertIsInstance(pvol, hiisi.OdimPVOL)
+            self.assertEqual(pvol.select_dataset('A', 'DBZH'), '/dataset1/data1/data')
+        with catalogue.open(catalogue.nearest('ORG:247', '2016-08-15T12:00')) as comp:
+            self.assertIsInstance(comp, hiisi.OdimCOMP)
+
+    def test_filename_pattern(self):
+        catalogue = Catalogue(self.directory, filename_pattern=r'(?P<time>\d{12})_(?P<source>fivan)_(?P<object>PVOL)',
+                              workers=1, update=False)
+        self.assertEqual(catalogue.update(), 5)
+        self.assertEqual(catalogue.nearest('fivan', '2016-08-15T12:14').filename,
+                         os.path.join(self.directory, '201608151215_fivan_PVOL.h5'))
+        self.assertEqual(catalogue.sources(), ['ORG:247', 'fikor', 'fivan'])
+
+    def test_index_file(self):
+        index_file = os.path.join(self.directory, 'index.npz')
+        catalogue = Catalogue(self.directory, index_file=index_file, workers=1)
+        self.assertTrue(os.path.isfile(index_file))
+        loaded = Catalogue(self.directory, index_file=index_file, update=False)
+        self.assertEqual(loaded.range('fivan', '2016-08-15', '2016-08-16'),
+                         catalogue.range('fivan', '2016-08-15', '2016-08-16'))
+        self.assertEqual(loaded.update(), 0)
+        os.remove(os.path.join(self.directory, '201608151200_fikor_PVOL.h5'))
+        with open(os.path.join(self.directory, 'broken.h5'), 'w') as f:
+            f.write('not hdf5')
+        self.assertEqual(loaded.update(), 0)
+        self.assertEqual(loaded.sources(), ['ORG:247', 'fivan'])
+        self.assertEqual([filename for filename, error in loaded.errors],
+                         [os.path.join(self.directory, 'broken.h5')])
+
+    def test_failed_files(self):
+        index_file = os.path.join(self.directory, 'index.npz')
+        broken = os.path.join(self.directory, 'broken.h5')
+        with open(broken, 'w') as f:
+            f.write('not hdf5')
+        catalogue = Catalogue(self.directory, index_file=index_file, workers=1)
+        self.assertEqual([filename for filename, error in catalogue.errors], [broken])
+        # Failed files are not read again until they are modified
+        with mock.patch('hiisi.archive._read_entry') as read_entry:
+            self.assertEqual(catalogue.update(), 0)
+            loaded = Catalogue(self.directory, index_file=index_file, workers=1)
+        read_entry.assert_not_called()
+        self.assertEqual(loaded.errors, catalogue.errors)
+        os.utime(broken, (0, 0))
+        catalogue.update()
+        self.assertEqual([filename for filename, error in catalogue.errors], [broken])
+        with self.assertRaises(ValueError):
+            Catalogue(self.directory, workers=1).save()
+
+if __name__=='__main__':
+    unittest.main()
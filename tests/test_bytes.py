@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import io
+import numpy as np
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        with open('test_data/comp.h5', 'rb') as f:
+            self.payload = f.read()
+
+    def test_open_bytes(self):
+        for payload in (self.payload, bytearray(self.payload), memoryview(self.payload)):
+            with hiisi.OdimCOMP(payload) as comp:
+                self.assertEqual(comp.mode, 'r')
+                self.assertEqual(comp.select_dataset('DBZH'), '/dataset1/data1/data')
+                self.assertEqual(comp.dataset.shape, (500, 500))
+
+    def test_open_bytes_keywords(self):
+        with hiisi.HiisiHDF(self.payload, 'r', rdcc_nbytes=2**16, rdcc_nslots=101, rdcc_w0=0.5) as h5f:
+            self.assertEqual(h5f.id.get_access_plist().get_cache()[1:], (101, 2**16, 0.5))
+        with self.assertRaises(TypeError):
+            hiisi.HiisiHDF(self.payload, 'r', libver='latest')
+
+    def test_modify_bytes(self):
+        with hiisi.HiisiHDF(self.payload, 'r+') as h5f:
+            h5f.create_from_filedict({'/what':{'source':'NOD:fikor'}})
+            modified = h5f.to_bytes()
+        with hiisi.HiisiHDF(modified) as h5f:
+            self.assertEqual(h5f['/what'].attrs['source'], 'NOD:fikor')
+        with hiisi.HiisiHDF(self.payload) as h5f:
+            self.assertEqual(h5f['/what'].attrs['source'], b'WMO:02975,RAD:FI42,PLC:Vantaa,NOD:fivan')
+        with self.assertRaises(ValueError):
+            hiisi.HiisiHDF(self.payload, 'w')
+
+    def test_create_in_memory(self):
+        filedict = {'/dataset1/where':{'elangle':0.5, 'rscale':500.0},
+                    '/dataset1/data1/what':{'quantity':'DBZH'},
+                    '/dataset1/data1/data':{'DATASET':np.arange(12).reshape((3, 4))}}
+        with hiisi.HiisiHDF(io.BytesIO(), 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+            payload = h5f.to_bytes()
+        with hiisi.OdimPVOL(payload) as pvol:
+            self.assertEqual(pvol.elangles, {'A':0.5})
+            pvol.select_dataset('A', 'DBZH')
+            np.testing.assert_array_equal(pvol.sector(1, 2), [[4, 5, 6, 7], [8, 9, 10, 11]])
+
+    def test_file_to_bytes(self):
+        with hiisi.HiisiHDF('test_data/comp.h5', 'r') as h5f:
+            self.assertEqual(h5f.to_bytes(), self.payload)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+from hiisi.cli import main
+from contextlib import redirect_stdout
+import h5py
+import io
+import numpy as np
+import os
+import shutil
+import tempfile
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.comp = 'test_data/comp.h5'
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def run_main(self, argv):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            status = main(argv)
+        return status, stdout.getvalue().splitlines()
+
+    def test_peek(self):
+        status, lines = self.run_main(['peek', self.comp])
+        self.assertIn('test_data/comp.h5\twhat/object\tCOMP', lines)
+
+    def test_ls(self):
+        status, lines = self.run_main(['ls', '-j', '1', self.comp])
+        self.assertEqual(status, 0)
+        self.assertEqual(lines, ['test_data/comp.h5\t/dataset1/data1/data\t(500, 500)\tuint8'])
+        status, lines = self.run_main(['ls', '--groups', self.comp])
+        self.assertIn('test_data/comp.h5\t/dataset1/where', lines)
+
+    def test_search(self):
+        status, lines = self.run_main(['search', 'quantity', 'DBZH', 'test_data/c*.h5'])
+        self.assertEqual(lines, ['test_data/comp.h5\t/dataset1/data1/what\tDBZH'])
+        status, lines = self.run_main(['search', 'gain', '0.4', '--tol', '0.2', self.comp])
+        self.assertEqual(lines, ['test_data/comp.h5\t/dataset1/data1/what\t0.5'])
+
+    def test_extract(self):
+        status, lines = self.run_main(['extract', '--quantity', 'DBZH', '--decode', '-o', self.output_dir, self.comp])
+        self.assertEqual(status, 0)
+        data = np.load(os.path.join(self.output_dir, 'comp_DBZH.npy'))
+        with h5py.File(self.comp, 'r') as h5f:
+            raw = h5f['/dataset1/data1/data'][()]
+        self.assertEqual(data.shape, (500, 500))
+        self.assertTrue(np.all(np.isnan(data[(raw == 255) | (raw == 0)])))
+        valid = (raw != 255) & (raw != 0)
+        np.testing.assert_allclose(data[valid], raw[valid] * 0.5 - 32)
+
+    def test_extract_netcdf(self):
+        self.run_main(['extract', '--quantity', 'DBZH', '--format', 'nc', '-o', self.output_dir, self.comp])
+        with h5py.File(os.path.join(self.output_dir, 'comp_DBZH.nc'), 'r') as h5f:
+            self.assertEqual(h5f['DBZH'].shape, (500, 500))
+            self.assertEqual(h5f['DBZH'].dims[1][0].name, '/x')
+
+    def test_stats(self):
+        status, lines = self.run_main(['stats', '--quantity', 'DBZH', self.comp])
+        columns = lines[0].split('\t')
+        self.assertEqual(columns[:4], ['test_data/comp.h5', '/dataset1/data1/data', 'DBZH', '(500, 500)'])
+        with h5py.File(self.comp, 'r') as h5f:
+            raw = h5f['/dataset1/data1/data'][()]
+        self.assertAlmostEqual(float(columns[7]), np.mean(raw == 255), places=4)
+
+    def test_validate(self):
+        status, lines = self.run_main(['validate', '--thorough', self.comp])
+        self.assertEqual((status, lines), (0, []))
+        invalid = os.path.join(self.output_dir, 'invalid.h5')
+        with h5py.File(invalid, 'w') as h5f:
+            h5f.create_group('/what').attrs['object'] = np.bytes_(b'PVOL')
+        status, lines = self.run_main(['validate', self.comp, invalid])
+        self.assertEqual(status, 1)
+        self.assertIn('{}\tINVALID\t/what\tmissing attribute date'.format(invalid), lines)
+
+    def test_missing_quantity(self):
+        status, lines = self.run_main(['extract', '--quantity', 'XYZ', self.comp])
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, ['test_data/comp.h5\tERROR\tKeyError: \'Quantity XYZ is not found from file\''])
+
+    def test_errors(self):
+        status, lines = self.run_main(['extract', '--quantity', 'XYZ', self.comp, 'not_existing_file.h5'])
+        self.assertEqual(status, 1)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all('\tERROR\t' in line for line in lines))
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = ['test_diff1.h5', 'test_diff2.h5']
+        self.filedict = {'/what':{'object':'PVOL'},
+                         '/dataset1/where':{'elangle':0.5},
+                         '/dataset1/data1/what':{'quantity':'DBZH'},
+                         '/dataset1/data1/data':{'DATASET':np.arange(100*10).reshape((100, 10))}}
+
+    def tearDown(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def create(self, filename, filedict, **kwargs):
+        with hiisi.HiisiHDF(filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+            for path, content in filedict.items():
+                if 'DATASET' in content and kwargs:
+                    del h5f[path]
+                    h5f.create_dataset(path, data=content['DATASET'], **kwargs)
+
+    def test_diff_identical(self):
+        for filename in self.filenames:
+            self.create(filename, self.filedict, chunks=(10, 10), compression='gzip')
+        with hiisi.HiisiHDF(self.filenames[0], 'r') as h5f:
+            self.assertEqual(h5f.diff(self.filenames[1]), [])
+
+    def test_diff_nan_attributes(self):
+        filedict = dict(self.filedict, **{'/how':{'arr':np.array([1.0, np.nan]), 'value':np.nan}})
+        for filename in self.filenames:
+            self.create(filename, filedict)
+        with hiisi.HiisiHDF(self.filenames[0], 'r') as h5f:
+            self.assertEqual(h5f.diff(self.filenames[1]), [])
+
+    def test_diff_attributes_and_chunks(self):
+        self.create(self.filenames[0], self.filedict, chunks=(10, 10), compression='gzip')
+        data = np.arange(100*10).reshape((100, 10))
+        data[55, 5] = -1
+        self.create(self.filenames[1], {'/what':{'object':'SCAN'},
+                                        '/dataset1/data1/data':{'DATASET':data}}, chunks=(10, 10), compression='gzip')
+        with hiisi.HiisiHDF(self.filenames[0], 'r') as h5f:
+            differences = h5f.diff(self.filenames[1])
+        self.assertEqual([(d.path, d.kind, d.name) for d in differences],
+                         [('/dataset1/data1/data', 'data', (50, 0)),
+                          ('/dataset1/data1/what', 'object', None),
+                          ('/dataset1/where', 'object', None),
+                          ('/what', 'attribute', 'object')])
+
+    def test_diff_different_storage(self):
+        self.create(self.filenames[0], self.filedict, chunks=(10, 10), compression='gzip')
+        self.create(self.filenames[1], self.filedict)
+        with hiisi.HiisiHDF(self.filenames[0], 'r') as h5f:
+            self.assertEqual(h5f.diff(self.filenames[1]), [])
+
+    def test_merge(self):
+        self.create(self.filenames[0], self.filedict)
+        self.create(self.filenames[1], {'/dataset1/where':{'elangle':0.5},
+                                        '/dataset1/what':{'quantity':'VRAD', 'gain':0.5},
+                                        '/dataset1/data1/data':{'DATASET':np.ones((100, 10))},
+                                        '/dataset2/where':{'elangle':1.5},
+                                        '/dataset2/data1/what':{'quantity':'DBZH'},
+                                        '/dataset2/data1/data':{'DATASET':np.zeros((100, 10))}})
+        with hiisi.OdimPVOL(self.filenames[0], 'a') as pvol:
+            copied = pvol.merge(self.filenames[1])
+            self.assertEqual(copied, [('/dataset1/data1', '/dataset1/data2'), ('/dataset2', '/dataset2')])
+            self.assertEqual(pvol.quantities, ['DBZH', 'VRAD'])
+            self.assertEqual(pvol['/dataset1/data2/what'].attrs['gain'], 0.5)
+            np.testing.assert_array_equal(pvol['/dataset1/data2/data'][:], np.ones((100, 10)))
+
+if __name__=='__main__':
+    unittest.main()
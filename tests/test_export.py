@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+from hiisi.export import metadata_table, to_structured
+from hiisi.parallel import find_files
+import numpy as np
+
+class Test(unittest.TestCase):
+
+    def test_find_files(self):
+        self.assertEqual(find_files(['test_data/*.hdf', 'test_data/comp.h5']),
+                         ['test_data/T_PAAH21_C_EUOC_20160815114500.hdf',
+                          'test_data/T_PAAH21_C_EUOC_20160815120000.hdf',
+                          'test_data/comp.h5'])
+        self.assertEqual(find_files('test_data', patterns=('*.hdf',)),
+                         ['test_data/T_PAAH21_C_EUOC_20160815114500.hdf',
+                          'test_data/T_PAAH21_C_EUOC_20160815120000.hdf'])
+
+    def test_metadata_table(self):
+        table = metadata_table(['test_data/comp.h5', 'test_data/T_PAAH21_C_EUOC_20160815114500.hdf'], workers=2)
+        np.testing.assert_array_equal(table['what/quantity'], ['RATE', 'QIND', 'DBZH'])
+        np.testing.assert_array_equal(table['data'], ['/dataset1/data1', '/dataset2/data1', '/dataset1/data1'])
+        self.assertEqual(table['what/gain'].dtype, np.float64)
+        self.assertEqual(table['where/xsize'].dtype, np.int64)
+        np.testing.assert_array_equal(table['where/xsize'], [1900, 1900, 500])
+        np.testing.assert_array_equal(table['how/camethod'], ['', '', 'OVERWRITE'])
+
+    def test_to_structured(self):
+        table = metadata_table('test_data/comp.h5')
+        array = to_structured(table)
+        self.assertEqual(array.shape, (1,))
+        self.assertEqual(array['what/object'][0], 'COMP')
+        self.assertEqual(array[array['what/gain'] > 0]['what/quantity'][0], 'DBZH')
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi import geometry
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_geometry.h5'
+        filedict = {'/where':{'lat':60.0, 'lon':25.0, 'height':100.0},
+                    '/dataset1/where':{'elangle':0.5, 'nrays':4, 'nbins':200, 'rscale':1000.0, 'rstart':0.0},
+                    '/dataset2/where':{'elangle':0.5, 'nrays':4, 'nbins':200, 'rscale':1000.0, 'rstart':0.0},
+                    '/dataset3/where':{'elangle':90.0, 'nrays':4, 'nbins':200, 'rscale':1000.0, 'rstart':0.0}}
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_beam_height(self):
+        # Beam height at 100 km with 0.5 degree elevation is about 1.5 km
+        height = geometry.beam_height(np.array([0.0, 100000.0]), 0.5, 100.0)
+        np.testing.assert_allclose(height, [100.0, 100.0 + 872.6 + 588.5], atol=1.0)
+        np.testing.assert_allclose(geometry.ground_range(np.array([1000.0]), 90.0), [0.0], atol=1e-6)
+        self.assertAlmostEqual(geometry.effective_radius_factor(-40.0), 1.342, 3)
+
+    def test_destination(self):
+        lat, lon = geometry.destination(60.0, 25.0, [0.0, 90.0], [111195.0])
+        np.testing.assert_allclose(lat[0], [61.0], atol=1e-3)
+        np.testing.assert_allclose(lon[1], [27.0], atol=0.01)
+
+    def test_inverse(self):
+        lat, lon = geometry.destination(60.0, 25.0, [10.0, 200.0], [1000.0, 150000.0])
+        azimuths, distances = geometry.polar_coordinates(60.0, 25.0, lat, lon)
+        np.testing.assert_allclose(azimuths, [[10.0, 10.0], [200.0, 200.0]], atol=1e-6)
+        np.testing.assert_allclose(distances, [[1000.0, 150000.0]] * 2, rtol=1e-6)
+        ranges = np.array([1000.0, 250000.0])
+        np.testing.assert_allclose(geometry.slant_range(geometry.ground_range(ranges, 3.0), 3.0), ranges)
+        self.assertTrue(np.isnan(geometry.slant_range(1e6, 89.0)))
+
+    def test_pvol_geometry_cache(self):
+        cache = geometry.GeometryCache()
+        with hiisi.OdimPVOL(self.filename, 'r') as pvol:
+            first = pvol.geometry('A', cache=cache)
+            second = pvol.geometry('B', cache=cache)
+            self.assertIs(first, second)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual(first.lat.shape, (4, 200))
+            np.testing.assert_array_equal(first.azimuth, [45, 135, 225, 315])
+            self.assertFalse(first.lat.flags.writeable)
+            vertical = pvol.geometry('C', dtype=np.float32, cache=cache)
+            self.assertEqual(vertical.height.dtype, np.float32)
+            np.testing.assert_allclose(vertical.height[:2], [600.0, 1600.0], rtol=1e-5)
+            for elangle in ('D', 'a', 'AA'):
+                with self.assertRaises(KeyError):
+                    pvol.geometry(elangle)
+
+    def test_cache_memory_bound(self):
+        cache = geometry.GeometryCache(maxbytes=100000)
+        for elangle in (0.5, 1.5, 2.5):
+            cache.sweep_geometry(60.0, 25.0, 0.0, elangle, 10, 500, 500.0)
+        self.assertLessEqual(cache.nbytes, 100000)
+        self.assertEqual(len(cache), 1)
+
+if __name__=='__main__':
+    unittest.main()
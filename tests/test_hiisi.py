@@ -69,6 +69,12 @@ class Test(unittest.TestCase):
     def test_attr_exists_false(self):
         self.assertFalse(self.h5file.attr_exists('not_existing_attr'))    
 
+    def test_attr_count(self):
+        assert self.h5file.attr_count('reoccuring_attr') == 3
+        assert self.h5file.attr_count('reoccuring_attr', limit=2) == 2
+        assert self.h5file.attr_count('unique_attr') == 1
+        assert self.h5file.attr_count('not_existing_attr') == 0
+
     def test_datasets(self):
         assert list(self.h5file.datasets()) == self.dataset_paths
         
@@ -97,6 +103,12 @@ class Test(unittest.TestCase):
         with self.assertRaises(StopIteration):
             next(attr_gen)
             
+    def test_metadata(self):
+        metadata = self.h5file.metadata()
+        assert sorted(metadata.keys()) == sorted(self.group_paths + self.dataset_paths)
+        assert metadata[self.unique_attr_path]['unique_attr'] == self.unique_attr_value
+        assert self.h5file.metadata() is metadata
+
     def test_create_from_filedict_new_file(self):
         filename = 'create_from_filedict_test.h5'
         with hiisi.HiisiHDF(filename, 'w') as h5f:
@@ -161,12 +173,59 @@ class Test(unittest.TestCase):
             assert h5f['/dataset1/data1/what'].attrs['D'] == 123
         os.remove(filename)
            
+    def test_create_from_filedict_incremental(self):
+        filename = 'create_from_filedict_test.h5'
+        file_dict = {}
+        file_dict['/'] = {'A':1}
+        file_dict['/dataset1/data1/data'] = {'DATASET':np.arange(9).reshape((3,3)), 'C':'c'}
+        file_dict['/dataset2/data1/data'] = {'DATASET':np.zeros((3,3)), 'C':'c'}
+        with hiisi.HiisiHDF(filename, 'w') as h5f:
+            assert sorted(h5f.create_from_filedict(file_dict, incremental=True)) == ['/', '/dataset1/data1/data', '/dataset2/data1/data']
+            assert h5f.create_from_filedict(file_dict, incremental=True) == []
+        file_dict['/dataset2/data1/data'] = {'DATASET':np.ones((3,3)), 'C':'c'}
+        file_dict['/'] = {'A':2}
+        with hiisi.HiisiHDF(filename, 'a') as h5f:
+            assert sorted(h5f.create_from_filedict(file_dict, incremental=True)) == ['/', '/dataset2/data1/data']
+        with hiisi.HiisiHDF(filename, 'r') as h5f:
+            assert h5f['/'].attrs['A'] == 2
+            np.testing.assert_array_equal(h5f['/dataset2/data1/data'][:], np.ones((3,3)))
+        os.remove(filename)
+
+    def test_create_from_filedict_incremental_strings(self):
+        filename = 'create_from_filedict_test.h5'
+        with h5py.File(filename, 'w') as h5f:
+            h5f.create_group('/what').attrs['quantity'] = np.bytes_(b'DBZH')
+            h5f['/what'].attrs['source'] = np.bytes_(b'NOD:fivan')
+        with hiisi.HiisiHDF(filename, 'a') as h5f:
+            assert h5f.create_from_filedict({'/what':{'quantity':'DBZH'}}, incremental=True) == []
+            assert h5f.create_from_filedict({'/what':{'source':'NOD:fikor'}}, incremental=True) == ['/what']
+        with h5py.File(filename, 'r') as h5f:
+            for key, value in [('quantity', b'DBZH'), ('source', b'NOD:fikor')]:
+                attr = h5f['/what'].attrs[key]
+                assert attr == value
+                assert h5f['/what'].attrs.get_id(key).dtype.kind == 'S'
+                assert h5py.check_string_dtype(h5f['/what'].attrs.get_id(key).dtype).length is not None
+        os.remove(filename)
+
     def test_search_no_match(self):
         assert [] == list(self.h5file.search('madeupkey', 'xyz'))
             
     def test_search_single_match(self):
         assert [self.unique_attr_path] == list(self.h5file.search('unique_attr', self.unique_attr_value))
             
+    def test_search_subtree_and_limit(self):
+        assert list(self.h5file.search('reoccuring_attr', self.reoccuring_attr_items[1][1], path='/branch1')) == ['/branch1']
+        assert list(self.h5file.search('reoccuring_attr', self.reoccuring_attr_items[1][1], path='/branch2')) == []
+        assert len(self.h5file.search('reoccuring_attr', self.reoccuring_attr_items[1][1], limit=1)) == 1
+        assert self.h5file.attr_count('unique_attr', path='/branch0') == 0
+
+    def test_first(self):
+        pair = self.h5file.first('unique_attr', path='/branch1')
+        assert pair.path == self.unique_attr_path
+        assert pair.value == self.unique_attr_value
+        assert self.h5file.first('reoccuring_attr').path == '/branch0'
+        assert self.h5file.first('not_existing_attr') is None
+
     def test_search_multiple_matches(self):
         filename = 'test_search_multiple_matches.h5'
         with hiisi.HiisiHDF(filename, 'w') as h5f:
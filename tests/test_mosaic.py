@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.mosaic import Grid, IndexMapCache, composite, merge, project_file, write_composite
+import io
+import numpy as np
+import os
+import shutil
+import tempfile
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.grid = Grid(west=24.0, south=60.0, east=26.0, north=61.0, xsize=40, ysize=20)
+        self.filenames = []
+        # Two radars 30 km apart, the western one with lower beams
+        for name, lon, elangle, value in [('west', 24.7, 0.3, 20), ('east', 25.3, 1.5, 40)]:
+            raw = np.full((36, 100), value, dtype=np.uint8)
+            raw[:, 90:] = 0
+            filename = os.path.join(self.directory, name + '.h5')
+            filedict = {'/what':{'object':'PVOL', 'source':'NOD:fi' + name, 'date':'20160815', 'time':'120000'},
+                        '/where':{'lat':60.5, 'lon':lon, 'height':100.0},
+                        '/dataset1/where':{'elangle':elangle, 'rscale':500.0, 'rstart':0.0},
+                        '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0,
+                                                'nodata':255.0, 'undetect':0.0},
+                        '/dataset1/data1/data':{'DATASET':raw}}
+            with hiisi.HiisiHDF(filename, 'w') as h5f:
+                h5f.create_from_filedict(filedict)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_index_map(self):
+        cache = IndexMapCache(directory=self.directory)
+        index_map = cache.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0)
+        self.assertIs(cache.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0), index_map)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # Pixels within 50 km, i.e. about 0.9 degrees of longitude, are covered
+        rows, cols = np.divmod(index_map.pixels, self.grid.xsize)
+        self.assertEqual((cols.min(), cols.max()), (0, 31))
+        self.assertTrue(np.all(index_map.distance < 50000))
+        self.assertTrue(np.all(index_map.bins < 36 * 100))
+        # Index maps stored in the directory are shared by new caches
+        other = IndexMapCache(directory=self.directory)
+        np.testing.assert_array_equal(other.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0).bins,
+                                      index_map.bins)
+        self.assertEqual((other.hits, other.misses), (1, 0))
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+
+    def test_index_map_corrupt_file(self):
+        cache = IndexMapCache(directory=self.directory)
+        index_map = cache.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0)
+        for name in os.listdir(self.directory):
+            if name.startswith('index_map_'):
+                with open(os.path.join(self.directory, name), 'r+b') as f:
+                    f.truncate(100)
+        other = IndexMapCache(directory=self.directory)
+        np.testing.assert_array_equal(other.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0).bins,
+                                      index_map.bins)
+        self.assertEqual((other.hits, other.misses), (0, 1))
+        third = IndexMapCache(directory=self.directory)
+        third.index_map(self.grid, 60.5, 24.7, 100.0, 0.3, 36, 100, 500.0)
+        self.assertEqual((third.hits, third.misses), (1, 0))
+
+    def test_rules(self):
+        projections = [project_file(filename, self.grid, 'DBZH') for filename in self.filenames]
+        west = np.zeros(self.grid.xsize * self.grid.ysize, dtype=bool)
+        west[projections[0]['pixels'][~np.isnan(projections[0]['values'])]] = True
+        east = np.zeros_like(west)
+        east[projections[1]['pixels'][~np.isnan(projections[1]['values'])]] = True
+        west, east = west.reshape((20, 40)), east.reshape((20, 40))
+        both = west & east
+        data, undetect = merge(projections, self.grid, 'max')
+        self.assertTrue(np.all(data[east] == -12.0))
+        self.assertTrue(np.all(data[west & ~east] == -22.0))
+        self.assertTrue(np.all(np.isnan(data[~west & ~east])))
+        self.assertTrue(np.any(undetect) and not np.any(undetect & (west | east)))
+        # Beam of the western radar is lower in the middle, but not next
+        # to the eastern radar
+        data, undetect = merge(projections, self.grid, 'lowest')
+        self.assertEqual((data[10, 20], data[10, 26]), (-22.0, -12.0))
+        data, undetect = merge(projections, self.grid, 'nearest')
+        self.assertEqual(data[10, 5], -22.0)
+        self.assertEqual(data[10, 34], -12.0)
+        data, undetect = merge(projections, self.grid, 'weighted')
+        self.assertTrue(np.all((data[both] > -22.0) & (data[both] < -12.0)))
+        self.assertTrue(-17.0 < data[10, 20] < -12.0)
+        with self.assertRaises(ValueError):
+            merge(projections, self.grid, 'median')
+
+    def test_composite(self):
+        result = composite(self.filenames + ['not_existing_file.h5'], self.grid, 'DBZH', rule='max', workers=1)
+        self.assertEqual(result['nodes'], ['fiwest', 'fieast'])
+        self.assertEqual(result['errors'][0][0], 'not_existing_file.h5')
+        self.assertEqual(result['start'], np.datetime64('2016-08-15T12:00:00'))
+        output = io.BytesIO()
+        write_composite(output, result, self.grid, 'DBZH', 'max',
+                        encoding={'dtype':'uint8', 'gain':0.5, 'offset':-32.0, 'nodata':255, 'undetect':0})
+        with hiisi.OdimCOMP(output.getvalue()) as comp:
+            self.assertEqual(comp.select_dataset('DBZH'), '/dataset1/data1/data')
+            stored = comp.dataset
+            self.assertEqual(stored.dtype, np.uint8)
+            self.assertEqual(comp['/how'].attrs['camethod'], b'MAXIMUM')
+            self.assertEqual(comp['/what'].attrs['date'], b'20160815')
+        np.testing.assert_array_equal(stored[~np.isnan(result['data'])],
+                                      (result['data'][~np.isnan(result['data'])] + 32) * 2)
+        self.assertTrue(np.all(stored[result['undetect']] == 0))
+        self.assertTrue(np.all(stored[np.isnan(result['data']) & ~result['undetect']] == 255))
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.peek import peek
+import subprocess
+import sys
+import os
+
+class Test(unittest.TestCase):
+
+    def test_peek(self):
+        metadata = peek('test_data/comp.h5')
+        self.assertEqual(list(metadata), ['what'])
+        self.assertEqual(metadata['what']['object'], 'COMP')
+        self.assertEqual(metadata['what']['time'], '130000')
+        metadata = peek('test_data/T_PAAH21_C_EUOC_20160815114500.hdf', groups=('where',))
+        self.assertEqual(list(metadata), ['where'])
+        self.assertEqual(metadata['where']['xsize'], 1900)
+        self.assertEqual(list(peek('test_data/comp.h5', groups=('how',))), [])
+
+    def test_lazy_import(self):
+        code = ('import sys, hiisi; heavy = [name for name in ("h5py", "numpy", "hiisi.odim") if name in sys.modules]; '
+                'hiisi.OdimPVOL; print(heavy, "hiisi.odim" in sys.modules)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(hiisi.__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.decode().strip(), '[] True')
+
+    def test_lazy_attributes(self):
+        self.assertIs(hiisi.HiisiHDF, hiisi.hiisihdf.HiisiHDF)
+        self.assertTrue(callable(hiisi.geometry.sweep_geometry))
+        self.assertIn('OdimCOMP', dir(hiisi))
+        self.assertIs(hiisi.peek.peek, peek)
+        with self.assertRaises(AttributeError):
+            hiisi.not_existing
+
+if __name__=='__main__':
+    unittest.main()
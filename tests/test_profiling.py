@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi import profiling
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_profiling.h5'
+        filedict = {'/dataset1/data1/data':{'DATASET':np.zeros((10, 10), dtype='uint8')},
+                    '/dataset1/data1/what':{'quantity':'DBZH'}}
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_profile(self):
+        with hiisi.OdimCOMP(self.filename, 'r') as comp:
+            with profiling.profile() as prof:
+                self.assertIs(profiling.ACTIVE, prof)
+                comp.select_dataset('DBZH')
+                comp.dataset
+                comp.metadata()
+                comp.metadata()
+            self.assertIsNone(profiling.ACTIVE)
+        # select_dataset uses the metadata index, so the file is walked once
+        self.assertEqual(prof.counters['visititems'], 1)
+        self.assertEqual(prof.counters['attributes_read'], 1)
+        self.assertEqual(prof.counters['bytes_read'], 100)
+        self.assertEqual(prof.counters['cache_misses'], 1)
+        self.assertEqual(prof.counters['cache_hits'], 2)
+        self.assertEqual(prof.dataset_bytes[(self.filename, '/dataset1/data1/data')], 100)
+
+    def test_statsd_hook(self):
+        class Client(object):
+            def __init__(self):
+                self.calls = []
+            def incr(self, name, value):
+                self.calls.append(('incr', name, value))
+            def timing(self, name, value):
+                self.calls.append(('timing', name))
+        client = Client()
+        with hiisi.HiisiHDF(self.filename, 'r') as h5f:
+            with profiling.profile(profiling.StatsdHook(client)):
+                h5f.datasets()
+        self.assertEqual(client.calls, [('incr', 'hiisi.visititems', 1), ('timing', 'hiisi.visititems')])
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_quality.h5'
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict({'/dataset1/where':{'elangle':0.5},
+                                      '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0,
+                                                              'nodata':255.0, 'undetect':0.0},
+                                      '/dataset1/quality1/how':{'task':'se.smhi.detector.beamblockage'},
+                                      '/dataset1/quality1/what':{'gain':0.01, 'offset':0.0},
+                                      '/dataset1/quality2/what':{'quantity':'QIND', 'gain':0.01, 'offset':0.0},
+                                      '/dataset1/data1/quality1/how':{'task':'se.smhi.detector.beamblockage'},
+                                      '/dataset1/data1/quality1/what':{'gain':0.1, 'offset':0.0, 'nodata':255.0},
+                                      '/dataset1/data2/what':{'quantity':'VRAD'}})
+            h5f.create_dataset('/dataset1/data1/data', data=np.full((4, 5), 100, dtype=np.uint8))
+            h5f.create_dataset('/dataset1/quality1/data', data=np.full((4, 5), 100, dtype=np.uint8))
+            h5f.create_dataset('/dataset1/quality2/data', data=np.arange(20, dtype=np.uint8).reshape((4, 5)) * 5)
+            h5f.create_dataset('/dataset1/data1/quality1/data',
+                               data=np.array([[10, 2, 10, 255, 10]] * 4, dtype=np.uint8))
+            h5f.create_dataset('/dataset1/data2/data', data=np.zeros((4, 5), dtype=np.uint8))
+        self.pvol = hiisi.OdimPVOL(self.filename, 'r')
+
+    def tearDown(self):
+        self.pvol.close()
+        os.remove(self.filename)
+
+    def test_quality_fields(self):
+        self.pvol.select_dataset('A', 'DBZH')
+        self.assertEqual(self.pvol.quality_fields(),
+                         {'se.smhi.detector.beamblockage':'/dataset1/data1/quality1/data',
+                          'QIND':'/dataset1/quality2/data'})
+        self.pvol.select_dataset('A', 'VRAD')
+        self.assertEqual(sorted(self.pvol.quality_fields()), ['QIND', 'se.smhi.detector.beamblockage'])
+
+    def test_masked(self):
+        self.pvol.select_dataset('A', 'DBZH')
+        data, mask = self.pvol.masked({'se.smhi.detector.beamblockage':0.5, 'QIND':0.2}, np.s_[1:3, :])
+        expected = np.array([[False, True, False, True, False], [False, True, False, True, False]])
+        np.testing.assert_array_equal(mask, expected)
+        self.assertTrue(np.all(np.isnan(data[mask])))
+        np.testing.assert_array_equal(data[~mask], 18.0)
+        raw, raw_mask = self.pvol.masked({'QIND':0.5}, decode=False)
+        np.testing.assert_array_equal(raw, 100)
+        self.assertEqual(raw_mask.sum(), 10)
+
+    def test_masked_invalid(self):
+        with self.assertRaises(ValueError):
+            self.pvol.masked({'QIND':0.5})
+        self.pvol.select_dataset('A', 'DBZH')
+        with self.assertRaises(KeyError):
+            self.pvol.masked({'fi.fmi.ropo.detector.classification':0.5})
+
+    def test_masked_shape_mismatch(self):
+        self.pvol.close()
+        with hiisi.HiisiHDF(self.filename, 'a') as h5f:
+            del h5f['/dataset1/quality2/data']
+            h5f.create_dataset('/dataset1/quality2/data', data=np.zeros((4, 4), dtype=np.uint8))
+        self.pvol = hiisi.OdimPVOL(self.filename, 'r')
+        self.pvol.select_dataset('A', 'DBZH')
+        with self.assertRaisesRegex(ValueError, 'QIND'):
+            self.pvol.masked({'QIND':0.5})
+
+    def test_comp(self):
+        with hiisi.OdimCOMP(self.filename, 'r') as comp:
+            comp.select_dataset('DBZH')
+            self.assertIn('QIND', comp.quality_fields())
+            data, mask = comp.masked({'QIND':0.9})
+            self.assertEqual(mask.sum(), 18)
+
+if __name__=='__main__':
+    unittest.main()
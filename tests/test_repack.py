@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+from hiisi.repack import repack_file, main
+import h5py
+import numpy as np
+import os
+import shutil
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_repack.h5'
+        with h5py.File(self.filename, 'w') as h5f:
+            h5f.attrs['Conventions'] = np.bytes_(b'ODIM_H5/V2_2')
+            what = h5f.create_group('/dataset1/data1/what')
+            what.attrs['gain'] = np.float32(0.5)
+            what.attrs['quantity'] = 'DBZH'
+            dataset = h5f.create_dataset('/dataset1/data1/data', data=np.zeros((360, 500), dtype='uint8'))
+            dataset.attrs['CLASS'] = np.bytes_(b'IMAGE')
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_repack_file(self):
+        size_before = os.path.getsize(self.filename)
+        result = repack_file(self.filename, chunks=(90, 500))
+        self.assertIsNone(result['error'])
+        self.assertTrue(result['replaced'])
+        self.assertEqual(result['size_after'], os.path.getsize(self.filename))
+        self.assertLess(result['size_after'], size_before)
+        with h5py.File(self.filename, 'r') as h5f:
+            dataset = h5f['/dataset1/data1/data']
+            self.assertEqual(dataset.compression, 'gzip')
+            self.assertEqual(dataset.chunks, (90, 500))
+            self.assertEqual(h5f['/dataset1/data1/what'].attrs.get_id('gain').dtype, np.float32)
+            self.assertEqual(h5f.attrs.get_id('Conventions').dtype, np.dtype('S12'))
+        self.assertEqual([name for name in os.listdir('.') if name.startswith('.hiisi-repack-')], [])
+
+    def test_repack_string_types(self):
+        shutil.copyfile('test_data/T_PAAH21_C_EUOC_20160815120000.hdf', self.filename)
+        def string_types(filename):
+            types = {}
+            def visit(name, obj):
+                for key in obj.attrs:
+                    attr_type = obj.attrs.get_id(key).get_type()
+                    if isinstance(attr_type, h5py.h5t.TypeStringID):
+                        types[(obj.name, key)] = (attr_type.get_strpad(), attr_type.get_cset(),
+                                              attr_type.is_variable_str(), attr_type.get_size())
+            with h5py.File(filename, 'r') as h5f:
+                visit('/', h5f)
+                h5f.visititems(visit)
+            return types
+        types = string_types(self.filename)
+        self.assertEqual(types[('/what', 'source')][0], h5py.h5t.STR_NULLTERM)
+        result = repack_file(self.filename, force=True)
+        self.assertIsNone(result['error'])
+        self.assertTrue(result['replaced'])
+        self.assertEqual(string_types(self.filename), types)
+
+    def test_repack_links(self):
+        with h5py.File(self.filename, 'a') as h5f:
+            h5f['/dataset2/data1/data'] = h5f['/dataset1/data1/data']
+            h5f['/dataset1/latest'] = h5py.SoftLink('/dataset1/data1')
+            h5f['/external'] = h5py.ExternalLink('other.h5', '/dataset1')
+            h5f['/dataset1/data1/parent'] = h5f['/dataset1']
+        result = repack_file(self.filename, force=True)
+        self.assertIsNone(result['error'])
+        with h5py.File(self.filename, 'r') as h5f:
+            self.assertEqual(h5f['/dataset2/data1/data'].id, h5f['/dataset1/data1/data'].id)
+            self.assertEqual(h5f['/dataset1/data1/parent'].id, h5f['/dataset1'].id)
+            self.assertEqual(h5f['/dataset2/data1/data'].compression, 'gzip')
+            self.assertEqual(h5f.get('/dataset1/latest', getlink=True).path, '/dataset1/data1')
+            link = h5f.get('/external', getlink=True)
+            self.assertEqual((link.filename, link.path), ('other.h5', '/dataset1'))
+
+    def test_repack_keeps_smaller_file(self):
+        repack_file(self.filename)
+        result = repack_file(self.filename)
+        self.assertFalse(result['replaced'])
+
+    def test_main(self):
+        self.assertEqual(main(['-j', '1', '--compression', 'lzf', self.filename]), 0)
+        with h5py.File(self.filename, 'r') as h5f:
+            self.assertEqual(h5f['/dataset1/data1/data'].compression, 'lzf')
+        self.assertEqual(main(['-j', '1', 'not_existing_file.h5']), 1)
+
+if __name__=='__main__':
+    unittest.main()
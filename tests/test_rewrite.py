@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+from hiisi.rewrite import rewrite, rewrite_file
+import h5py
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = ['test_rewrite1.h5', 'test_rewrite2.h5']
+        for filename in self.filenames:
+            with h5py.File(filename, 'w') as h5f:
+                h5f.create_group('/what').attrs['source'] = np.bytes_(b'NOD:fivan')
+                for i in (1, 2):
+                    how = h5f.create_group('/dataset{}/how'.format(i))
+                    how.attrs['radconstH'] = np.float32(60.0)
+                    how.attrs['obsolete'] = 1
+                    h5f.create_dataset('/dataset{}/data1/data'.format(i), data=np.zeros((4, 5)))
+
+    def tearDown(self):
+        for filename in self.filenames:
+            os.remove(filename)
+
+    def test_dry_run(self):
+        edits = [('/what', 'source', 'NOD:fikor'), ('/dataset*/how', 'radconstH', 64.5)]
+        result = rewrite_file(self.filenames[0], edits, dry_run=True)
+        self.assertIsNone(result['error'])
+        self.assertFalse(result['written'])
+        self.assertEqual([(change.path, change.name, change.second) for change in result['changes']],
+                         [('/dataset1/how', 'radconstH', 64.5), ('/dataset2/how', 'radconstH', 64.5),
+                          ('/what', 'source', b'NOD:fikor')])
+        self.assertEqual(result['changes'][2].first, b'NOD:fivan')
+        with h5py.File(self.filenames[0], 'r') as h5f:
+            self.assertEqual(h5f['/what'].attrs['source'], b'NOD:fivan')
+
+    def test_rewrite(self):
+        edits = [('/what', 'source', 'NOD:fikor'), ('/dataset1/how', 'radconstH', 64.5),
+                 ('/dataset*/how', 'obsolete', None), ('/dataset2/how', 'new', 'value')]
+        results = list(rewrite(self.filenames, edits, workers=1))
+        self.assertTrue(all(result['written'] for result in results))
+        with h5py.File(self.filenames[1], 'r') as h5f:
+            source_id = h5f['/what'].attrs.get_id('source')
+            self.assertEqual(source_id.dtype, np.dtype('S9'))
+            self.assertEqual(h5f['/what'].attrs['source'], b'NOD:fikor')
+            self.assertEqual(h5f['/dataset1/how'].attrs['radconstH'].dtype, np.float32)
+            self.assertEqual(h5f['/dataset2/how'].attrs['radconstH'], 60.0)
+            self.assertNotIn('obsolete', h5f['/dataset1/how'].attrs)
+            self.assertEqual(h5f['/dataset2/how'].attrs['new'], b'value')
+        # Files already conform
+        mtime = os.path.getmtime(self.filenames[0])
+        results = list(rewrite(self.filenames, edits))
+        self.assertEqual([(result['changes'], result['written']) for result in results], [([], False)] * 2)
+        self.assertEqual(os.path.getmtime(self.filenames[0]), mtime)
+
+    def test_pattern_components(self):
+        with h5py.File(self.filenames[0], 'a') as h5f:
+            h5f.create_group('/dataset1/data1/how').attrs['radconstH'] = np.float32(60.0)
+        result = rewrite_file(self.filenames[0], [('/dataset*/how', 'radconstH', 64.5)])
+        self.assertEqual([change.path for change in result['changes']], ['/dataset1/how', '/dataset2/how'])
+        with h5py.File(self.filenames[0], 'r') as h5f:
+            self.assertEqual(h5f['/dataset1/data1/how'].attrs['radconstH'], 60.0)
+            self.assertEqual(h5f['/dataset1/how'].attrs['radconstH'], np.float32(64.5))
+
+    def test_error(self):
+        result = rewrite_file('not_existing_file.h5', [('/what', 'source', 'x')])
+        self.assertTrue(result['error'].startswith('FileNotFoundError'))
+
+if __name__=='__main__':
+    unittest.main()
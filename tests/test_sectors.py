@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_sectors.h5'
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict({'/dataset1/where':{'elangle':0.5, 'rscale':500.0},
+                                      '/dataset1/data1/what':{'quantity':'DBZH'}})
+            h5f.create_dataset('/dataset1/data1/data', data=np.arange(10*12).reshape((10, 12)), chunks=(2, 12))
+        self.pvol = hiisi.OdimPVOL(self.filename, 'r', rdcc_nbytes=2**16, rdcc_nslots=101)
+        self.pvol.select_dataset('A', 'DBZH')
+
+    def tearDown(self):
+        self.pvol.close()
+        os.remove(self.filename)
+
+    def test_iter_sectors(self):
+        for width, step in [(4, 2), (3, 3), (10, 1), (2, 4), (5, None)]:
+            sectors = list(self.pvol.iter_sectors(width, step, 1000, 4000, units='m'))
+            starts = list(range(0, 10, step or width))
+            self.assertEqual([start for start, sector in sectors], starts)
+            for start, sector in sectors:
+                np.testing.assert_array_equal(sector, self.pvol.sector(start, (start + width - 1) % 10, 2, 8))
+
+    def test_iter_sectors_early_exit(self):
+        sectors = self.pvol.iter_sectors(2, prefetch=1)
+        start, sector = next(sectors)
+        sectors.close()
+        np.testing.assert_array_equal(sector, np.arange(24).reshape((2, 12)))
+
+    def test_iter_sectors_invalid(self):
+        with self.assertRaises(ValueError):
+            list(self.pvol.iter_sectors(11))
+        self.pvol.dataset = None
+        with self.assertRaises(ValueError):
+            list(self.pvol.iter_sectors(2))
+
+if __name__=='__main__':
+    unittest.main()
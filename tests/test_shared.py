@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.shared import CompositePublisher, SharedComposite
+import numpy as np
+import uuid
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = CompositePublisher('hiisi_{}'.format(uuid.uuid4().hex[:8]))
+
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_publish_and_attach(self):
+        self.publisher.publish('test_data/comp.h5', decode=False)
+        with SharedComposite(self.publisher.name) as shared, hiisi.OdimCOMP('test_data/comp.h5', 'r') as comp:
+            self.assertEqual(shared.quantities, ['DBZH'])
+            self.assertEqual(shared.select_dataset('DBZH'), comp.select_dataset('DBZH'))
+            np.testing.assert_array_equal(shared.dataset, comp.dataset)
+            self.assertFalse(shared.dataset.flags.writeable)
+            self.assertIsNone(shared.select_dataset('NONEXISTING'))
+            self.assertEqual(shared.metadata()['/what']['object'], 'COMP')
+
+    def test_generation_swap(self):
+        self.publisher.publish('test_data/comp.h5', decode=False)
+        with SharedComposite(self.publisher.name) as shared:
+            self.assertEqual(shared.generation, 1)
+            self.assertFalse(shared.refresh())
+            self.publisher.publish('test_data/T_PAAH21_C_EUOC_20160815114500.hdf', quantities=['QIND'])
+            self.assertTrue(shared.refresh())
+            self.assertEqual(shared.generation, 2)
+            self.assertEqual(shared.quantities, ['QIND'])
+            self.assertEqual(shared.select_dataset('QIND'), '/dataset2/data1/data')
+            self.assertEqual(shared.dataset.dtype, np.float64)
+
+    def test_missing_generation(self):
+        self.publisher.publish('test_data/comp.h5', decode=False)
+        with SharedComposite(self.publisher.name) as shared:
+            # Publisher stopped after updating the generation number
+            np.ndarray((1,), dtype=np.int64, buffer=self.publisher._control.buf)[0] = 5
+            with self.assertRaises(FileNotFoundError):
+                shared.refresh(timeout=0.05)
+            self.assertEqual(shared.generation, 1)
+
+if __name__=='__main__':
+    unittest.main()
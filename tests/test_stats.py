@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.stats import dataset_stats, file_stats, stats
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_stats.h5'
+        self.raw = np.arange(40 * 50).reshape((40, 50)) % 256
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict({'/dataset1/where':{'elangle':0.5},
+                                      '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0,
+                                                              'nodata':255.0, 'undetect':0.0},
+                                      '/dataset1/data2/what':{'quantity':'VRAD'},
+                                      '/dataset1/data2/data':{'DATASET':np.full((40, 50), 255, dtype=np.uint8)}})
+            h5f.create_dataset('/dataset1/data1/data', data=self.raw.astype(np.uint8), chunks=(7, 11))
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_dataset_stats(self):
+        valid = self.raw[(self.raw != 255) & (self.raw != 0)] * 0.5 - 32.0
+        bins = np.arange(-40, 100, 10)
+        with hiisi.HiisiHDF(self.filename, 'r') as h5f:
+            chunked = dataset_stats(h5f, '/dataset1/data1', bins)
+            # Contiguous dataset is read in blocks of two rows
+            self.assertIsNone(h5f['/dataset1/data2/data'].chunks)
+            blocks = dataset_stats(h5f, '/dataset1/data2', block_bytes=100)
+        self.assertEqual(chunked['count'], valid.size)
+        self.assertAlmostEqual(chunked['mean'], valid.mean())
+        self.assertAlmostEqual(chunked['std'], valid.std())
+        self.assertEqual((chunked['min'], chunked['max']), (valid.min(), valid.max()))
+        self.assertAlmostEqual(chunked['nodata'], np.mean(self.raw == 255))
+        self.assertAlmostEqual(chunked['undetect'], np.mean(self.raw == 0))
+        np.testing.assert_array_equal(chunked['histogram'], np.histogram(valid, bins)[0])
+        self.assertEqual((blocks['count'], blocks['mean'], blocks['std']), (40 * 50, 255.0, 0.0))
+        self.assertEqual(blocks['nodata'], 0.0)
+
+    def test_file_stats(self):
+        rows = file_stats(self.filename, quantities=['DBZH'])
+        self.assertEqual([(row['path'], row['quantity'], row['elangle']) for row in rows],
+                         [('/dataset1/data1', 'DBZH', 0.5)])
+        rows = list(stats([self.filename], workers=1))
+        self.assertEqual([row['quantity'] for row in rows[0]], ['DBZH', 'VRAD'])
+
+if __name__=='__main__':
+    unittest.main()
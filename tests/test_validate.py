@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.validate import Problem, validate, validate_file
+import h5py
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_validate.h5'
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict({'/what':{'object':'PVOL', 'version':'H5rad 2.2', 'date':'20160815',
+                                               'time':'120000', 'source':'NOD:fivan'},
+                                      '/where':{'lon':24.87, 'lat':60.27, 'height':83.0},
+                                      '/dataset1/what':{'product':'SCAN', 'startdate':'20160815',
+                                                        'starttime':'120000', 'enddate':'20160815',
+                                                        'endtime':'120015'},
+                                      '/dataset1/where':{'elangle':0.5, 'nbins':50, 'rstart':0.0,
+                                                         'rscale':500.0, 'nrays':36, 'a1gate':0},
+                                      '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0,
+                                                              'nodata':255.0, 'undetect':0.0}})
+            h5f.create_dataset('/dataset1/data1/data', data=np.arange(36*50, dtype=np.uint8).reshape((36, 50)),
+                               chunks=(6, 50), fletcher32=True)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_valid(self):
+        for thorough in (False, True):
+            result = validate_file(self.filename, thorough)
+            self.assertTrue(result['valid'])
+            self.assertEqual(result['problems'], [])
+            self.assertIsNone(result['error'])
+        results = list(validate(['test_data/*.hdf', 'test_data/comp.h5', self.filename], workers=1))
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result['valid'] for result in results))
+
+    def test_structure(self):
+        with h5py.File(self.filename, 'r+') as h5f:
+            del h5f['/where'].attrs['height']
+            del h5f['/dataset1/data1/what'].attrs['gain']
+            h5f['/dataset1/where'].attrs['nrays'] = 360
+        result = validate_file(self.filename)
+        self.assertFalse(result['valid'])
+        self.assertEqual(result['problems'],
+                         [Problem('/dataset1/where', 'missing attribute height'),
+                          Problem('/dataset1/data1/what', 'missing attribute gain'),
+                          Problem('/dataset1/data1/data', 'shape (36, 50) does not match nrays and nbins (360, 50)')])
+
+    def test_object_types(self):
+        common = {'/what':{'version':'H5rad 2.2', 'date':'20160815', 'time':'120000', 'source':'NOD:fivan'},
+                  '/dataset1/what':{'product':'VP', 'startdate':'20160815', 'starttime':'120000',
+                                    'enddate':'20160815', 'endtime':'120500'},
+                  '/dataset1/data1/what':{'quantity':'ff', 'gain':1.0, 'offset':0.0,
+                                          'nodata':255.0, 'undetect':0.0}}
+        vp = {'/what':{'object':'VP'},
+              '/where':{'lon':24.87, 'lat':60.27, 'height':83.0, 'levels':4, 'interval':200.0,
+                        'minheight':0.0, 'maxheight':800.0},
+              '/dataset1/data1/data':{'DATASET':np.zeros((4, 1))}}
+        xsec = {'/what':{'object':'XSEC'},
+                '/where':{'xsize':5, 'ysize':3, 'xscale':500.0, 'yscale':200.0,
+                          'minheight':0.0, 'maxheight':600.0},
+                '/dataset1/data1/data':{'DATASET':np.zeros((3, 5))}}
+        cvol = {'/what':{'object':'CVOL'},
+                '/dataset1/data1/data':{'DATASET':np.zeros((3, 5))}}
+        for filedict in (vp, xsec, cvol):
+            with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+                h5f.create_from_filedict(common)
+                h5f.create_from_filedict(filedict)
+            result = validate_file(self.filename)
+            self.assertEqual(result['problems'], [])
+            self.assertTrue(result['valid'])
+        with h5py.File(self.filename, 'r+') as h5f:
+            h5f['/what'].attrs['object'] = np.bytes_(b'root')
+        self.assertEqual(validate_file(self.filename)['problems'], [Problem('/what', 'unknown object root')])
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict(common)
+            h5f.create_from_filedict(vp)
+            del h5f['/where'].attrs['interval']
+            del h5f['/dataset1/data1/data']
+            h5f.create_dataset('/dataset1/data1/data', data=np.zeros((4, 2)))
+        self.assertEqual(validate_file(self.filename)['problems'],
+                         [Problem('/dataset1/where', 'missing attribute interval'),
+                          Problem('/dataset1/data1/data', 'shape (4, 2) does not match levels (4,)')])
+
+    def test_checksum(self):
+        with h5py.File(self.filename, 'r') as h5f:
+            offset = h5f['/dataset1/data1/data'].id.get_chunk_info(1).byte_offset
+        with open(self.filename, 'r+b') as f:
+            f.seek(offset + 10)
+            f.write(b'\x00\x00\x00\x00')
+        self.assertTrue(validate_file(self.filename)['valid'])
+        result = validate_file(self.filename, thorough=True)
+        self.assertFalse(result['valid'])
+        self.assertIsNotNone(result['error'])
+
+    def test_truncated(self):
+        size = os.path.getsize(self.filename)
+        with open(self.filename, 'r+b') as f:
+            f.truncate(size // 2)
+        result = validate_file(self.filename)
+        self.assertFalse(result['valid'])
+        self.assertIsNotNone(result['error'])
+
+if __name__=='__main__':
+    unittest.main()
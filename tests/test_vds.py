@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.vds import build_vds
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = ['test_vds_pvol1.h5', 'test_vds_pvol2.h5']
+        self.output = 'test_vds.h5'
+        for i, filename in enumerate(self.filenames):
+            filedict = {'/what':{'object':'PVOL', 'date':'20160815', 'time':'12{}000'.format(i)},
+                        '/dataset1/where':{'elangle':1.5},
+                        '/dataset1/data1/data':{'DATASET':np.full((4, 3), 10 + i, dtype='uint8')},
+                        '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0, 'nodata':255.0},
+                        '/dataset2/where':{'elangle':0.5},
+                        '/dataset2/data1/data':{'DATASET':np.full((4, 5), 20 + i, dtype='uint8')},
+                        '/dataset2/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0, 'nodata':255.0}}
+            with hiisi.HiisiHDF(filename, 'w') as h5f:
+                h5f.create_from_filedict(filedict)
+
+    def tearDown(self):
+        for filename in self.filenames + [self.output]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_build_vds_volume(self):
+        self.assertEqual(build_vds(self.filenames, self.output, 'DBZH'), (2, 2, 4, 5))
+        with hiisi.HiisiHDF(self.output, 'r') as h5f:
+            self.assertTrue(h5f['/data'].is_virtual)
+            np.testing.assert_array_equal(h5f['/data'][:, 0, 0, 0], [20, 21])
+            np.testing.assert_array_equal(h5f['/data'][1, 1, 0], [11, 11, 11, 255, 255])
+            np.testing.assert_array_equal(h5f['/elangle'][0], [0.5, 1.5])
+            np.testing.assert_array_equal(h5f['/time'][:] - h5f['/time'][0], [0, 600])
+            self.assertEqual(h5f['/what'].attrs['nodata'], 255.0)
+
+    def test_build_vds_composite(self):
+        filenames = ['test_data/T_PAAH21_C_EUOC_20160815114500.hdf', 'test_data/T_PAAH21_C_EUOC_20160815120000.hdf']
+        self.assertEqual(build_vds(filenames, self.output, 'QIND'), (2, 2200, 1900))
+        with hiisi.HiisiHDF(self.output, 'r') as h5f, hiisi.OdimCOMP(filenames[1], 'r') as comp:
+            comp.select_dataset('QIND')
+            np.testing.assert_array_equal(h5f['/data'][1, 1000:1010, 500:510], comp.dataset[1000:1010, 500:510])
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+from hiisi.odim import unfold_velocity
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_velocity.h5'
+        filedict = {'/how':{'wavelength':5.3},
+                    '/dataset1/where':{'elangle':0.5},
+                    '/dataset1/how':{'NI':8.0},
+                    '/dataset1/data1/data':{'DATASET':np.array([[100, 130, 160], [0, 255, 140]], dtype='uint8')},
+                    '/dataset1/data1/what':{'quantity':'VRADH', 'gain':0.1, 'offset':-12.8, 'nodata':255.0},
+                    '/dataset2/where':{'elangle':1.5},
+                    '/dataset2/how':{'highprf':1000.0},
+                    '/dataset2/data1/data':{'DATASET':np.zeros((2, 3), dtype='uint8')},
+                    '/dataset2/data1/what':{'quantity':'VRADH', 'gain':0.1, 'offset':-12.8, 'nodata':255.0}}
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_velocity(self):
+        with hiisi.OdimPVOL(self.filename, 'r') as pvol:
+            velocity, nyquist = pvol.velocity()
+            self.assertEqual(velocity.shape, (2, 2, 3))
+            np.testing.assert_allclose(nyquist, [8.0, 5.3 * 0.01 * 1000.0 / 4.0])
+            velocity, nyquist = pvol.velocity('A')
+            np.testing.assert_allclose(velocity, [[-2.8, 0.2, 3.2], [-12.8, np.nan, 1.2]])
+            self.assertEqual(nyquist, 8.0)
+
+    def test_unfold_velocity_along_ray(self):
+        velocity = np.array([[[5.0, 7.5, -7.0, np.nan, -5.0]]])
+        unfolded = unfold_velocity(velocity, np.array([8.0]))
+        np.testing.assert_allclose(unfolded, [[[5.0, 7.5, 9.0, np.nan, 11.0]]])
+
+    def test_unfold_velocity_reference(self):
+        velocity = np.array([[5.0, -7.0]])
+        unfold_velocity(velocity, 8.0, reference=np.array([[-10.0, 10.0]]), out=velocity)
+        np.testing.assert_allclose(velocity, [[-11.0, 9.0]])
+
+    def test_unfold_velocity_unknown_nyquist(self):
+        velocity = np.array([[[5.0, 7.5, -7.0, -5.0]], [[5.0, 7.5, -7.0, -5.0]]])
+        unfolded = unfold_velocity(velocity, np.array([np.nan, 8.0]))
+        np.testing.assert_allclose(unfolded, [[[5.0, 7.5, -7.0, -5.0]], [[5.0, 7.5, 9.0, 11.0]]])
+        np.testing.assert_allclose(unfold_velocity([[1.0, 2.0, 3.0, 4.0]], np.nan), [[1.0, 2.0, 3.0, 4.0]])
+        reference = np.array([[[10.0, 10.0, 10.0, np.nan]]])
+        unfolded = unfold_velocity(velocity, np.array([np.nan, 8.0]), reference=reference)
+        np.testing.assert_allclose(unfolded, [[[5.0, 7.5, -7.0, -5.0]], [[5.0, 7.5, 9.0, -5.0]]])
+
+    def test_velocity_unknown_elangle(self):
+        with hiisi.OdimPVOL(self.filename, 'r') as pvol:
+            for elangles in ('C', 'a', 'AA', ['A', 'Z']):
+                with self.assertRaises(KeyError):
+                    pvol.velocity(elangles)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import unittest
+import env
+import hiisi
+import numpy as np
+import os
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'test_volume.h5'
+        filedict = {'/dataset1/where':{'elangle':1.5, 'rscale':500.0, 'rstart':0.0, 'nrays':4, 'nbins':3},
+                    '/dataset1/what':{'startdate':'20160815', 'starttime':'120010', 'enddate':'20160815', 'endtime':'120020'},
+                    '/dataset1/data1/data':{'DATASET':np.arange(4*3).reshape((4, 3))},
+                    '/dataset1/data1/what':{'quantity':'DBZH', 'gain':0.5, 'offset':-32.0, 'nodata':255.0},
+                    '/dataset2/where':{'elangle':0.5, 'rscale':500.0, 'rstart':0.0, 'nrays':4, 'nbins':5},
+                    '/dataset2/data1/data':{'DATASET':np.arange(4*5).reshape((4, 5))},
+                    '/dataset2/data1/what':{'quantity':'DBZH', 'gain':1.0, 'offset':0.0},
+                    '/dataset2/data2/data':{'DATASET':np.ones((4, 5))},
+                    '/dataset2/data2/what':{'quantity':'VRAD'}
+                    }
+        with hiisi.HiisiHDF(self.filename, 'w') as h5f:
+            h5f.create_from_filedict(filedict)
+        self.pvol = hiisi.OdimPVOL(self.filename, 'r')
+
+    def tearDown(self):
+        self.pvol.close()
+        os.remove(self.filename)
+
+    def test_catalogue(self):
+        self.assertEqual(self.pvol.quantities, ['DBZH', 'VRAD'])
+        self.assertDictEqual(self.pvol.catalogue, {'A':{'DBZH':'/dataset2/data1/data', 'VRAD':'/dataset2/data2/data'},
+                                                   'B':{'DBZH':'/dataset1/data1/data'}})
+
+    def test_sweeps(self):
+        sweeps = self.pvol.sweeps
+        self.assertEqual(list(sweeps['letter']), ['A', 'B'])
+        self.assertEqual(list(sweeps['path']), ['/dataset2', '/dataset1'])
+        np.testing.assert_array_equal(sweeps['nbins'], [5, 3])
+        np.testing.assert_array_equal(sweeps['a1gate'], [-1, -1])
+        self.assertEqual(sweeps['start'][1], np.datetime64('2016-08-15T12:00:10'))
+        self.assertTrue(np.isnat(sweeps['end'][0]))
+        selected = sweeps[(sweeps['elangle'] > 1) & (sweeps['rscale'] == 500)]
+        self.assertEqual(list(selected['letter']), ['B'])
+
+    def test_view_coordinates(self):
+        view = self.pvol.view()
+        self.assertEqual(view.shape, (2, 4, 5))
+        np.testing.assert_array_equal(view.coords['elangle'], [0.5, 1.5])
+        np.testing.assert_array_equal(view.coords['azimuth'], [45, 135, 225, 315])
+        np.testing.assert_array_equal(view.coords['range'][0], [250, 750, 1250, 1750, 2250])
+
+    def test_variable_slicing(self):
+        dbzh = self.pvol.view()['DBZH']
+        np.testing.assert_array_equal(dbzh[0], np.arange(4*5).reshape((4, 5)))
+        np.testing.assert_array_equal(dbzh[1, 1:3, 1], [4*0.5 - 32.0, 7*0.5 - 32.0])
+        # Second sweep is shorter and padded with nan
+        np.testing.assert_array_equal(dbzh[1, 0, 2:], [-31.0, np.nan, np.nan])
+        vrad = self.pvol.view(decode=False)['VRAD']
+        np.testing.assert_array_equal(vrad[:, 0, 0], [1, 0])
+
+    def test_sel(self):
+        view = self.pvol.view()
+        values = view.sel('DBZH', elangle=0.4, azimuth=(300, 50), distance=(500, 1000))
+        np.testing.assert_array_equal(values, [[[16], [1]]])
+        self.assertEqual(view.sel('DBZH', elangle=(0, 2)).shape, (2, 4, 5))
+
+if __name__=='__main__':
+    unittest.main()